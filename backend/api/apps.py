@@ -4,3 +4,12 @@ from django.apps import AppConfig
 class ApiConfig(AppConfig):
     default_auto_field = "django.db.models.BigAutoField"
     name = "api"
+
+    def ready(self):
+        from django.conf import settings
+
+        from .metrics import instrument_serializers
+        from .signals import connect_signals
+        connect_signals()
+        if settings.SERVER_TIMING_SAMPLE_RATE > 0:
+            instrument_serializers()
@@ -0,0 +1,118 @@
+"""api app constants."""
+
+
+POPULAR_RECIPES_ORDERING = "popular"
+TRENDING_RECIPES_ORDERING = "trending"
+RECIPE_ORDERING_CHOICES = (
+    POPULAR_RECIPES_ORDERING,
+    TRENDING_RECIPES_ORDERING,
+)
+
+ANY_TAGS_FILTER_MODE = "any"
+ALL_TAGS_FILTER_MODE = "all"
+TAGS_FILTER_MODE_CHOICES = (
+    (ANY_TAGS_FILTER_MODE, ANY_TAGS_FILTER_MODE),
+    (ALL_TAGS_FILTER_MODE, ALL_TAGS_FILTER_MODE),
+)
+
+RESPONSE_CACHE_TIMEOUT = 60 * 60
+RESPONSE_CACHE_MAX_PAGE = 3
+RESPONSE_CACHE_MIN_COMPRESS_LENGTH = 200
+# Compression happens on the request path of the misses,
+# so these trade a few percent of ratio for a lot of speed.
+RESPONSE_CACHE_GZIP_LEVEL = 6
+RESPONSE_CACHE_BROTLI_QUALITY = 5
+
+# Path prefix of a cached route -> labels of the models it depends on,
+# which are also the cache tags its entries are invalidated by.
+RESPONSE_CACHE_ROUTES = {
+    "/api/recipes/": (
+        "recipes.Recipe",
+        "recipes.RecipeTag",
+        "recipes.IngredientAmountInRecipe",
+        "recipes.Tag",
+        "recipes.Ingredient",
+        "users.CustomUser",
+    ),
+    "/api/tags/": (
+        "recipes.Tag",
+    ),
+    "/api/ingredients/": (
+        "recipes.Ingredient",
+    ),
+}
+
+# Cached route -> query params its requests may have to be cached.
+# Requests with any other param bypass the cache, so that the number
+# of entries does not depend on the query strings clients make up.
+RESPONSE_CACHE_QUERY_PARAMS = {
+    "/api/recipes/": ("page", "limit", "ordering", "tags", "tags_mode"),
+    "/api/tags/": (),
+    "/api/ingredients/": (),
+}
+# The only ones which may be repeated, the others take a single value.
+RESPONSE_CACHE_LIST_PARAMS = ("tags", )
+# Numeric query params of the cached routes -> their greatest value.
+RESPONSE_CACHE_MAX_NUMBERS = {
+    "page": RESPONSE_CACHE_MAX_PAGE,
+    "limit": 100,
+}
+
+# Labels of the models, whose writes invalidate the same-named cache tags.
+CACHE_INVALIDATING_MODELS = sorted({
+    "recipes.Recipe",
+    "recipes.Tag",
+    "recipes.Ingredient",
+    "recipes.FavoriteItem",
+    "recipes.CartItem",
+    "users.Subscription",
+    *(
+        label for labels in RESPONSE_CACHE_ROUTES.values()
+        for label in labels
+    ),
+})
+
+# Most objects a single `ids` multi-get may ask for.
+MULTI_GET_MAX_IDS = 100
+
+# Delta sync tokens lag behind the clock by this many seconds, so that
+# the rows of the transactions still running meanwhile are not skipped.
+SYNC_TOKEN_SAFETY_MARGIN_SECONDS = 5
+
+# Shopping lists longer than this are exported in the background.
+SYNC_SHOPPING_LIST_MAX_ITEMS = 500
+
+# Running jobs without a heartbeat for this long are queued again.
+EXPORT_JOB_TIMEOUT = 2 * 60
+EXPORT_HEARTBEAT_INTERVAL = 30
+EXPORT_JOB_TTL = 24 * 60 * 60
+EXPORT_HOUSEKEEPING_INTERVAL = 60
+EXPORT_CHUNK_SIZE = 500
+# Exports larger than this are rendered into a temporary file on disk.
+EXPORT_SPOOL_MAX_SIZE = 1024 * 1024
+
+# Server-sent events of the new recipes of the followed authors.
+RECIPE_EVENTS_PATH = "/api/events/recipes/"
+RECIPE_EVENTS_CHANNEL = "foodgram:recipe-events"
+RECIPE_EVENTS_HEARTBEAT_SECONDS = 15
+RECIPE_EVENTS_RETRY_SECONDS = 5
+RECIPE_EVENTS_QUEUE_SIZE = 100
+RECIPE_EVENTS_REPLAY_LIMIT = 100
+
+# Anonymous requests made by the warm-up to fill the response cache.
+WARM_UP_PATHS = (
+    "/api/tags/",
+    "/api/ingredients/",
+    "/api/recipes/",
+)
+
+# Users created by the load tests, deleted when resetting between runs.
+LOAD_TEST_USERNAME_PREFIX = "load-test-"
+
+METRICS_NAMESPACE = "foodgram"
+METRICS_DURATION_BUCKETS = (
+    0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0,
+)
+METRICS_QUERY_COUNT_BUCKETS = (
+    1, 2, 5, 10, 20, 50, 100, 200, 500,
+)
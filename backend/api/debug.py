@@ -0,0 +1,130 @@
+import logging
+import re
+import traceback
+from collections import defaultdict
+from contextlib import ExitStack
+from time import perf_counter
+
+from django.conf import settings
+from django.core.exceptions import MiddlewareNotUsed
+from django.db import connections
+
+from . import metrics, middleware
+
+logger = logging.getLogger("api.queries")
+
+IN_CLAUSE = re.compile(r"\bIN \((?:%s, )*%s\)")
+NUMBER = re.compile(r"\b\d+\b")
+WHITESPACE = re.compile(r"\s+")
+
+INSTRUMENTATION_FILES = (__file__, metrics.__file__, middleware.__file__)
+
+
+class RepeatedQueriesError(Exception):
+    """
+    Raised when the same-shape query runs more times within a request
+    than `QUERY_INSPECTION["REPEAT_LIMIT"]` allows.
+    """
+
+    pass
+
+
+def fingerprint(sql):
+    """
+    Reduces an SQL statement to its shape, so that the statements
+    differing in parameters only share a fingerprint.
+    """
+
+    sql = IN_CLAUSE.sub("IN (...)", sql)
+    sql = NUMBER.sub("?", sql)
+    return WHITESPACE.sub(" ", sql).strip()
+
+
+def get_caller_stack(limit=5):
+    """
+    Returns the innermost frames of the current stack
+    which belong to the project source code.
+    """
+
+    base_dir = str(settings.BASE_DIR)
+    frames = [
+        frame for frame in traceback.extract_stack()[:-1]
+        if frame.filename.startswith(base_dir)
+        and "site-packages" not in frame.filename
+        and frame.filename not in INSTRUMENTATION_FILES
+    ]
+    return "".join(traceback.format_list(frames[-limit:]))
+
+
+class QueryInspector:
+    """
+    Fingerprints the SQL run during a request, remembering the stack
+    of the first call of each shape, and logs the slow statements.
+    """
+
+    def __init__(self, slow_query_ms):
+        self.slow_query_seconds = slow_query_ms / 1000
+        self.counts = defaultdict(int)
+        self.stacks = {}
+
+    def __call__(self, execute, sql, params, many, context):
+        started = perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            duration = perf_counter() - started
+            shape = fingerprint(sql)
+            self.counts[shape] += 1
+            if shape not in self.stacks:
+                self.stacks[shape] = get_caller_stack()
+            if duration >= self.slow_query_seconds:
+                logger.warning("slow query (%.1f ms): %s\n%s",
+                               duration * 1000, sql, get_caller_stack())
+
+    def get_repeated(self, limit):
+        return [
+            (shape, count) for shape, count in self.counts.items()
+            if count > limit
+        ]
+
+
+class QueryInspectionMiddleware:
+    """
+    Development-mode detector of N+1 query patterns.
+    Flags the same-shape queries repeated within a single request
+    along with the stack that issued them, and logs slow queries.
+    Raises `RepeatedQueriesError` instead of logging,
+    when `QUERY_INSPECTION["RAISE"]` is set (meant for tests),
+    unless the view failed, to keep its own error in sight.
+    """
+
+    def __init__(self, get_response):
+        if not settings.QUERY_INSPECTION["ENABLED"]:
+            raise MiddlewareNotUsed
+        self.get_response = get_response
+
+    def __call__(self, request):
+        config = settings.QUERY_INSPECTION
+        inspector = QueryInspector(config["SLOW_QUERY_MS"])
+        try:
+            with ExitStack() as stack:
+                for connection in connections.all():
+                    stack.enter_context(connection.execute_wrapper(inspector))
+                response = self.get_response(request)
+        except Exception:
+            # Only logs, so as not to mask the error of the view.
+            self.report(request, inspector, config, failed=True)
+            raise
+        self.report(request, inspector, config,
+                    failed=response.status_code >= 500)
+        return response
+
+    def report(self, request, inspector, config, failed=False):
+        repeated = inspector.get_repeated(config["REPEAT_LIMIT"])
+        for shape, count in repeated:
+            message = (f"{request.method} {request.path}: same-shape query "
+                       f"ran {count} times: {shape}\n"
+                       f"{inspector.stacks[shape]}")
+            if config["RAISE"] and not failed:
+                raise RepeatedQueriesError(message)
+            logger.warning(message)
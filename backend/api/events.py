@@ -0,0 +1,285 @@
+"""
+Server-sent events of the new recipes of the followed authors.
+
+Streamed by `recipe_events`, a plain ASGI app mounted in front of Django
+by `backend.asgi`, as Django 3.2 views cannot stream asynchronously.
+Every open stream is a coroutine waiting on its own queue, so an idle
+one costs its socket and a few objects, and many of them fit in one
+worker. The hub of each serving process fans the events out to the
+queues of the followers of their author.
+
+Events are published to the RECIPE_EVENTS_CHANNEL of Redis when REDIS_URL
+is set, and a single subscription per serving process feeds its hub.
+Otherwise they are handed straight to the hub of the publishing process,
+which only reaches the streams served by that same process.
+"""
+
+import asyncio
+import json
+import logging
+from collections import defaultdict
+from urllib.parse import parse_qs
+
+import redis
+import redis.asyncio
+from asgiref.sync import sync_to_async
+
+from django.conf import settings
+from django.db import close_old_connections
+from django.utils.functional import cached_property
+
+from rest_framework.authtoken.models import Token
+from rest_framework.exceptions import AuthenticationFailed, NotAuthenticated
+
+from recipes.models import Recipe
+from users.models import Subscription
+
+from .constants import (RECIPE_EVENTS_CHANNEL, RECIPE_EVENTS_HEARTBEAT_SECONDS,
+                        RECIPE_EVENTS_QUEUE_SIZE, RECIPE_EVENTS_REPLAY_LIMIT,
+                        RECIPE_EVENTS_RETRY_SECONDS)
+
+logger = logging.getLogger(__name__)
+
+RECIPE_EVENT = "recipe"
+FOLLOW_EVENT = "follow"
+UNFOLLOW_EVENT = "unfollow"
+
+
+class Listener:
+    """
+    A single open stream: the ids of the authors its user follows,
+    and the queue of the events yet to be sent.
+    """
+
+    def __init__(self, user_id, following):
+        self.user_id = user_id
+        self.following = set(following)
+        self.queue = asyncio.Queue(maxsize=RECIPE_EVENTS_QUEUE_SIZE)
+
+    def push(self, event):
+        # A client too slow to keep up loses the oldest events,
+        # which it catches up on when reconnecting with Last-Event-ID.
+        if self.queue.full():
+            self.queue.get_nowait()
+        self.queue.put_nowait(event)
+
+
+class RecipeEventHub:
+    """
+    Routes the published events to the listeners they concern.
+    Only ever touched from the event loop of the serving process,
+    except for `publish`, which is safe to call from any thread.
+    """
+
+    def __init__(self):
+        self.by_author = defaultdict(set)
+        self.by_user = defaultdict(set)
+        self.loop = None
+        self.relay = None
+
+    @cached_property
+    def redis(self):
+        return redis.Redis.from_url(settings.REDIS_URL)
+
+    def publish(self, kind, *ids):
+        message = ":".join((kind, *map(str, ids)))
+        if settings.REDIS_URL:
+            try:
+                self.redis.publish(RECIPE_EVENTS_CHANNEL, message)
+            except redis.RedisError:
+                logger.exception("Failed to publish the %s event", kind)
+        elif self.loop is not None:
+            self.loop.call_soon_threadsafe(self.dispatch, message)
+
+    def dispatch(self, message):
+        kind, *ids = message.split(":")
+        first_id, second_id = map(int, ids)
+        if kind == RECIPE_EVENT:
+            for listener in self.by_author.get(first_id, ()):
+                listener.push({"id": second_id, "author": first_id})
+            return
+        for listener in self.by_user.get(first_id, ()):
+            if kind == FOLLOW_EVENT:
+                listener.following.add(second_id)
+                self.by_author[second_id].add(listener)
+            elif kind == UNFOLLOW_EVENT:
+                listener.following.discard(second_id)
+                self.discard(self.by_author, second_id, listener)
+
+    def discard(self, index, key, listener):
+        listeners = index.get(key)
+        if listeners is not None:
+            listeners.discard(listener)
+            if not listeners:
+                del index[key]
+
+    def add(self, listener):
+        self.loop = asyncio.get_running_loop()
+        if settings.REDIS_URL and (self.relay is None or self.relay.done()):
+            self.relay = self.loop.create_task(self.relay_from_redis())
+        self.by_user[listener.user_id].add(listener)
+        for author_id in listener.following:
+            self.by_author[author_id].add(listener)
+
+    def remove(self, listener):
+        self.discard(self.by_user, listener.user_id, listener)
+        for author_id in listener.following:
+            self.discard(self.by_author, author_id, listener)
+
+    async def relay_from_redis(self):
+        """
+        Feeds the hub from the Redis channel, resubscribing
+        after the connection failures.
+        """
+
+        while True:
+            client = redis.asyncio.Redis.from_url(settings.REDIS_URL)
+            pubsub = client.pubsub(ignore_subscribe_messages=True)
+            try:
+                await pubsub.subscribe(RECIPE_EVENTS_CHANNEL)
+                async for message in pubsub.listen():
+                    self.dispatch(message["data"].decode())
+            except redis.RedisError:
+                logger.exception("Lost the recipe events subscription")
+            finally:
+                await pubsub.reset()
+                await client.close()
+            await asyncio.sleep(RECIPE_EVENTS_RETRY_SECONDS)
+
+
+recipe_event_hub = RecipeEventHub()
+
+
+def load_stream_state(key, last_event_id):
+    """
+    Returns the id of the user the token belongs to, the ids of the
+    authors they follow and the (recipe id, author id) pairs published
+    by them after `last_event_id`, or None for an unknown token.
+    """
+
+    close_old_connections()
+    try:
+        token = Token.objects.select_related("user").filter(key=key).first()
+        if token is None or not token.user.is_active:
+            return None
+        following = list(Subscription.objects.filter(
+            follower=token.user_id
+        ).values_list("influencer_id", flat=True))
+        missed = []
+        if last_event_id is not None and following:
+            missed = list(Recipe.objects.filter(
+                author__in=following, id__gt=last_event_id
+            ).order_by("id").values_list(
+                "id", "author_id"
+            )[:RECIPE_EVENTS_REPLAY_LIMIT])
+        return token.user_id, following, missed
+    finally:
+        close_old_connections()
+
+
+def get_credentials(scope):
+    """
+    Returns the token and the Last-Event-ID of the request. EventSource
+    cannot set headers, so both may come as the query params as well.
+    """
+
+    headers = {
+        name.decode("latin-1"): value.decode("latin-1")
+        for name, value in scope["headers"]
+    }
+    params = parse_qs(scope["query_string"].decode("latin-1"))
+    key = params.get("token", [None])[0]
+    scheme, _, credentials = headers.get("authorization", "").partition(" ")
+    if scheme.lower() == "token" and credentials:
+        key = credentials.strip()
+    last_event_id = headers.get(
+        "last-event-id", params.get("last_event_id", [None])[0]
+    )
+    if last_event_id is not None and not last_event_id.isdigit():
+        last_event_id = None
+    return key, last_event_id and int(last_event_id)
+
+
+def encode_event(recipe_id, author_id):
+    data = json.dumps({"id": recipe_id, "author": author_id})
+    return f"id: {recipe_id}\nevent: recipe\ndata: {data}\n\n".encode()
+
+
+async def send_error(send, status, detail):
+    body = json.dumps({"detail": str(detail)}, ensure_ascii=False).encode()
+    await send({
+        "type": "http.response.start",
+        "status": status,
+        "headers": [(b"content-type", b"application/json"),
+                    (b"content-length", str(len(body)).encode())],
+    })
+    await send({"type": "http.response.body", "body": body})
+
+
+async def wait_for_disconnect(receive):
+    while (await receive())["type"] != "http.disconnect":
+        pass
+
+
+async def recipe_events(scope, receive, send):
+    """
+    Streams the ids of the recipes the authors followed by the user
+    publish, as they do. Reconnecting clients get the ones they missed
+    (up to RECIPE_EVENTS_REPLAY_LIMIT), and a comment is sent every
+    RECIPE_EVENTS_HEARTBEAT_SECONDS, so that the dead connections
+    are noticed and the proxies keep the live ones open.
+    """
+
+    if scope["method"] != "GET":
+        await send_error(send, 405, f"method {scope['method']} not allowed")
+        return
+    key, last_event_id = get_credentials(scope)
+    if key is None:
+        await send_error(send, 401, NotAuthenticated.default_detail)
+        return
+    state = await sync_to_async(load_stream_state)(key, last_event_id)
+    if state is None:
+        await send_error(send, 401, AuthenticationFailed.default_detail)
+        return
+    user_id, following, missed = state
+
+    listener = Listener(user_id, following)
+    recipe_event_hub.add(listener)
+    disconnected = asyncio.ensure_future(wait_for_disconnect(receive))
+    try:
+        await send({
+            "type": "http.response.start",
+            "status": 200,
+            "headers": [(b"content-type", b"text/event-stream"),
+                        (b"cache-control", b"no-cache"),
+                        (b"x-accel-buffering", b"no")],
+        })
+        await send({
+            "type": "http.response.body",
+            "body": (
+                f"retry: {RECIPE_EVENTS_RETRY_SECONDS * 1000}\n\n".encode()
+                + b"".join(encode_event(*pair) for pair in missed)
+            ),
+            "more_body": True,
+        })
+        while True:
+            received = asyncio.ensure_future(listener.queue.get())
+            done, _ = await asyncio.wait(
+                (received, disconnected),
+                timeout=RECIPE_EVENTS_HEARTBEAT_SECONDS,
+                return_when=asyncio.FIRST_COMPLETED,
+            )
+            if disconnected in done:
+                received.cancel()
+                return
+            if received in done:
+                event = received.result()
+                body = encode_event(event["id"], event["author"])
+            else:
+                received.cancel()
+                body = b": ping\n\n"
+            await send({"type": "http.response.body", "body": body,
+                        "more_body": True})
+    finally:
+        disconnected.cancel()
+        recipe_event_hub.remove(listener)
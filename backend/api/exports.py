@@ -0,0 +1,300 @@
+"""
+Background exports of the users' data.
+
+Export jobs are rows of the ExportJob table. The `process-export-jobs`
+workers claim the queued ones with a conditional update, so that any
+number of them may poll the same table, render them into files
+of the exports storage, and delete them EXPORT_JOB_TTL after they
+are finished. Each claim stores a token, which the outcome is only
+recorded along with, and the workers refresh the heartbeats of their
+running jobs every EXPORT_HEARTBEAT_INTERVAL. Jobs whose heartbeat
+is older than EXPORT_JOB_TIMEOUT, as their worker died, are queued
+again, and the outcomes of their former claims discarded.
+"""
+
+import json
+import logging
+import tempfile
+import threading
+import uuid
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from datetime import timedelta
+from time import monotonic
+
+from django.core.files import File
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db import close_old_connections, connections, transaction
+from django.utils import timezone
+
+from recipes.models import CartItem, FavoriteItem, Recipe
+from users.constants import (CSV_EXPORT_FORMAT, DONE_EXPORT_STATUS,
+                             FAILED_EXPORT_STATUS, QUEUED_EXPORT_STATUS,
+                             RUNNING_EXPORT_STATUS, SHOPPING_LIST_EXPORT)
+from users.models import ExportJob, Subscription
+
+from .constants import (EXPORT_CHUNK_SIZE, EXPORT_HEARTBEAT_INTERVAL,
+                        EXPORT_HOUSEKEEPING_INTERVAL, EXPORT_JOB_TIMEOUT,
+                        EXPORT_JOB_TTL, EXPORT_SPOOL_MAX_SIZE)
+from .helpers import get_shopping_list, write_csv, write_txt
+
+logger = logging.getLogger(__name__)
+
+
+@transaction.atomic
+def queue_export(user, kind, fileformat):
+    """
+    Queues an export job, unless the same export of the user
+    is already pending, and returns the job. Runs in a transaction
+    so as to look for the pending one on the primary.
+    """
+
+    job = ExportJob.objects.filter(
+        user=user, kind=kind, fileformat=fileformat,
+        status__in=(QUEUED_EXPORT_STATUS, RUNNING_EXPORT_STATUS),
+    ).first()
+    if job is not None:
+        return job
+    return ExportJob.objects.create(user=user, kind=kind,
+                                    fileformat=fileformat)
+
+
+def iterate_in_chunks(queryset):
+    """
+    Iterates the queryset in primary key order, one chunk at a time,
+    so that its prefetches still apply while the memory use stays
+    bounded.
+    """
+
+    last = 0
+    while True:
+        chunk = list(
+            queryset.filter(pk__gt=last).order_by("pk")[:EXPORT_CHUNK_SIZE]
+        )
+        yield from chunk
+        if len(chunk) < EXPORT_CHUNK_SIZE:
+            return
+        last = chunk[-1].pk
+
+
+def get_account_sections(user):
+    yield "profile", {
+        "email": user.email,
+        "username": user.username,
+        "first_name": user.first_name,
+        "last_name": user.last_name,
+        "date_joined": user.date_joined,
+    }
+    yield "recipes", (
+        {
+            "id": recipe.id,
+            "name": recipe.name,
+            "text": recipe.text,
+            "cooking_time": recipe.cooking_time,
+            "image": recipe.image.url,
+            "tags": [tag.slug for tag in recipe.tags.all()],
+            "ingredients": [
+                {
+                    "name": amount.ingredient.name,
+                    "measurement_unit": amount.ingredient.measurement_unit,
+                    "amount": amount.amount,
+                }
+                for amount in recipe.ingredients.all()
+            ],
+            "created": recipe.created,
+        }
+        for recipe in iterate_in_chunks(
+            Recipe.objects.filter(author=user).prefetch_related(
+                "tags", "ingredients__ingredient"
+            )
+        )
+    )
+    for name, list_model in (("favorites", FavoriteItem),
+                             ("shopping_cart", CartItem)):
+        yield name, (
+            {"recipe": recipe_id, "name": recipe_name, "created": created}
+            for recipe_id, recipe_name, created
+            in list_model.objects.filter(user=user).order_by(
+                "created"
+            ).values_list("recipe_id", "recipe__name", "created").iterator()
+        )
+    yield "shopping_list", iter(get_shopping_list(user).values())
+    yield "subscriptions", (
+        {"username": username, "created": created}
+        for username, created in Subscription.objects.filter(
+            follower=user
+        ).order_by("created").values_list(
+            "influencer__username", "created"
+        ).iterator()
+    )
+
+
+def write_account(user, out):
+    """
+    Writes all the data of the user as a JSON object,
+    one list item at a time.
+    """
+
+    def dump(value):
+        return json.dumps(value, cls=DjangoJSONEncoder, ensure_ascii=False)
+
+    out.write("{")
+    for index, (name, value) in enumerate(get_account_sections(user)):
+        out.write(f"{', ' if index else ''}{dump(name)}: ")
+        if isinstance(value, dict):
+            out.write(dump(value))
+            continue
+        out.write("[")
+        for item_index, item in enumerate(value):
+            out.write(f"{', ' if item_index else ''}{dump(item)}")
+        out.write("]")
+    out.write("}\n")
+
+
+def render(job, out):
+    if job.kind == SHOPPING_LIST_EXPORT:
+        write = write_csv if job.fileformat == CSV_EXPORT_FORMAT else write_txt
+        write(get_shopping_list(job.user), out)
+    else:
+        write_account(job.user, out)
+
+
+def get_file_name(job):
+    return f"{job.user_id}/{job.kind}-{job.pk}.{job.fileformat}"
+
+
+def run_export_job(job_id, claim):
+    """
+    Renders the file of a claimed export job, and records the outcome,
+    unless the claim has been lost meanwhile, in which case the file
+    is deleted. Runs in the worker threads, each with its own DB
+    connection.
+    """
+
+    try:
+        job = ExportJob.objects.select_related("user").get(pk=job_id)
+        try:
+            with tempfile.SpooledTemporaryFile(
+                max_size=EXPORT_SPOOL_MAX_SIZE, mode="w+",
+                encoding="utf-8", newline="",
+            ) as out:
+                render(job, out)
+                out.seek(0)
+                job.file.save(get_file_name(job), File(out), save=False)
+        except Exception as error:
+            logger.exception("Export job %s failed", job_id)
+            job.status = FAILED_EXPORT_STATUS
+            job.error = str(error) or error.__class__.__name__
+        else:
+            job.status = DONE_EXPORT_STATUS
+        now = timezone.now()
+        if not ExportJob.objects.filter(
+            pk=job_id, status=RUNNING_EXPORT_STATUS, claim=claim
+        ).update(file=job.file.name, status=job.status, error=job.error,
+                 finished=now, modified=now, claim=None, heartbeat=None):
+            logger.warning("Export job %s was claimed again, "
+                           "discarding its outcome", job_id)
+            if job.file:
+                job.file.delete(save=False)
+    finally:
+        connections.close_all()
+
+
+def claim_jobs(limit):
+    """
+    Marks up to `limit` of the oldest queued jobs as running,
+    skipping those claimed by the other workers meanwhile,
+    and returns the ids of the claimed ones along with their tokens.
+    """
+
+    claimed = []
+    for job_id in ExportJob.objects.filter(
+        status=QUEUED_EXPORT_STATUS
+    ).order_by("created").values_list("id", flat=True)[:limit]:
+        now = timezone.now()
+        claim = uuid.uuid4()
+        if ExportJob.objects.filter(
+            pk=job_id, status=QUEUED_EXPORT_STATUS
+        ).update(status=RUNNING_EXPORT_STATUS, started=now, modified=now,
+                 claim=claim, heartbeat=now):
+            claimed.append((job_id, claim))
+    return claimed
+
+
+def beat(claims):
+    """
+    Refreshes the heartbeats of the jobs still held with the claims.
+    """
+
+    if claims:
+        ExportJob.objects.filter(
+            status=RUNNING_EXPORT_STATUS, claim__in=claims
+        ).update(heartbeat=timezone.now())
+
+
+def clean_up_jobs():
+    """
+    Queues the jobs whose worker stopped reporting again,
+    and deletes the expired ones along with their files.
+    Returns the numbers of both.
+    """
+
+    now = timezone.now()
+    requeued = ExportJob.objects.filter(
+        status=RUNNING_EXPORT_STATUS,
+        heartbeat__lt=now - timedelta(seconds=EXPORT_JOB_TIMEOUT),
+    ).update(status=QUEUED_EXPORT_STATUS, started=None, modified=now,
+             claim=None, heartbeat=None)
+    expired = 0
+    for job in ExportJob.objects.filter(
+        finished__lt=now - timedelta(seconds=EXPORT_JOB_TTL)
+    ).iterator():
+        job.delete()
+        expired += 1
+    return requeued, expired
+
+
+def process_export_jobs(workers=1, poll_interval=1.0, once=False,
+                        stop=None):
+    """
+    Runs the queued export jobs on a pool of `workers` threads,
+    polling for new ones every `poll_interval` seconds until `stop`
+    is set, or, with `once`, until there are no more queued jobs.
+    Waits for the running jobs before returning the number
+    of the processed ones.
+    """
+
+    stop = stop or threading.Event()
+    processed = 0
+    cleaned_at = beaten_at = None
+    running = {}
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        while not stop.is_set():
+            close_old_connections()
+            if (beaten_at is None
+                    or monotonic() - beaten_at > EXPORT_HEARTBEAT_INTERVAL):
+                beat(list(running.values()))
+                beaten_at = monotonic()
+            if (cleaned_at is None
+                    or monotonic() - cleaned_at
+                    > EXPORT_HOUSEKEEPING_INTERVAL):
+                requeued, expired = clean_up_jobs()
+                if requeued or expired:
+                    logger.info("Export jobs requeued: %s, expired: %s",
+                                requeued, expired)
+                cleaned_at = monotonic()
+            for job_id, claim in claim_jobs(workers - len(running)):
+                running[pool.submit(run_export_job, job_id, claim)] = claim
+                processed += 1
+            if running:
+                done, _ = wait(running, timeout=poll_interval,
+                               return_when=FIRST_COMPLETED)
+                for future in done:
+                    del running[future]
+                    if future.exception() is not None:
+                        logger.error("Export job crashed",
+                                     exc_info=future.exception())
+                continue
+            if once:
+                break
+            stop.wait(poll_interval)
+    return processed
@@ -1,5 +1,4 @@
 import base64
-import uuid
 
 from django.core.files.base import ContentFile
 
@@ -17,7 +16,8 @@ class Base64ImageField(ImageField):
         if isinstance(data, str) and data.startswith("data:image"):
             format, imgstr = data.split(";base64,")
             ext = format.split("/")[-1]
-            file_name = f"{uuid.uuid4()}.{ext}"
+            # Named after its content by the storage.
+            file_name = f"image.{ext}"
             data = ContentFile(base64.b64decode(imgstr), name=file_name)
 
         return super().to_internal_value(data)
@@ -43,6 +43,27 @@ class StringToNaturalNumberField(CharField):
         return data
 
 
+class StringToNaturalNumberListField(CharField):
+    """
+    As an input for de-serialization, only accepts a comma-separated
+    string of positive integers, and converts it into a list of them,
+    with the duplicates dropped and the original order preserved.
+    Primarily designed for the validation an type conversion
+    of the query params that the API can potentially handle.
+    """
+
+    error_message = "must be a comma-separated list of positive integers"
+
+    def to_internal_value(self, data):
+        try:
+            data = [int(item) for item in data.split(",")]
+        except ValueError:
+            raise ValidationError(self.error_message)
+        if any(item < 1 for item in data):
+            raise ValidationError(self.error_message)
+        return list(dict.fromkeys(data))
+
+
 class StringToBoolField(CharField):
     """
     As an input for de-serialization, only accepts two strings: `0` and `1`.
@@ -58,3 +79,21 @@ class StringToBoolField(CharField):
         if data == "0":
             return False
         raise ValidationError(self.error_message)
+
+
+class StringToNameListField(CharField):
+    """
+    As an input for de-serialization, only accepts a comma-separated
+    string of names, and converts it into a list of them,
+    with the duplicates dropped and the original order preserved.
+    Primarily designed for the validation an type conversion
+    of the query params that the API can potentially handle.
+    """
+
+    error_message = "must be a comma-separated list of names"
+
+    def to_internal_value(self, data):
+        data = [item.strip() for item in data.split(",")]
+        if not all(data):
+            raise ValidationError(self.error_message)
+        return list(dict.fromkeys(data))
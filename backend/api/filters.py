@@ -1,10 +1,19 @@
-from django_filters.rest_framework import (CharFilter, FilterSet,
-                                           ModelMultipleChoiceFilter,
-                                           NumberFilter)
+from django_filters.rest_framework import (CharFilter, ChoiceFilter, FilterSet,
+                                           MultipleChoiceFilter, NumberFilter)
 
-from django.db.models import OuterRef, Subquery
+from django.db.models import (Exists, FloatField, IntegerField, OuterRef,
+                              Subquery)
+from django.db.models.functions import Coalesce
 
-from recipes.models import CartItem, FavoriteItem, Ingredient, Recipe, Tag
+from rest_framework.serializers import ValidationError
+
+from recipes.models import (CartItem, FavoriteItem, Ingredient, Recipe,
+                            RecipeTag)
+from recipes.tag_slugs import tag_slugs
+from users.models import Subscription
+
+from .constants import (ALL_TAGS_FILTER_MODE, POPULAR_RECIPES_ORDERING,
+                        TAGS_FILTER_MODE_CHOICES, TRENDING_RECIPES_ORDERING)
 
 
 class FilterIngredientsByName(FilterSet):
@@ -25,15 +34,47 @@ class FilterRecipesByTagsAndAuthor(FilterSet):
     """
 
     author = NumberFilter(field_name="author__id", lookup_expr="exact")
-    tags = ModelMultipleChoiceFilter(
-        queryset=Tag.objects.all(),
-        field_name="tags__slug",
-        to_field_name="slug",
+    tags = MultipleChoiceFilter(
+        choices=tag_slugs.get_choices,
+        method="filter_tags",
+    )
+    tags_mode = ChoiceFilter(
+        choices=TAGS_FILTER_MODE_CHOICES,
+        method="filter_tags_mode",
     )
 
     class Meta:
         model = Recipe
-        fields = ("tags", "author")
+        fields = ("tags", "tags_mode", "author")
+
+    def filter_tags(self, queryset, name, value):
+        """
+        Semi-joins RecipeTag by tag id instead of joining the tags,
+        so that no recipe is listed twice. Keeps the recipes having
+        any of the tags, or all of them in the `all` mode.
+        """
+
+        ids = tag_slugs.get_ids()
+        # The map may have been refreshed since the slugs got validated.
+        unknown = [slug for slug in value if slug not in ids]
+        if unknown:
+            raise ValidationError(
+                {"tags": f"unknown tags: {', '.join(sorted(unknown))}"}
+            )
+        tagged = RecipeTag.objects.filter(recipe=OuterRef("pk"))
+        if self.form.cleaned_data.get("tags_mode") == ALL_TAGS_FILTER_MODE:
+            for slug in value:
+                queryset = queryset.filter(
+                    Exists(tagged.filter(tag_id=ids[slug]))
+                )
+            return queryset
+        return queryset.filter(
+            Exists(tagged.filter(tag_id__in=[ids[slug] for slug in value]))
+        )
+
+    def filter_tags_mode(self, queryset, name, value):
+        # Only alters the way the tags filter is applied.
+        return queryset
 
 
 def filter_recipes_by_query_params(queryset, user, params):
@@ -77,3 +118,60 @@ def filter_recipes_by_query_params(queryset, user, params):
         return outer_join(queryset, subquery(CartItem, user))
 
     return queryset
+
+
+def order_recipes_by_ranking(queryset, ordering):
+    """
+    Orders Recipe model viewset queryset by the materialized rankings,
+    if requested via the `ordering` query param. Recipes created
+    without the post_save signal (bulk_create, loaddata) lack a ranking
+    until `rebuild-recipe-rankings` runs, and rank as if never added
+    to any favorites or carts rather than dropping out of the list.
+    """
+
+    if ordering == POPULAR_RECIPES_ORDERING:
+        return queryset.order_by(
+            Coalesce("ranking__popularity", 0,
+                     output_field=IntegerField()).desc(),
+            "-id",
+        )
+    if ordering == TRENDING_RECIPES_ORDERING:
+        return queryset.order_by(
+            Coalesce("ranking__trending", 0.0,
+                     output_field=FloatField()).desc(),
+            "-id",
+        )
+    return queryset
+
+
+def annotate_is_subscribed(queryset, user):
+    """
+    Annotates User model queryset with `is_subscribed`, whether
+    the given user follows each of the users, so that serializing them
+    takes no query per user.
+    """
+
+    if not user.is_authenticated:
+        return queryset
+    return queryset.annotate(is_subscribed=Exists(
+        Subscription.objects.filter(follower=user, influencer=OuterRef("pk"))
+    ))
+
+
+def annotate_is_listed(queryset, user):
+    """
+    Annotates Recipe model queryset with `is_favorited`
+    and `is_in_shopping_cart`, whether each of the recipes is
+    in the given user's favorites and cart.
+    """
+
+    if not user.is_authenticated:
+        return queryset
+    return queryset.annotate(
+        is_favorited=Exists(
+            FavoriteItem.objects.filter(user=user, recipe=OuterRef("pk"))
+        ),
+        is_in_shopping_cart=Exists(
+            CartItem.objects.filter(user=user, recipe=OuterRef("pk"))
+        ),
+    )
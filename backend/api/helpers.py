@@ -1,18 +1,25 @@
 import csv
 
-from django.http import HttpResponse
-from django.shortcuts import get_object_or_404
+from django.db import transaction
+from django.http import Http404, HttpResponse
+from django.urls import reverse
+from django.utils import timezone
 
 from rest_framework.response import Response
-from rest_framework.status import (HTTP_201_CREATED, HTTP_204_NO_CONTENT,
-                                   HTTP_400_BAD_REQUEST)
+from rest_framework.status import (HTTP_201_CREATED, HTTP_202_ACCEPTED,
+                                   HTTP_204_NO_CONTENT, HTTP_400_BAD_REQUEST)
 
-from recipes.models import Recipe
+from core.cache import tiered_cache
+from core.db import delete_matching, insert_unless_exists
+from recipes import rankings, shopping_lists
+from recipes.models import CartItem, Recipe, ShoppingListItem
 from users.models import CustomUser as User
 from users.models import Subscription
 
-from .serializers import (ChangePasswordSerializer, ExtendedUserShowSerializer,
-                          MinifiedRecipeSerializer, QueryParamsSerializer)
+from .events import FOLLOW_EVENT, UNFOLLOW_EVENT, recipe_event_hub
+from .serializers import (ChangePasswordSerializer, ExportJobSerializer,
+                          ExtendedUserShowSerializer, MinifiedRecipeSerializer,
+                          QueryParamsSerializer)
 
 
 def set_new_password(user, data):
@@ -24,18 +31,31 @@ def set_new_password(user, data):
     return Response(status=HTTP_204_NO_CONTENT)
 
 
+def get_timestamps():
+    now = timezone.now()
+    return {"created": now, "modified": now}
+
+
 def subscribe_to(pk, request):
     serializer = QueryParamsSerializer(data={"pk": pk})
     serializer.is_valid(raise_exception=True)
     if request.user.id == serializer.validated_data["pk"]:
         return Response(data={"error": "you cannot follow yourself"},
                         status=HTTP_400_BAD_REQUEST)
-    subscription, _ = Subscription.objects.get_or_create(
-        follower=request.user,
-        influencer=get_object_or_404(User, id=serializer.validated_data["pk"])
+    result = insert_unless_exists(
+        Subscription,
+        {"follower": request.user.id, **get_timestamps()},
+        "influencer", serializer.validated_data["pk"],
+        ("id", "email", "username", "first_name", "last_name"),
     )
+    if result is None:
+        raise Http404
+    influencer, created = result
+    if created:
+        tiered_cache.invalidate_tags(Subscription._meta.label)
+        recipe_event_hub.publish(FOLLOW_EVENT, request.user.id, influencer.id)
     output = ExtendedUserShowSerializer(
-        instance=subscription.influencer,
+        instance=influencer,
         context={"request": request}
     )
     return Response(data=output.data, status=HTTP_201_CREATED)
@@ -44,61 +64,115 @@ def subscribe_to(pk, request):
 def unsubscribe_from(pk, request):
     serializer = QueryParamsSerializer(data={"pk": pk})
     serializer.is_valid(raise_exception=True)
-    influencer = get_object_or_404(User, id=serializer.validated_data["pk"])
-    subscription = Subscription.objects.filter(follower=request.user.id,
-                                               influencer=influencer.id)
-    if subscription.exists():
-        subscription.delete()
+    # Bypasses the deletion signals, the cache tag is invalidated below.
+    deleted = delete_matching(Subscription, {
+        "follower": request.user.id,
+        "influencer": serializer.validated_data["pk"],
+    })
+    if deleted:
+        tiered_cache.invalidate_tags(Subscription._meta.label)
+        recipe_event_hub.publish(UNFOLLOW_EVENT, request.user.id,
+                                 serializer.validated_data["pk"])
+    elif not User.objects.filter(id=serializer.validated_data["pk"]).exists():
+        raise Http404
     return Response(status=HTTP_204_NO_CONTENT)
 
 
 def add_recipe_to_user_list(list_model, user, pk):
     serializer = QueryParamsSerializer(data={"pk": pk})
     serializer.is_valid(raise_exception=True)
-    recipe = get_object_or_404(Recipe, id=serializer.validated_data["pk"])
-    item, _ = list_model.objects.get_or_create(user=user,
-                                               recipe=recipe)
-    output = MinifiedRecipeSerializer(instance=item.recipe)
+    timestamps = get_timestamps()
+    # The aggregates are only ever adjusted along with the list itself.
+    with transaction.atomic():
+        result = insert_unless_exists(
+            list_model, {"user": user.id, **timestamps},
+            "recipe", serializer.validated_data["pk"],
+            ("id", "name", "image", "cooking_time"),
+        )
+        if result is None:
+            raise Http404
+        recipe, created = result
+        if created:
+            rankings.record_addition(list_model, recipe.id,
+                                     timestamps["created"])
+            if list_model is CartItem:
+                shopping_lists.record_addition(user.id, recipe.id)
+    if created:
+        tiered_cache.invalidate_tags(list_model._meta.label)
+    output = MinifiedRecipeSerializer(instance=recipe)
     return Response(data=output.data, status=HTTP_201_CREATED)
 
 
 def remove_recipe_from_user_list(list_model, user, pk):
     serializer = QueryParamsSerializer(data={"pk": pk})
     serializer.is_valid(raise_exception=True)
-    recipe = get_object_or_404(Recipe, id=serializer.validated_data["pk"])
-    item = list_model.objects.filter(user=user.id,
-                                     recipe=recipe.id)
-    if item.exists():
-        item.delete()
+    recipe_id = serializer.validated_data["pk"]
+    with transaction.atomic():
+        # Bypasses the deletion signals, so the rankings, the shopping
+        # list and the cache tag are all taken care of here.
+        deleted = delete_matching(list_model, {"user": user.id,
+                                               "recipe": recipe_id})
+        if deleted:
+            rankings.record_removal(list_model, recipe_id)
+            if list_model is CartItem:
+                shopping_lists.record_removal(user.id, recipe_id)
+    if deleted:
+        tiered_cache.invalidate_tags(list_model._meta.label)
+    elif not Recipe.objects.filter(id=recipe_id).exists():
+        raise Http404
     return Response(status=HTTP_204_NO_CONTENT)
 
 
-def reduce_cart(shopping_cart):
-    output = {}
-    for recipe in shopping_cart:
-        for amount in recipe.ingredients.all():
-            if amount.ingredient.id not in output.keys():
-                output[amount.ingredient.id] = {
-                    "measurement_unit": amount.ingredient.measurement_unit,
-                    "name": amount.ingredient.name,
-                    "amount": amount.amount,
-                }
-            else:
-                output[amount.ingredient.id]["amount"] += amount.amount
-    return output
+def get_shopping_list(user):
+    return {
+        ingredient_id: {
+            "measurement_unit": measurement_unit,
+            "name": name,
+            "amount": amount,
+        }
+        for ingredient_id, name, measurement_unit, amount
+        in ShoppingListItem.objects.filter(user=user.id).values_list(
+            "ingredient_id", "ingredient__name",
+            "ingredient__measurement_unit", "amount",
+        )
+    }
+
+
+def create_export_job_response(request, job):
+    serializer = ExportJobSerializer(instance=job,
+                                     context={"request": request})
+    return Response(
+        data=serializer.data,
+        status=HTTP_202_ACCEPTED,
+        headers={"Location": request.build_absolute_uri(
+            reverse("api:exports-detail", kwargs={"pk": job.pk})
+        )},
+    )
 
 
-def create_csv_response(shopping_cart):
-    response = HttpResponse(content_type="text/csv")
-    response["Content-Disposition"] = (
-        'attachment; filename="shopping_cart.csv"'
-    )
-    writer = csv.writer(response)
+def write_csv(shopping_cart, out):
+    writer = csv.writer(out)
     writer.writerow(["Список продуктов"])
     for _, ingredient in shopping_cart.items():
         writer.writerow([ingredient["name"],
                          ingredient["amount"],
                          ingredient["measurement_unit"]])
+
+
+def write_txt(shopping_cart, out):
+    out.write("Список продуктов\n")
+    for _, ingredient in shopping_cart.items():
+        out.write(f"{ingredient['name']}: "
+                  f"{ingredient['amount']} "
+                  f"{ingredient['measurement_unit']}\n")
+
+
+def create_csv_response(shopping_cart):
+    response = HttpResponse(content_type="text/csv")
+    response["Content-Disposition"] = (
+        'attachment; filename="shopping_cart.csv"'
+    )
+    write_csv(shopping_cart, response)
     return response
 
 
@@ -107,9 +181,5 @@ def create_txt_response(shopping_cart):
     response["Content-Disposition"] = (
         'attachment; filename="shopping_cart.txt"'
     )
-    response.write("Список продуктов\n")
-    for _, ingredient in shopping_cart.items():
-        response.write(f"{ingredient['name']}: "
-                       f"{ingredient['amount']} "
-                       f"{ingredient['measurement_unit']}\n")
+    write_txt(shopping_cart, response)
     return response
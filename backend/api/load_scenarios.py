@@ -0,0 +1,129 @@
+"""
+Load test scenarios, built of the requests
+of the postman-collection/foodgram.postman_collection.json.
+Every virtual user signs up afresh, so that the users' flows
+do not interfere with each other.
+"""
+
+import itertools
+import json
+import time
+from urllib.parse import quote
+
+from django.db import transaction
+
+from core.loadtest import Scenario
+from recipes.rankings import rebuild_rankings
+from users.models import CustomUser as User
+
+from .constants import LOAD_TEST_USERNAME_PREFIX
+
+SIGN_UP = (
+    ("create_first_user", {"userId": "id"}),
+    ("get_token_for_first_user", {"userToken": "auth_token",
+                                  "secondUserToken": "auth_token"}),
+)
+
+# Run once before the load, looking up the catalog entries the recipes
+# are created with and filtered by, and checking there are recipes.
+SETUP = Scenario("setup", 0, (
+    ("get_tag_list // No Auth", {
+        "firstTagId": "0.id",
+        "secondTagId": "1.id",
+        "thirdTagId": "2.id",
+        "secondTagSlug": "1.slug",
+        "thirdTagSlug": "2.slug",
+    }),
+    ("get_ingredients_list // No Auth", {
+        "firstIndredientId": "0.id",
+        "secondIndredientId": "1.id",
+        "firstIngredientName": "0.name",
+    }),
+    ("get_recipes_list // No Auth", {"firstRecipeId": "results.0.id"}),
+))
+
+SCENARIOS = (
+    Scenario("browse", 50, (
+        ("get_tag_list // No Auth", None),
+        ("get_recipes_list // No Auth", {"firstRecipeId": "results.0.id"}),
+        ("get_recipe_detail // No Auth", None),
+    )),
+    Scenario("sign-up", 10, (
+        *SIGN_UP,
+        ("users_me // User", None),
+        ("get_recipes_list // User", None),
+        ("get_recipes_list_with_two_tags_param // User", None),
+    )),
+    Scenario("shop", 20, (
+        *SIGN_UP,
+        ("get_recipes_list // User", {"firstRecipeId": "results.0.id"}),
+        ("get_recipe_detail // User", None),
+        ("add_to_favorite // User", None),
+        ("add_to_shopping_cart // User", None),
+        ("get_recipes_list_with_is_in_shopping_cart_param // User", None),
+        ("download_shopping_cart // User", None),
+        ("remove_from_shopping_cart // User", None),
+        ("remove_from_favorite // User", None),
+    )),
+    Scenario("author", 10, (
+        *SIGN_UP,
+        ("get_ingredients_list_with_name_filter // User", None),
+        ("create_first_recipe // Second User", {"firstRecipeId": "id"}),
+        ("update_recipe // Second User", None),
+        ("get_recipe_detail // User", None),
+        ("get_recipes_list_with_author_param // User", None),
+    )),
+    Scenario("follow", 10, (
+        *SIGN_UP,
+        ("get_recipes_list // User", {"thirdUserId": "results.0.author.id"}),
+        ("create_subscription // User", None),
+        ("get_subscription_list // User", None),
+        ("delete_first_subscription // User", None),
+    )),
+)
+
+
+def get_setup_variables(variables):
+    return {
+        **variables,
+        "ingredientNameFirstLatter": quote(
+            variables["firstIngredientName"][0]
+        ),
+    }
+
+
+def make_virtual_user_variables(shared):
+    """
+    Returns a function giving every virtual user
+    its own credentials on top of the shared variables.
+    """
+
+    run = f"{LOAD_TEST_USERNAME_PREFIX}{time.time_ns():x}"
+    numbers = itertools.count()
+
+    def get_variables():
+        username = f"{run}-{next(numbers)}"
+        return {
+            **shared,
+            "username": json.dumps(username),
+            "email": json.dumps(f"{username}@example.com"),
+        }
+
+    return get_variables
+
+
+@transaction.atomic
+def reset_load_test_data():
+    """
+    Deletes the load test users along with everything they created,
+    the way postman-collection/clear_db.sh does for the collection run.
+    Returns the number of users deleted.
+    """
+
+    deleted = User.objects.filter(
+        username__startswith=LOAD_TEST_USERNAME_PREFIX
+    ).delete()[1].get(User._meta.label, 0)
+    # Cascading deletes bypass the incremental rankings maintenance.
+    if deleted:
+        rebuild_rankings()
+    return deleted
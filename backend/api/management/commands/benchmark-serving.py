@@ -0,0 +1,197 @@
+import http.client
+import itertools
+import os
+import socket
+import subprocess
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+from core.loadtest import (get_children, get_cpu_count, get_memory_usage,
+                           summarize_latencies)
+
+DEFAULT_CONFIGS = (
+    "sync:1:1:off",
+    "sync:auto:1:on",
+    "gthread:auto:4:off",
+    "gthread:auto:4:on",
+)
+SERVER_START_TIMEOUT = 60
+
+
+def parse_config(value):
+    try:
+        worker_class, workers, threads, preload = value.split(":")
+        workers = (2 * get_cpu_count() + 1 if workers == "auto"
+                   else int(workers))
+        threads = int(threads)
+    except ValueError:
+        raise CommandError(
+            f"invalid config {value!r}, expected "
+            f"worker_class:workers|auto:threads:on|off"
+        )
+    return worker_class, workers, threads, preload == "on"
+
+
+class Command(BaseCommand):
+
+    help = (
+        "Start gunicorn with each of the given configurations in turn, "
+        "load it with concurrent requests, and compare the throughput, "
+        "latency and memory usage of the configurations"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "configs",
+            nargs="*",
+            default=DEFAULT_CONFIGS,
+            help=("worker_class:workers:threads:preload, with `auto` "
+                  "workers meaning 2 * cores + 1, e.g. gthread:auto:4:on"),
+        )
+        parser.add_argument("--path", default="/api/recipes/")
+        parser.add_argument("--token", help="authenticate the requests")
+        parser.add_argument("--requests", type=int, default=2000)
+        parser.add_argument("--concurrency", type=int, default=32)
+        parser.add_argument(
+            "--slow-clients",
+            type=int,
+            default=0,
+            help=("number of clients uploading their requests bodies "
+                  "slowly while the load runs"),
+        )
+        parser.add_argument("--port", type=int, default=8765)
+
+    def handle(self, *args, **kwargs):
+        self.port = kwargs["port"]
+        self.headers = {"Host": "localhost"}
+        if kwargs["token"]:
+            self.headers["Authorization"] = f"Token {kwargs['token']}"
+
+        self.stdout.write(
+            f"{'config':<24}{'start s':>8}{'req/s':>9}"
+            f"{'p50 ms':>9}{'p95 ms':>9}{'p99 ms':>9}{'errors':>8}"
+            f"{'RSS MiB':>9}{'PSS MiB':>9}"
+        )
+        for config in kwargs["configs"]:
+            worker_class, workers, threads, preload = parse_config(config)
+            server, started = self.start_server(worker_class, workers,
+                                                threads, preload)
+            try:
+                result = self.run_load(kwargs["path"], kwargs["requests"],
+                                       kwargs["concurrency"],
+                                       kwargs["slow_clients"])
+                rss, pss = get_memory_usage(server.pid)
+            finally:
+                server.terminate()
+                server.wait()
+            rps, latencies, errors = result
+            percentiles = summarize_latencies(latencies)
+            self.stdout.write(
+                f"{config:<24}{started:>8.2f}{rps:>9.1f}"
+                + "".join(f"{value:>9.1f}" for value in percentiles.values())
+                + f"{errors:>8}{rss / 2 ** 20:>9.1f}{pss / 2 ** 20:>9.1f}"
+            )
+
+    def start_server(self, worker_class, workers, threads, preload):
+        """
+        Starts gunicorn and waits until all of its workers are ready.
+        Returns the process along with the time it took to start.
+        """
+
+        environ = {
+            **os.environ,
+            "GUNICORN_BIND": f"127.0.0.1:{self.port}",
+            "GUNICORN_WORKER_CLASS": worker_class,
+            "GUNICORN_WORKERS": str(workers),
+            "GUNICORN_THREADS": str(threads),
+            "GUNICORN_PRELOAD": str(preload),
+            "GUNICORN_ACCESS_LOG": "",
+            "GUNICORN_LOG_LEVEL": "warning",
+        }
+        started = time.monotonic()
+        server = subprocess.Popen(
+            (sys.executable, "-m", "gunicorn",
+             "--config", "gunicorn.conf.py", "backend.wsgi:application"),
+            cwd=settings.BASE_DIR,
+            env=environ,
+            stdout=subprocess.DEVNULL,
+        )
+        while time.monotonic() - started < SERVER_START_TIMEOUT:
+            if server.poll() is not None:
+                raise CommandError("gunicorn exited, see its output above")
+            try:
+                status = self.request(http.client.HTTPConnection(
+                    "127.0.0.1", self.port, timeout=SERVER_START_TIMEOUT
+                ), "/api/health/")
+            except OSError:
+                status = None
+            if status != 200:
+                time.sleep(0.05)
+                continue
+            if len(get_children(server.pid)) >= workers:
+                return server, time.monotonic() - started
+        server.terminate()
+        raise CommandError("gunicorn did not start in time")
+
+    def request(self, connection, path):
+        connection.request("GET", path, headers=self.headers)
+        response = connection.getresponse()
+        response.read()
+        return response.status
+
+    def run_load(self, path, total, concurrency, slow_clients):
+        """
+        Sends `total` requests over `concurrency` keep-alive connections.
+        Returns the requests per second, latencies and number of errors.
+        """
+
+        counter = itertools.count()
+        finished = threading.Event()
+
+        def send_requests():
+            connection = http.client.HTTPConnection(
+                "127.0.0.1", self.port, timeout=SERVER_START_TIMEOUT
+            )
+            latencies, errors = [], 0
+            while next(counter) < total:
+                started = time.monotonic()
+                try:
+                    status = self.request(connection, path)
+                except (OSError, http.client.HTTPException):
+                    connection.close()
+                    status = None
+                latencies.append(time.monotonic() - started)
+                errors += status is None or status >= 400
+            connection.close()
+            return latencies, errors
+
+        def upload_slowly():
+            with socket.create_connection(("127.0.0.1", self.port)) as sock:
+                sock.sendall(
+                    b"POST /api/users/ HTTP/1.1\r\nHost: localhost\r\n"
+                    b"Content-Type: application/json\r\n"
+                    b"Content-Length: 1048576\r\n\r\n"
+                )
+                while not finished.wait(0.1):
+                    sock.sendall(b" ")
+
+        with ThreadPoolExecutor(concurrency + slow_clients) as executor:
+            for _ in range(slow_clients):
+                executor.submit(upload_slowly)
+            # Lets the slow clients occupy the workers first.
+            time.sleep(0.5 if slow_clients else 0)
+            started = time.monotonic()
+            futures = [executor.submit(send_requests)
+                       for _ in range(concurrency)]
+            results = [future.result() for future in futures]
+            elapsed = time.monotonic() - started
+            finished.set()
+
+        latencies = [value for result, _ in results for value in result]
+        return (len(latencies) / elapsed, latencies,
+                sum(errors for _, errors in results))
@@ -0,0 +1,62 @@
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+
+from core.db import explain
+
+from ...query_plans import find_sequential_scans, get_hot_queries
+
+
+class Command(BaseCommand):
+
+    help = (
+        "EXPLAIN the hot API queries and fail if any of them "
+        "sequentially scans a large table. Meant to be run against "
+        "a PostgreSQL database seeded to the production scale"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--min-rows",
+            type=int,
+            default=10000,
+            help="only flag the scans of the tables at least this large",
+        )
+        parser.add_argument(
+            "--plans",
+            action="store_true",
+            help="print the plan of every query",
+        )
+
+    def handle(self, *args, **kwargs):
+        if connection.vendor != "postgresql":
+            raise CommandError("query plans are only checked on PostgreSQL")
+        queries = get_hot_queries()
+        if queries is None:
+            raise CommandError("the database has to be seeded first")
+
+        with connection.cursor() as cursor:
+            cursor.execute(
+                "SELECT relname FROM pg_class "
+                "WHERE relkind = 'r' AND reltuples >= %s",
+                (kwargs["min_rows"], ),
+            )
+            large_tables = {row[0] for row in cursor.fetchall()}
+
+        scans = find_sequential_scans(queries, large_tables)
+        for name, queryset in queries.items():
+            if kwargs["plans"]:
+                self.stdout.write(
+                    f"{name}:\n{queryset.query}\n{explain(queryset)}\n"
+                )
+            if name in scans:
+                self.stdout.write(self.style.ERROR(
+                    f"{name}: sequential scan on {', '.join(scans[name])}"
+                ))
+            else:
+                self.stdout.write(f"{name}: ok")
+
+        if scans:
+            raise CommandError(
+                f"{len(scans)} queries degraded to sequential scans"
+            )
+        self.stdout.write(self.style.SUCCESS("All query plans use indexes"))
@@ -0,0 +1,152 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from core.loadtest import (LoadTestStats, PostmanCollection, Scenario,
+                           ScenarioFailed, VirtualUser, run_load_test,
+                           summarize_latencies)
+
+from ...load_scenarios import (SCENARIOS, SETUP, get_setup_variables,
+                               make_virtual_user_variables,
+                               reset_load_test_data)
+
+
+def parse_stage(value):
+    try:
+        rate, duration = map(float, value.split(":"))
+    except ValueError:
+        raise CommandError(f"invalid stage {value!r}, expected rate:seconds")
+    if rate <= 0 or duration <= 0:
+        raise CommandError(f"invalid stage {value!r}, both must be positive")
+    return rate, duration
+
+
+class Command(BaseCommand):
+
+    help = (
+        "Replay the Postman collection flows as weighted virtual user "
+        "scenarios against a running server, and report the throughput, "
+        "latency percentiles and error rate of every endpoint"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--base-url", default="http://127.0.0.1:8000")
+        parser.add_argument(
+            "--collection",
+            required=True,
+            help=("path to foodgram.postman_collection.json, which lives "
+                  "in the repository rather than in the backend image"),
+        )
+        parser.add_argument(
+            "--stages",
+            nargs="+",
+            default=("1:30", ),
+            help=("arrival rates of the virtual users, as users per second "
+                  "and for how many seconds, e.g. 1:30 5:60"),
+        )
+        parser.add_argument(
+            "--weights",
+            nargs="+",
+            default=(),
+            help=("overrides of the scenario weights, e.g. shop=0. "
+                  f"Scenarios: {', '.join(s.name for s in SCENARIOS)}"),
+        )
+        parser.add_argument(
+            "--max-users",
+            type=int,
+            default=50,
+            help="number of virtual users active at once",
+        )
+        parser.add_argument(
+            "--think-time",
+            type=float,
+            default=0.5,
+            help="mean pause between the steps of a scenario, in seconds",
+        )
+        parser.add_argument(
+            "--no-reset",
+            action="store_true",
+            help="keep the data of the previous runs",
+        )
+        parser.add_argument(
+            "--reset-only",
+            action="store_true",
+            help="delete the data of the previous runs and exit",
+        )
+
+    def handle(self, *args, **kwargs):
+        if not kwargs["no_reset"]:
+            deleted = reset_load_test_data()
+            self.stdout.write(f"Deleted {deleted} load test users")
+        if kwargs["reset_only"]:
+            return
+
+        stages = [parse_stage(stage) for stage in kwargs["stages"]]
+        scenarios = self.get_scenarios(kwargs["weights"])
+        try:
+            collection = PostmanCollection(kwargs["collection"])
+        except OSError as error:
+            raise CommandError(f"cannot read the collection: {error}")
+        missing = {
+            name for scenario in (SETUP, *scenarios)
+            for name, _ in scenario.steps
+        } - collection.requests.keys()
+        if missing:
+            raise CommandError(
+                f"requests missing from the collection: {sorted(missing)}"
+            )
+
+        setup = VirtualUser(kwargs["base_url"], collection,
+                            dict(collection.variables), LoadTestStats(), 0)
+        try:
+            setup.run(SETUP)
+        except ScenarioFailed as error:
+            raise CommandError(
+                f"setup failed, at least 3 tags, 2 ingredients "
+                f"and a recipe are required: {error}"
+            )
+
+        stats, elapsed = run_load_test(
+            kwargs["base_url"], collection, scenarios, stages,
+            kwargs["max_users"], kwargs["think_time"],
+            make_virtual_user_variables(get_setup_variables(setup.variables)),
+        )
+        self.report(stats, elapsed)
+
+    def get_scenarios(self, overrides):
+        weights = {scenario.name: scenario.weight for scenario in SCENARIOS}
+        for override in overrides:
+            name, _, weight = override.partition("=")
+            if name not in weights or not weight.isdigit():
+                raise CommandError(f"invalid weight {override!r}")
+            weights[name] = int(weight)
+        scenarios = [
+            Scenario(scenario.name, weights[scenario.name], scenario.steps)
+            for scenario in SCENARIOS if weights[scenario.name]
+        ]
+        if not scenarios:
+            raise CommandError("all the scenarios are weighted 0")
+        return scenarios
+
+    def report(self, stats, elapsed):
+        self.stdout.write(
+            f"\n{'endpoint':<56}{'requests':>9}{'req/s':>8}"
+            f"{'p50 ms':>9}{'p95 ms':>9}{'p99 ms':>9}{'errors':>8}"
+        )
+        for endpoint, count, rps, percentiles, error_rate in stats.summarize(
+            elapsed
+        ):
+            self.stdout.write(
+                f"{endpoint:<56}{count:>9}{rps:>8.1f}"
+                + "".join(f"{value:>9.1f}" for value in percentiles.values())
+                + f"{error_rate:>8.1%}"
+            )
+        self.stdout.write(f"\n{'scenario':<24}{'runs':>9}{'failed':>8}")
+        for name, (runs, failed) in sorted(stats.scenarios.items()):
+            self.stdout.write(f"{name:<24}{runs:>9}{failed:>8}")
+        for failure, count in sorted(stats.failures.items(),
+                                     key=lambda item: -item[1]):
+            self.stdout.write(self.style.ERROR(f"{count} x {failure}"))
+        start_lag = summarize_latencies(stats.start_lags)
+        self.stdout.write(
+            f"\nElapsed {elapsed:.1f}s, p95 start lag of the virtual users "
+            f"{start_lag[95]:.1f} ms (grows once --max-users is saturated)"
+        )
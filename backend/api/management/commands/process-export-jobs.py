@@ -0,0 +1,47 @@
+import signal
+import threading
+
+from django.core.management.base import BaseCommand
+
+from ...exports import process_export_jobs
+
+
+class Command(BaseCommand):
+
+    help = (
+        "Run the queued export jobs on a pool of worker threads, "
+        "polling for new ones until terminated"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--workers",
+            type=int,
+            default=4,
+            help="number of the jobs to run at once",
+        )
+        parser.add_argument(
+            "--poll-interval",
+            type=float,
+            default=1.0,
+            help="seconds to wait between the polls for new jobs",
+        )
+        parser.add_argument(
+            "--once",
+            action="store_true",
+            help="exit once there are no more queued jobs",
+        )
+
+    def handle(self, *args, **kwargs):
+        stop = threading.Event()
+        for signum in (signal.SIGTERM, signal.SIGINT):
+            signal.signal(signum, lambda *args: stop.set())
+        processed = process_export_jobs(
+            workers=max(kwargs["workers"], 1),
+            poll_interval=kwargs["poll_interval"],
+            once=kwargs["once"],
+            stop=stop,
+        )
+        self.stdout.write(
+            self.style.SUCCESS(f"Export jobs processed: {processed}")
+        )
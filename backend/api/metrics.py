@@ -0,0 +1,254 @@
+import random
+import threading
+from bisect import bisect_left
+from contextlib import ExitStack
+from contextvars import ContextVar
+from time import perf_counter
+
+from django.conf import settings
+from django.db import connections
+from django.urls import Resolver404, resolve
+
+from rest_framework.serializers import ListSerializer, Serializer
+
+from core.cache import tiered_cache
+
+from .constants import (METRICS_DURATION_BUCKETS, METRICS_NAMESPACE,
+                        METRICS_QUERY_COUNT_BUCKETS)
+from .warmup import warm_up
+
+current_timings = ContextVar("current_timings", default=None)
+
+
+class RequestTimings:
+    """
+    Collects the timings of a single request, in seconds.
+    """
+
+    def __init__(self):
+        self.started = perf_counter()
+        self.route = None
+        self.db = 0.0
+        self.queries = 0
+        self.serialize = 0.0
+        self.render = 0.0
+        self.total = 0.0
+        self.render_started = None
+        self.serializing = False
+
+    def execute_wrapper(self, execute, sql, params, many, context):
+        started = perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.db += perf_counter() - started
+            self.queries += 1
+
+    def as_server_timing(self):
+        return ", ".join((
+            f'db;dur={self.db * 1000:.1f};desc="{self.queries} queries"',
+            f"serialize;dur={self.serialize * 1000:.1f}",
+            f"render;dur={self.render * 1000:.1f}",
+            f"total;dur={self.total * 1000:.1f}",
+        ))
+
+
+class Histogram:
+    """
+    Cumulative histogram in the Prometheus sense.
+    """
+
+    def __init__(self, buckets):
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, value):
+        self.counts[bisect_left(self.buckets, value)] += 1
+        self.sum += value
+        self.count += 1
+
+    def expose(self, name, labels):
+        lines = []
+        cumulative = 0
+        for bound, count in zip(self.buckets + ("+Inf", ), self.counts):
+            cumulative += count
+            lines.append(f'{name}_bucket{{{labels},le="{bound}"}} '
+                         f"{cumulative}")
+        lines.append(f"{name}_sum{{{labels}}} {self.sum}")
+        lines.append(f"{name}_count{{{labels}}} {self.count}")
+        return lines
+
+
+class MetricsRegistry:
+    """
+    Aggregates the timings of the sampled requests into per-route
+    histograms. Lives in process memory, so with several workers
+    every one of them exposes its own share of the traffic.
+    """
+
+    phases = ("db", "serialize", "render", "total")
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.durations = {}
+        self.query_counts = {}
+
+    def observe(self, timings):
+        with self.lock:
+            for phase in self.phases:
+                key = (timings.route, phase)
+                if key not in self.durations:
+                    self.durations[key] = Histogram(METRICS_DURATION_BUCKETS)
+                self.durations[key].observe(getattr(timings, phase))
+            if timings.route not in self.query_counts:
+                self.query_counts[timings.route] = Histogram(
+                    METRICS_QUERY_COUNT_BUCKETS
+                )
+            self.query_counts[timings.route].observe(timings.queries)
+
+    def expose(self):
+        duration = f"{METRICS_NAMESPACE}_request_duration_seconds"
+        queries = f"{METRICS_NAMESPACE}_request_db_queries"
+        lines = [
+            f"# HELP {duration} Time spent per request phase.",
+            f"# TYPE {duration} histogram",
+        ]
+        with self.lock:
+            for (route, phase), histogram in sorted(self.durations.items()):
+                lines += histogram.expose(
+                    duration, f'route="{route}",phase="{phase}"'
+                )
+            lines += [
+                f"# HELP {queries} Number of DB queries per request.",
+                f"# TYPE {queries} histogram",
+            ]
+            for route, histogram in sorted(self.query_counts.items()):
+                lines += histogram.expose(queries, f'route="{route}"')
+        cache_events = f"{METRICS_NAMESPACE}_cache_events_total"
+        lines += [
+            f"# HELP {cache_events} Tiered cache hits, misses & writes.",
+            f"# TYPE {cache_events} counter",
+        ]
+        for event, count in tiered_cache.stats.as_dict().items():
+            lines.append(f'{cache_events}{{event="{event}"}} {count}')
+        ready = f"{METRICS_NAMESPACE}_ready"
+        warm_up_duration = f"{METRICS_NAMESPACE}_warm_up_duration_seconds"
+        lines += [
+            f"# HELP {ready} Whether the process has warmed up.",
+            f"# TYPE {ready} gauge",
+            f"{ready} {int(warm_up.ready)}",
+            f"# HELP {warm_up_duration} Time spent per warm-up step.",
+            f"# TYPE {warm_up_duration} gauge",
+        ]
+        for step, duration in warm_up.durations.items():
+            lines.append(f'{warm_up_duration}{{step="{step}"}} {duration}')
+        return "\n".join(lines) + "\n"
+
+
+registry = MetricsRegistry()
+
+
+def get_route_name(request, view_func):
+    """
+    Names the route after the DRF viewset action it resolves to,
+    for instance `recipes-list` or `recipes-download-shopping-cart`,
+    resolving the path when no view was called.
+    """
+
+    match = request.resolver_match
+    if view_func is None and match is None:
+        # The requests answered by the middleware are never resolved.
+        try:
+            match = resolve(request.path_info)
+        except Resolver404:
+            return "unresolved"
+    if view_func is None and match is not None:
+        view_func = match.func
+    actions = getattr(view_func, "actions", None)
+    initkwargs = getattr(view_func, "initkwargs", {})
+    if actions and "basename" in initkwargs:
+        action = actions.get(request.method.lower(), request.method.lower())
+        return f"{initkwargs['basename']}-{action}".replace("_", "-")
+    if match is not None and match.url_name:
+        return match.url_name.replace("_", "-")
+    return "unresolved"
+
+
+def timed_data(data_property):
+    def getter(serializer):
+        timings = current_timings.get()
+        if timings is None or timings.serializing:
+            return data_property.fget(serializer)
+        timings.serializing = True
+        started = perf_counter()
+        try:
+            return data_property.fget(serializer)
+        finally:
+            timings.serialize += perf_counter() - started
+            timings.serializing = False
+    return property(getter)
+
+
+def instrument_serializers():
+    """
+    Accounts the time spent in the outermost `serializer.data` access
+    of a sampled request as its serialization time.
+    """
+
+    Serializer.data = timed_data(Serializer.data)
+    ListSerializer.data = timed_data(ListSerializer.data)
+
+
+class ServerTimingMiddleware:
+    """
+    Measures DB query count & time, serialization, render
+    and total time of a sampled share of requests, reports them
+    within the `Server-Timing` header and aggregates them
+    into the per-route histograms of the metrics registry.
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.sample_rate = settings.SERVER_TIMING_SAMPLE_RATE
+
+    def __call__(self, request):
+        if random.random() >= self.sample_rate:
+            return self.get_response(request)
+
+        timings = RequestTimings()
+        request.timings = timings
+        token = current_timings.set(timings)
+        try:
+            with ExitStack() as stack:
+                for connection in connections.all():
+                    stack.enter_context(
+                        connection.execute_wrapper(timings.execute_wrapper)
+                    )
+                response = self.get_response(request)
+        finally:
+            current_timings.reset(token)
+
+        timings.total = perf_counter() - timings.started
+        if timings.route is None:
+            timings.route = get_route_name(request, None)
+        registry.observe(timings)
+        response["Server-Timing"] = timings.as_server_timing()
+        return response
+
+    def process_view(self, request, view_func, view_args, view_kwargs):
+        if hasattr(request, "timings"):
+            request.timings.route = get_route_name(request, view_func)
+
+    def process_template_response(self, request, response):
+        timings = getattr(request, "timings", None)
+        if timings is not None:
+            timings.render_started = perf_counter()
+            response.add_post_render_callback(
+                lambda rendered: self.finish_render(timings)
+            )
+        return response
+
+    def finish_render(self, timings):
+        timings.render = perf_counter() - timings.render_started
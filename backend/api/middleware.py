@@ -0,0 +1,222 @@
+import gzip
+import hashlib
+
+from django.http import HttpResponse
+from django.utils.cache import get_conditional_response, patch_vary_headers
+from django.utils.http import parse_http_date_safe
+
+from rest_framework.exceptions import NotAcceptable
+from rest_framework.negotiation import DefaultContentNegotiation
+from rest_framework.request import Request
+from rest_framework.settings import api_settings
+
+from core.cache import tiered_cache
+
+from .constants import (RESPONSE_CACHE_BROTLI_QUALITY,
+                        RESPONSE_CACHE_GZIP_LEVEL, RESPONSE_CACHE_LIST_PARAMS,
+                        RESPONSE_CACHE_MAX_NUMBERS,
+                        RESPONSE_CACHE_MIN_COMPRESS_LENGTH,
+                        RESPONSE_CACHE_QUERY_PARAMS, RESPONSE_CACHE_ROUTES,
+                        RESPONSE_CACHE_TIMEOUT)
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+
+CACHEABLE_METHODS = ("GET", "HEAD")
+# Headers describing the response that filled the cache rather than
+# the ones served from it.
+UNCACHED_HEADERS = ("content-length", "vary", "server-timing")
+ENCODINGS_BY_PREFERENCE = ("br", "gzip")
+
+
+def get_cached_route(path):
+    for route in RESPONSE_CACHE_ROUTES:
+        if path.startswith(route):
+            return route
+    return None
+
+
+def get_media_type(request):
+    """
+    Returns the media type DRF is going to render the response in,
+    or None when the `Accept` header asks for an unavailable one,
+    or passes parameters along to the renderer.
+    """
+
+    renderers = [
+        renderer() for renderer in api_settings.DEFAULT_RENDERER_CLASSES
+    ]
+    try:
+        renderer, media_type = DefaultContentNegotiation().select_renderer(
+            Request(request), renderers
+        )
+    except NotAcceptable:
+        return None
+    if media_type != renderer.media_type:
+        return None
+    return media_type
+
+
+def compress(body):
+    encoded = {"identity": body}
+    if len(body) < RESPONSE_CACHE_MIN_COMPRESS_LENGTH:
+        return encoded
+    encoded["gzip"] = gzip.compress(
+        body, compresslevel=RESPONSE_CACHE_GZIP_LEVEL
+    )
+    if brotli is not None:
+        encoded["br"] = brotli.compress(
+            body, quality=RESPONSE_CACHE_BROTLI_QUALITY
+        )
+    return encoded
+
+
+def parse_accept_encoding(header):
+    """
+    Parses the `Accept-Encoding` header value
+    into a mapping of content-coding to its q-value.
+    """
+
+    qvalues = {}
+    for item in header.split(","):
+        coding, _, params = item.partition(";")
+        coding = coding.strip().lower()
+        if not coding:
+            continue
+        qvalue = 1.0
+        params = params.strip()
+        if params.startswith("q="):
+            try:
+                qvalue = float(params[2:])
+            except ValueError:
+                qvalue = 0.0
+        qvalues[coding] = qvalue
+    return qvalues
+
+
+def choose_encoding(header, available):
+    qvalues = parse_accept_encoding(header)
+    default = qvalues.get("*", 0.0)
+    best, best_qvalue = "identity", 0.0
+    for coding in ENCODINGS_BY_PREFERENCE:
+        qvalue = qvalues.get(coding, default)
+        if coding in available and qvalue > best_qvalue:
+            best, best_qvalue = coding, qvalue
+    return best
+
+
+class AnonymousResponseCacheMiddleware:
+    """
+    Caches the responses to anonymous safe-methods requests
+    to the hottest API routes, each stored along with its
+    pre-compressed gzip & brotli encodings, so that compression
+    only happens once per change rather than once per request.
+    Cached entries are tagged with the models the route depends on,
+    and invalidated upon writes to them (see `api.signals`).
+    Only the first pages, requested with the query params listed
+    in RESPONSE_CACHE_QUERY_PARAMS, are cached, keyed by the
+    deduplicated and sorted values of these params, and by the
+    negotiated media type rather than the raw `Accept` header.
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        route = get_cached_route(request.path)
+        media_type = None
+        if route is not None and self.is_cacheable_request(request, route):
+            media_type = get_media_type(request)
+        if media_type is None:
+            return self.get_response(request)
+
+        key = self.get_cache_key(request, route, media_type)
+        entry = tiered_cache.get(key)
+        if entry is not None:
+            return self.build_response(request, entry, "HIT")
+
+        tags = RESPONSE_CACHE_ROUTES[route]
+        tag_versions = tiered_cache.get_tag_versions(tags)
+        response = self.get_response(request)
+        if not self.is_cacheable_response(response):
+            return response
+        entry = {
+            "status": response.status_code,
+            "headers": {
+                name: value for name, value in response.items()
+                if name.lower() not in UNCACHED_HEADERS
+            },
+            "bodies": compress(response.content),
+        }
+        tiered_cache.set(key, entry, RESPONSE_CACHE_TIMEOUT, tags,
+                         tag_versions)
+        return self.build_response(request, entry, "MISS")
+
+    def is_cacheable_request(self, request, route):
+        if request.method not in CACHEABLE_METHODS:
+            return False
+        if "HTTP_AUTHORIZATION" in request.META:
+            return False
+        allowed = RESPONSE_CACHE_QUERY_PARAMS[route]
+        for name, values in request.GET.lists():
+            if name not in allowed:
+                return False
+            if len(values) > 1 and name not in RESPONSE_CACHE_LIST_PARAMS:
+                return False
+            if name in RESPONSE_CACHE_MAX_NUMBERS and not all(
+                value.isdigit()
+                and 0 < int(value) <= RESPONSE_CACHE_MAX_NUMBERS[name]
+                for value in values
+            ):
+                return False
+        return True
+
+    def is_cacheable_response(self, response):
+        return (
+            response.status_code == 200
+            and not response.streaming
+            and not response.cookies
+            and not response.has_header("Content-Encoding")
+        )
+
+    def get_cache_key(self, request, route, media_type):
+        query = sorted(
+            (name, sorted(set(values)))
+            for name, values in request.GET.lists()
+        )
+        digest = hashlib.md5(
+            f"{request.path}?{query}|{media_type}".encode()
+        ).hexdigest()
+        return f"response-cache:{route}:{digest}"
+
+    def build_response(self, request, entry, cache_status):
+        encoding = choose_encoding(
+            request.META.get("HTTP_ACCEPT_ENCODING", ""),
+            entry["bodies"],
+        )
+        body = entry["bodies"][encoding]
+        response = HttpResponse(
+            content=body if request.method == "GET" else b"",
+            status=entry["status"],
+        )
+        for name, value in entry["headers"].items():
+            response[name] = value
+        if encoding != "identity":
+            response["Content-Encoding"] = encoding
+        response["Content-Length"] = str(len(body))
+        response["X-Cache"] = cache_status
+        patch_vary_headers(response, ("Accept", "Accept-Encoding",
+                                      "Authorization"))
+        # Cached entries carry the validators the view has set.
+        last_modified = response.get("Last-Modified")
+        return get_conditional_response(
+            request,
+            etag=response.get("ETag"),
+            last_modified=last_modified and parse_http_date_safe(
+                last_modified
+            ),
+            response=response,
+        )
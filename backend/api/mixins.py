@@ -1,7 +1,26 @@
+import hashlib
+from datetime import timedelta
+
+from django.utils import timezone
+from django.utils.cache import get_conditional_response, patch_cache_control
+from django.utils.http import http_date
+
+from rest_framework.exceptions import APIException
 from rest_framework.mixins import (CreateModelMixin, ListModelMixin,
                                    RetrieveModelMixin, UpdateModelMixin)
+from rest_framework.permissions import SAFE_METHODS
 from rest_framework.response import Response
-from rest_framework.status import HTTP_405_METHOD_NOT_ALLOWED
+from rest_framework.serializers import DateTimeField, ValidationError
+from rest_framework.status import (HTTP_200_OK, HTTP_405_METHOD_NOT_ALLOWED,
+                                   HTTP_410_GONE, is_success)
+
+from core.db import latest_changes
+from core.routers import pin_to_primary, read_database, use_replicas
+from recipes.constants import TOMBSTONE_TTL_DAYS
+from recipes.models import Tombstone
+
+from .constants import MULTI_GET_MAX_IDS, SYNC_TOKEN_SAFETY_MARGIN_SECONDS
+from .serializers import QueryParamsSerializer
 
 
 class PartialUpdateOnlyMixin(UpdateModelMixin):
@@ -23,3 +42,295 @@ class ListCreateRetrieveMixin(ListModelMixin,
     """
 
     pass
+
+
+class ReplicaReadsMixin:
+    """
+    Serves safe-method requests from a database replica, unless
+    the user has written recently, and pins the user to the primary
+    after every successful write. Authentication and permission
+    checks preceding the view still read from the primary.
+    """
+
+    replica_token = None
+
+    def initial(self, request, *args, **kwargs):
+        super().initial(request, *args, **kwargs)
+        if request.method in SAFE_METHODS:
+            self.replica_token = use_replicas(request.user)
+
+    def finalize_response(self, request, response, *args, **kwargs):
+        if self.replica_token is not None:
+            read_database.reset(self.replica_token)
+            self.replica_token = None
+        elif is_success(response.status_code):
+            if request.method not in SAFE_METHODS:
+                pin_to_primary(request.user)
+        return super().finalize_response(request, response, *args, **kwargs)
+
+
+class SparseFieldsetsMixin:
+    """
+    Lets the safe-methods requests only ask for some of the fields
+    via the `fields` query param, or for all but some via `omit`,
+    both comma-separated lists of field names. The serializers
+    have to take the `fields` argument (see `SparseFieldsetMixin`).
+    """
+
+    def get_requested_fields(self, serializer_class=None):
+        """
+        Returns the names of the fields to output, in the serializer
+        order, or None when all of them are to be output.
+        """
+
+        params = self.request.query_params
+        if self.request.method not in SAFE_METHODS or not (
+            "fields" in params or "omit" in params
+        ):
+            return None
+        serializer = QueryParamsSerializer(data={
+            name: params[name] for name in ("fields", "omit")
+            if name in params
+        })
+        serializer.is_valid(raise_exception=True)
+        if serializer_class is None:
+            serializer_class = self.get_serializer_class()
+        available = serializer_class.Meta.fields
+        for name, names in serializer.validated_data.items():
+            unknown = set(names) - set(available)
+            if unknown:
+                raise ValidationError({name: (
+                    f"unknown fields: {', '.join(sorted(unknown))}, "
+                    f"available: {', '.join(available)}"
+                )})
+        fields = serializer.validated_data.get("fields", available)
+        omitted = serializer.validated_data.get("omit", ())
+        return tuple(
+            name for name in available
+            if name in fields and name not in omitted
+        )
+
+    def get_serializer(self, *args, **kwargs):
+        fields = self.get_requested_fields()
+        if fields is not None:
+            kwargs["fields"] = fields
+        return super().get_serializer(*args, **kwargs)
+
+
+class ConditionalGetMixin:
+    """
+    Sets the `ETag` and `Last-Modified` validators on the list pages
+    and the details, and answers 304 to the requests still holding
+    the current ones, without serializing anything. Validators come
+    from a single query for the latest `modified` timestamps, and the
+    numbers, of the rows the response is built from, as listed by
+    `get_validator_sources`. Only the `ETag` reflects the deletions,
+    which leave no timestamp behind. As the representations depend
+    on the viewer, the responses are only to be stored by the clients,
+    and revalidated before every reuse.
+    """
+
+    conditional_methods = ("GET", "HEAD")
+
+    def get_validator_sources(self, rows):
+        """
+        Returns the querysets of the rows the representations
+        of the objects with the given primary keys are built from,
+        the first one being the objects themselves, which are
+        the only source by default.
+        """
+
+        return (self.get_queryset().model.objects.filter(pk__in=rows), )
+
+    def get_validators(self, rows, *extra):
+        changes = latest_changes(self.get_validator_sources(rows))
+        if not changes[0][1]:
+            return None
+        last_modified = max(
+            modified for modified, _ in changes if modified is not None
+        )
+        digest = hashlib.md5(repr((
+            changes, extra, self.request.get_full_path(),
+            self.request.accepted_media_type,
+        )).encode()).hexdigest()
+        return f'W/"{digest}"', int(last_modified.timestamp())
+
+    def respond_conditionally(self, validators, handler, *args, **kwargs):
+        if validators is None:
+            return handler(*args, **kwargs)
+        etag, last_modified = validators
+        response = get_conditional_response(
+            self.request, etag=etag, last_modified=last_modified
+        )
+        if response is None:
+            response = handler(*args, **kwargs)
+        if response.status_code in (200, 304):
+            response["ETag"] = etag
+            response["Last-Modified"] = http_date(last_modified)
+            patch_cache_control(response, private=True, no_cache=True)
+        return response
+
+    def get_list_rows(self, queryset):
+        """
+        Returns the subquery of the primary keys of the listed objects,
+        followed by whatever else the response depends on,
+        or None when the response is not to carry validators.
+        """
+
+        if self.paginator is None:
+            return None
+        return self.paginator.get_page_rows(queryset, self.request, self)
+
+    def list(self, request, *args, **kwargs):
+        validators = None
+        if request.method in self.conditional_methods:
+            rows = self.get_list_rows(
+                self.filter_queryset(self.get_queryset())
+            )
+            if rows is not None:
+                validators = self.get_validators(*rows)
+        return self.respond_conditionally(
+            validators, super().list, request, *args, **kwargs
+        )
+
+    def retrieve(self, request, *args, **kwargs):
+        validators = None
+        lookup = self.kwargs[self.lookup_url_kwarg or self.lookup_field]
+        if request.method in self.conditional_methods and lookup.isdigit():
+            validators = self.get_validators(
+                self.filter_queryset(self.get_queryset()).filter(
+                    pk=lookup
+                ).values("pk")
+            )
+        return self.respond_conditionally(
+            validators, super().retrieve, request, *args, **kwargs
+        )
+
+
+class MultiGetMixin:
+    """
+    Lets the list requests ask for specific objects via the `ids` query
+    param, a comma-separated list of primary keys, instead of a page.
+    They are fetched in a single batch, annotated with the state of
+    the requesting user (see `annotate_viewer_state`), and returned
+    unpaginated, in the requested order, along with the `missing` ids.
+    Has to precede `ConditionalGetMixin`, if any.
+    """
+
+    missing_ids = ()
+
+    def get_requested_ids(self):
+        if self.action != "list" or "ids" not in self.request.query_params:
+            return None
+        serializer = QueryParamsSerializer(
+            data={"ids": self.request.query_params["ids"]}
+        )
+        serializer.is_valid(raise_exception=True)
+        ids = serializer.validated_data["ids"]
+        if len(ids) > MULTI_GET_MAX_IDS:
+            raise ValidationError(
+                {"ids": f"at most {MULTI_GET_MAX_IDS} ids at once"}
+            )
+        return ids
+
+    def annotate_viewer_state(self, queryset):
+        return queryset
+
+    def get_list_rows(self, queryset):
+        ids = self.get_requested_ids()
+        if ids is None:
+            return super().get_list_rows(queryset)
+        return (queryset.filter(pk__in=ids).values("pk"), )
+
+    def paginate_queryset(self, queryset):
+        ids = self.get_requested_ids()
+        if ids is None:
+            return super().paginate_queryset(queryset)
+        found = self.annotate_viewer_state(queryset).in_bulk(ids)
+        self.missing_ids = [pk for pk in ids if pk not in found]
+        return [found[pk] for pk in ids if pk in found]
+
+    def get_paginated_response(self, data):
+        if self.get_requested_ids() is None:
+            return super().get_paginated_response(data)
+        return Response(data={"results": data, "missing": self.missing_ids},
+                        status=HTTP_200_OK)
+
+
+class SyncTokenExpired(APIException):
+    status_code = HTTP_410_GONE
+    default_detail = (
+        f"deletions older than {TOMBSTONE_TTL_DAYS} days are forgotten, "
+        "sync from scratch."
+    )
+    default_code = "sync_token_expired"
+
+
+class DeltaSyncMixin:
+    """
+    Lets the list requests only ask for the objects changed since
+    the `modified_since` query param, an ISO 8601 date & time,
+    along with the ids of the ones deleted since, as recorded by
+    the tombstones. They are returned unpaginated, along with the
+    `sync_token` to pass as `modified_since` on the next sync.
+    Views tell what counts as a change via `filter_changed`.
+    Has to precede `MultiGetMixin` and `ConditionalGetMixin`, if any.
+    """
+
+    sync_token = None
+    deleted_ids = ()
+
+    def get_modified_since(self):
+        params = self.request.query_params
+        if self.action != "list" or "modified_since" not in params:
+            return None
+        if "ids" in params:
+            raise ValidationError(
+                {"ids": "cannot be combined with modified_since"}
+            )
+        serializer = QueryParamsSerializer(
+            data={"modified_since": params["modified_since"]}
+        )
+        serializer.is_valid(raise_exception=True)
+        modified_since = serializer.validated_data["modified_since"]
+        if modified_since < (
+            timezone.now() - timedelta(days=TOMBSTONE_TTL_DAYS)
+        ):
+            raise SyncTokenExpired
+        return modified_since
+
+    def filter_changed(self, queryset, modified_since):
+        return queryset.filter(modified__gt=modified_since)
+
+    def annotate_viewer_state(self, queryset):
+        return queryset
+
+    def get_list_rows(self, queryset):
+        if self.get_modified_since() is not None:
+            return None
+        return super().get_list_rows(queryset)
+
+    def paginate_queryset(self, queryset):
+        modified_since = self.get_modified_since()
+        if modified_since is None:
+            return super().paginate_queryset(queryset)
+        # Taken before reading anything, the rows changed meanwhile
+        # are sent again on the next sync rather than never.
+        self.sync_token = timezone.now() - timedelta(
+            seconds=SYNC_TOKEN_SAFETY_MARGIN_SECONDS
+        )
+        self.deleted_ids = list(Tombstone.objects.filter(
+            model=queryset.model._meta.label, deleted__gt=modified_since
+        ).values_list("object_id", flat=True))
+        return list(self.annotate_viewer_state(
+            self.filter_changed(queryset, modified_since)
+        ))
+
+    def get_paginated_response(self, data):
+        if self.get_modified_since() is None:
+            return super().get_paginated_response(data)
+        return Response(data={
+            "results": data,
+            "deleted": self.deleted_ids,
+            "sync_token": DateTimeField().to_representation(self.sync_token),
+        }, status=HTTP_200_OK)
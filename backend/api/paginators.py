@@ -1,7 +1,60 @@
+from django.core.paginator import InvalidPage
+
 from rest_framework.pagination import PageNumberPagination
 
+from core.paginators import CachedCountPaginator
+
 
 class CustomPageSizePagination(PageNumberPagination):
+    """
+    Caches the counts, or estimates them for the large lists
+    (see `CachedCountPaginator`), tagging the cached ones with
+    the `count_cache_tags` of the view. Responses tell which kind
+    of count they carry in the `count_kind` field.
+    """
+
     page_size_query_param = "limit"
     max_page_size = 100
     page_size = 5
+
+    counted_paginator = None
+
+    def django_paginator_class(self, object_list, per_page):
+        paginator = CachedCountPaginator(object_list, per_page,
+                                         tags=self.count_cache_tags)
+        # Takes over the count `get_page_rows` did for the same rows.
+        counted = self.counted_paginator
+        if (counted is not None and hasattr(object_list, "query")
+                and counted.get_cache_key() == paginator.get_cache_key()):
+            paginator.counted = counted
+        return paginator
+
+    def paginate_queryset(self, queryset, request, view=None):
+        self.count_cache_tags = getattr(view, "count_cache_tags", ())
+        return super().paginate_queryset(queryset, request, view)
+
+    def get_page_rows(self, queryset, request, view=None):
+        """
+        Returns the subquery of the primary keys on the requested page
+        along with the count of all the rows, without fetching them,
+        or None when the page does not exist.
+        """
+
+        self.count_cache_tags = getattr(view, "count_cache_tags", ())
+        page_size = self.get_page_size(request)
+        paginator = self.django_paginator_class(queryset, page_size)
+        try:
+            number = paginator.validate_number(
+                self.get_page_number(request, paginator)
+            )
+        except InvalidPage:
+            return None
+        offset = (number - 1) * page_size
+        self.counted_paginator = paginator
+        return (queryset.values("pk")[offset:offset + page_size],
+                paginator.count)
+
+    def get_paginated_response(self, data):
+        response = super().get_paginated_response(data)
+        response.data["count_kind"] = self.page.paginator.count_kind
+        return response
@@ -59,3 +59,17 @@ class IsAdminOrReadOnly(BasePermission):
             and request.user.is_authenticated
             and request.user.is_admin
         )
+
+
+class IsAdmin(BasePermission):
+    """
+    Neither safe nor unsafe methods are allowed to anyone
+    but the project administrator.
+    """
+
+    def has_permission(self, request, view):
+        return (
+            request.user
+            and request.user.is_authenticated
+            and request.user.is_admin
+        )
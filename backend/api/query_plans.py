@@ -0,0 +1,134 @@
+"""
+Registry of the hot queries the API runs, built through the same code
+paths as the views, for the `check-query-plans` command and the plan
+tests to EXPLAIN.
+"""
+
+from datetime import timedelta
+
+from django.http import QueryDict
+from django.utils import timezone
+
+from core.db import explain, iter_plan_nodes
+from recipes.models import (CartItem, FavoriteItem, Ingredient,
+                            IngredientAmountInRecipe, Recipe, RecipeRanking,
+                            RecipeTag, ShoppingListItem, SimilarRecipe, Tag)
+from users.models import CustomUser as User
+from users.models import Subscription
+
+from .constants import (ALL_TAGS_FILTER_MODE, POPULAR_RECIPES_ORDERING,
+                        TRENDING_RECIPES_ORDERING)
+from .filters import (FilterIngredientsByName, FilterRecipesByTagsAndAuthor,
+                      filter_recipes_by_query_params, order_recipes_by_ranking)
+from .paginators import CustomPageSizePagination
+
+# Models expected to grow large, which no hot query may scan.
+LARGE_MODELS = (
+    Recipe,
+    RecipeTag,
+    RecipeRanking,
+    SimilarRecipe,
+    Ingredient,
+    IngredientAmountInRecipe,
+    FavoriteItem,
+    CartItem,
+    ShoppingListItem,
+    User,
+    Subscription,
+)
+
+
+def filter_recipes_by_tags(slugs, mode=None):
+    data = QueryDict(mutable=True)
+    data.setlist("tags", slugs)
+    if mode:
+        data["tags_mode"] = mode
+    return FilterRecipesByTagsAndAuthor(
+        data=data, queryset=Recipe.objects.all()
+    ).qs
+
+
+def get_hot_queries():
+    """
+    Returns the hot querysets by name, parametrized with sample rows
+    of the current database, or None when there is nothing to sample.
+    """
+
+    user = User.objects.order_by("id").first()
+    recipe = Recipe.objects.order_by("id").first()
+    ingredient = Ingredient.objects.order_by("id").first()
+    slugs = list(Tag.objects.values_list("slug", flat=True)[:2])
+    if user is None or recipe is None or ingredient is None or not slugs:
+        return None
+
+    page = CustomPageSizePagination.page_size
+    recipes = Recipe.objects.all()
+    return {
+        "recipes-list": recipes[:page],
+        "recipes-by-author": recipes.filter(author=recipe.author_id)[:page],
+        "recipes-favorited": filter_recipes_by_query_params(
+            recipes, user, {"is_favorited": True}
+        )[:page],
+        "recipes-not-in-cart": filter_recipes_by_query_params(
+            recipes, user, {"is_in_shopping_cart": False}
+        )[:page],
+        "recipes-by-any-tags": filter_recipes_by_tags(slugs)[:page],
+        "recipes-by-all-tags": filter_recipes_by_tags(
+            slugs, ALL_TAGS_FILTER_MODE
+        )[:page],
+        "recipes-popular": order_recipes_by_ranking(
+            recipes, POPULAR_RECIPES_ORDERING
+        )[:page],
+        "recipes-trending": order_recipes_by_ranking(
+            recipes, TRENDING_RECIPES_ORDERING
+        )[:page],
+        "recipes-similar": Recipe.objects.filter(
+            similar_to__recipe=recipe.id
+        ).order_by("similar_to__rank"),
+        "recipes-modified": recipes.filter(
+            modified__gt=timezone.now() - timedelta(hours=1)
+        ),
+        "ingredients-by-name": FilterIngredientsByName(
+            data={"name": ingredient.name[:2]},
+            queryset=Ingredient.objects.all(),
+        ).qs,
+        "subscriptions": User.objects.filter(
+            followers__follower=user
+        )[:page],
+        "is-subscribed": user.following.filter(influencer=recipe.author_id),
+        "is-favorited": user.favorite.filter(recipe=recipe),
+        "is-in-cart": user.cart.filter(recipe=recipe),
+        "user-favorites": FavoriteItem.objects.filter(
+            user=user.id
+        ).order_by("-created")[:page],
+        "recipe-favorites": FavoriteItem.objects.filter(
+            recipe_id=recipe.id
+        ).values_list("created", flat=True),
+        "recipe-carts": CartItem.objects.filter(
+            recipe_id=recipe.id
+        ).values_list("user_id", flat=True),
+        "shopping-list": ShoppingListItem.objects.filter(
+            user=user.id
+        ).values_list("ingredient__name", "amount"),
+    }
+
+
+def find_sequential_scans(queries, tables):
+    """
+    Returns the names of the tables among `tables` each of the
+    given querysets would sequentially scan, by query name,
+    leaving out the queries which scan none of them.
+    """
+
+    scans = {}
+    for name, queryset in queries.items():
+        scanned = sorted({
+            node["Relation Name"] for node in iter_plan_nodes(
+                explain(queryset)
+            )
+            if node["Node Type"] == "Seq Scan"
+            and node["Relation Name"] in tables
+        })
+        if scanned:
+            scans[name] = scanned
+    return scans
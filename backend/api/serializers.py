@@ -1,17 +1,25 @@
 from django.contrib.auth import password_validation
+from django.db import transaction
 from django.shortcuts import get_object_or_404
+from django.urls import reverse
 
-from rest_framework.serializers import (CharField, IntegerField,
-                                        ModelSerializer,
+from rest_framework.serializers import (CharField, ChoiceField, DateTimeField,
+                                        IntegerField, ModelSerializer,
                                         PrimaryKeyRelatedField, Serializer,
                                         SerializerMethodField, ValidationError)
 
+from recipes import shopping_lists
 from recipes.models import (Ingredient, IngredientAmountInRecipe, Recipe,
                             RecipeTag, Tag)
+from users.constants import (DONE_EXPORT_STATUS, EXPORT_FORMAT_CHOICES,
+                             EXPORT_FORMATS_BY_KIND)
 from users.models import CustomUser as User
+from users.models import ExportJob
 
+from .constants import RECIPE_ORDERING_CHOICES
 from .fields import (Base64ImageField, StringToBoolField,
-                     StringToNaturalNumberField)
+                     StringToNameListField, StringToNaturalNumberField,
+                     StringToNaturalNumberListField)
 
 
 class QueryParamsSerializer(Serializer):
@@ -33,6 +41,26 @@ class QueryParamsSerializer(Serializer):
     is_favorited = StringToBoolField(required=False)
     is_in_shopping_cart = StringToBoolField(required=False)
     recipes_limit = StringToNaturalNumberField(required=False)
+    ordering = ChoiceField(choices=RECIPE_ORDERING_CHOICES, required=False)
+    ingredients = StringToNaturalNumberListField(required=False)
+    ids = StringToNaturalNumberListField(required=False)
+    missing = StringToNaturalNumberField(required=False)
+    fields = StringToNameListField(required=False)
+    omit = StringToNameListField(required=False)
+    modified_since = DateTimeField(required=False)
+
+
+class SparseFieldsetMixin:
+    """
+    Takes an optional `fields` argument, a collection of field names,
+    and only outputs these fields.
+    """
+
+    def __init__(self, *args, fields=None, **kwargs):
+        super().__init__(*args, **kwargs)
+        if fields is not None:
+            for name in set(self.fields) - set(fields):
+                self.fields.pop(name)
 
 
 class TagSerializer(ModelSerializer):
@@ -55,7 +83,7 @@ class IngredientSerializer(ModelSerializer):
         fields = ("id", "name", "measurement_unit")
 
 
-class UserShowSerializer(ModelSerializer):
+class UserShowSerializer(SparseFieldsetMixin, ModelSerializer):
     """
     Serializes User model instances.
     Only designed for displaying an already-existing model instance
@@ -70,6 +98,8 @@ class UserShowSerializer(ModelSerializer):
                   "is_subscribed")
 
     def get_is_subscribed(self, obj):
+        if hasattr(obj, "is_subscribed"):
+            return obj.is_subscribed
         user = self.context["request"].user
         if not user.is_authenticated:
             return False
@@ -182,7 +212,7 @@ class AmountOutputSerializer(ModelSerializer):
         fields = ("id", "name", "measurement_unit", "amount")
 
 
-class DefaultRecipeSerializer(ModelSerializer):
+class DefaultRecipeSerializer(SparseFieldsetMixin, ModelSerializer):
     """
     Serializes and de-serializes Recipe model instances.
     """
@@ -215,12 +245,16 @@ class DefaultRecipeSerializer(ModelSerializer):
         return value
 
     def get_is_favorited(self, obj):
+        if hasattr(obj, "is_favorited"):
+            return obj.is_favorited
         user = self.context["request"].user
         if not user.is_authenticated:
             return False
         return user.favorite.filter(recipe=obj).exists()
 
     def get_is_in_shopping_cart(self, obj):
+        if hasattr(obj, "is_in_shopping_cart"):
+            return obj.is_in_shopping_cart
         user = self.context["request"].user
         if not user.is_authenticated:
             return False
@@ -228,19 +262,21 @@ class DefaultRecipeSerializer(ModelSerializer):
 
     def to_representation(self, instance):
         representation = super().to_representation(instance)
-        ingredients = AmountOutputSerializer(
-            instance=instance.ingredients.all(),
-            many=True
-        )
-        tags = TagSerializer(
-            instance=instance.tags.all(),
-            many=True
-        )
-        representation["ingredients"] = ingredients.data
-        representation["tags"] = tags.data
-        representation["image"] = instance.image.url
+        if "ingredients" in representation:
+            representation["ingredients"] = AmountOutputSerializer(
+                instance=instance.ingredients.all(),
+                many=True
+            ).data
+        if "tags" in representation:
+            representation["tags"] = TagSerializer(
+                instance=instance.tags.all(),
+                many=True
+            ).data
+        if "image" in representation:
+            representation["image"] = instance.image.url
         return representation
 
+    @transaction.atomic
     def create(self, validated_data):
         tags = validated_data.pop("tags", [])
         ingredients = validated_data.pop("ingredients", [])
@@ -254,6 +290,7 @@ class DefaultRecipeSerializer(ModelSerializer):
                                                     amount=data["amount"])
         return recipe
 
+    @transaction.atomic
     def update(self, instance, validated_data):
         tags = validated_data.pop("tags", None)
         ingredients = validated_data.pop("ingredients", None)
@@ -263,12 +300,14 @@ class DefaultRecipeSerializer(ModelSerializer):
             for tag in tags:
                 RecipeTag.objects.create(recipe=instance, tag=tag)
         if ingredients:
+            old_amounts = shopping_lists.get_amounts(instance.id)
             IngredientAmountInRecipe.objects.filter(recipe=instance).delete()
             for data in ingredients:
                 ingredient = get_object_or_404(Ingredient, id=data["id"])
                 IngredientAmountInRecipe.objects.create(recipe=instance,
                                                         ingredient=ingredient,
                                                         amount=data["amount"])
+            shopping_lists.record_ingredients_change(instance.id, old_amounts)
         return instance
 
 
@@ -284,3 +323,59 @@ class MinifiedRecipeSerializer(ModelSerializer):
     class Meta:
         model = Recipe
         fields = ("id", "name", "image", "cooking_time")
+
+
+class PantryRecipeSerializer(MinifiedRecipeSerializer):
+    """
+    Serializes Recipe model instances matched against a pantry,
+    along with how many of their ingredients the pantry covers.
+    Expects the (ingredients total, ingredients missing) tuples
+    by recipe id within the `matches` context key.
+    """
+
+    ingredients_total = SerializerMethodField()
+    ingredients_missing = SerializerMethodField()
+
+    class Meta(MinifiedRecipeSerializer.Meta):
+        fields = MinifiedRecipeSerializer.Meta.fields + (
+            "ingredients_total", "ingredients_missing"
+        )
+
+    def get_ingredients_total(self, obj):
+        return self.context["matches"][obj.id][0]
+
+    def get_ingredients_missing(self, obj):
+        return self.context["matches"][obj.id][1]
+
+
+class ExportJobSerializer(ModelSerializer):
+    """
+    Serializes ExportJob model instances, and de-serializes
+    the export requests, defaulting to the main format of the kind.
+    """
+
+    fileformat = ChoiceField(choices=EXPORT_FORMAT_CHOICES, required=False)
+    download = SerializerMethodField()
+
+    class Meta:
+        model = ExportJob
+        fields = ("id", "kind", "fileformat", "status", "error", "created",
+                  "finished", "download")
+        read_only_fields = ("status", "error", "created", "finished")
+
+    def validate(self, data):
+        formats = EXPORT_FORMATS_BY_KIND[data["kind"]]
+        data.setdefault("fileformat", formats[0])
+        if data["fileformat"] not in formats:
+            raise ValidationError({"fileformat": (
+                f"{data['kind']} exports are only available "
+                f"as {', '.join(formats)}"
+            )})
+        return data
+
+    def get_download(self, obj):
+        if obj.status != DONE_EXPORT_STATUS:
+            return None
+        return self.context["request"].build_absolute_uri(
+            reverse("api:exports-download", kwargs={"pk": obj.pk})
+        )
@@ -0,0 +1,21 @@
+from django.apps import apps
+from django.db.models.signals import post_delete, post_save
+
+from core.cache import tiered_cache
+
+from .constants import CACHE_INVALIDATING_MODELS
+
+
+def invalidate_cache_tag(sender, update_fields=None, **kwargs):
+    if update_fields is not None and set(update_fields) == {"last_login"}:
+        return
+    tiered_cache.invalidate_tags(sender._meta.label)
+
+
+def connect_signals():
+    for label in CACHE_INVALIDATING_MODELS:
+        model = apps.get_model(label)
+        post_save.connect(invalidate_cache_tag, sender=model,
+                          dispatch_uid=f"cache-tag-save-{label}")
+        post_delete.connect(invalidate_cache_tag, sender=model,
+                            dispatch_uid=f"cache-tag-delete-{label}")
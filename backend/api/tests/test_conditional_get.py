@@ -0,0 +1,42 @@
+from django.test import TestCase
+
+from rest_framework.test import APIClient
+
+from core.cache import tiered_cache
+from recipes.models import Recipe
+from users.models import CustomUser as User
+
+
+class ConditionalGetTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create(username="user", email="u@u.u")
+        cls.recipe = Recipe.objects.create(
+            name="recipe", text="text", cooking_time=1, author=cls.user,
+            image="recipes/image.png",
+        )
+
+    def setUp(self):
+        tiered_cache.local.clear()
+        tiered_cache.shared.clear()
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+        self.client.credentials(HTTP_AUTHORIZATION="Token token")
+
+    def assertPrivate(self, response):
+        self.assertIn("private", response["Cache-Control"])
+        self.assertIn("no-cache", response["Cache-Control"])
+
+    def test_validated_responses_are_private(self):
+        for path in ("/api/recipes/", f"/api/recipes/{self.recipe.id}/",
+                     "/api/users/"):
+            with self.subTest(path=path):
+                response = self.client.get(path)
+                self.assertEqual(response.status_code, 200)
+                self.assertPrivate(response)
+                response = self.client.get(
+                    path, HTTP_IF_NONE_MATCH=response["ETag"]
+                )
+                self.assertEqual(response.status_code, 304)
+                self.assertPrivate(response)
@@ -0,0 +1,41 @@
+from django.test import TestCase
+
+from rest_framework.test import APIClient
+
+from core.cache import tiered_cache
+from core.constants import CACHED_COUNT_KIND, EXACT_COUNT_KIND
+from recipes.models import Recipe
+from users.models import CustomUser as User
+
+
+class CountKindTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create(username="user", email="u@u.u")
+        Recipe.objects.create(name="recipe", text="text", cooking_time=1,
+                              author=cls.user, image="recipes/image.png")
+
+    def setUp(self):
+        tiered_cache.local.clear()
+        tiered_cache.shared.clear()
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+        # Keeps the requests away from the anonymous response cache.
+        self.client.credentials(HTTP_AUTHORIZATION="Token token")
+
+    def get_count_kinds(self, path):
+        kinds = []
+        for _ in range(2):
+            response = self.client.get(path)
+            self.assertEqual(response.status_code, 200)
+            kinds.append(response.json()["count_kind"])
+        return kinds
+
+    def test_recipes_count_is_exact_then_cached(self):
+        self.assertEqual(self.get_count_kinds("/api/recipes/"),
+                         [EXACT_COUNT_KIND, CACHED_COUNT_KIND])
+
+    def test_users_count_is_exact_then_cached(self):
+        self.assertEqual(self.get_count_kinds("/api/users/"),
+                         [EXACT_COUNT_KIND, CACHED_COUNT_KIND])
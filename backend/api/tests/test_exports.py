@@ -0,0 +1,65 @@
+from unittest import mock
+
+from django.test import TestCase, override_settings
+
+from rest_framework.test import APIClient
+
+from api.exports import (beat, claim_jobs, clean_up_jobs, queue_export,
+                         run_export_job)
+from core.routers import is_pinned_to_primary
+from users.constants import (QUEUED_EXPORT_STATUS, RUNNING_EXPORT_STATUS,
+                             SHOPPING_LIST_EXPORT, TXT_EXPORT_FORMAT)
+from users.models import CustomUser as User
+from users.models import ExportJob
+
+
+@mock.patch("api.exports.connections")
+class ExportJobClaimTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create(username="user", email="u@u.u")
+
+    def setUp(self):
+        self.job = queue_export(self.user, SHOPPING_LIST_EXPORT,
+                                TXT_EXPORT_FORMAT)
+
+    def expire_heartbeat(self):
+        ExportJob.objects.filter(pk=self.job.pk).update(
+            heartbeat="2000-01-01T00:00:00Z"
+        )
+
+    def test_heartbeat_keeps_the_job_claimed(self, connections):
+        [(_, claim)] = claim_jobs(1)
+        self.expire_heartbeat()
+        beat([claim])
+        self.assertEqual(clean_up_jobs()[0], 0)
+
+    def test_lost_claim_discards_the_outcome(self, connections):
+        [(job_id, stale)] = claim_jobs(1)
+        self.expire_heartbeat()
+        self.assertEqual(clean_up_jobs()[0], 1)
+        self.job.refresh_from_db()
+        self.assertEqual(self.job.status, QUEUED_EXPORT_STATUS)
+        [(_, claim)] = claim_jobs(1)
+        with self.assertLogs("api.exports", "WARNING"):
+            run_export_job(job_id, stale)
+        self.job.refresh_from_db()
+        self.assertEqual(self.job.status, RUNNING_EXPORT_STATUS)
+        self.assertEqual(self.job.claim, claim)
+        self.assertFalse(self.job.file)
+        storage = self.job.file.storage
+        self.assertEqual(storage.listdir(str(self.user.id))[1], [])
+
+
+class ShoppingCartExportTests(TestCase):
+
+    @override_settings(REPLICA_DATABASES=["default"])
+    @mock.patch("api.views.SYNC_SHOPPING_LIST_MAX_ITEMS", -1)
+    def test_queued_export_pins_to_primary(self):
+        user = User.objects.create(username="user", email="u@u.u")
+        client = APIClient()
+        client.force_authenticate(user)
+        response = client.get("/api/recipes/download_shopping_cart/")
+        self.assertEqual(response.status_code, 202)
+        self.assertTrue(is_pinned_to_primary(user))
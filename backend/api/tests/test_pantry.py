@@ -0,0 +1,41 @@
+from django.test import TestCase
+from django.utils import timezone
+
+from rest_framework.test import APIClient
+
+from recipes.models import Ingredient, IngredientAmountInRecipe, Recipe
+from recipes.pantry import PantryIndex
+from users.models import CustomUser as User
+
+
+class PantryTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        author = User.objects.create(username="author", email="a@a.a")
+        cls.ingredient = Ingredient.objects.create(name="salt",
+                                                   measurement_unit="g")
+        cls.recipe = Recipe.objects.create(
+            name="recipe", text="text", cooking_time=1, author=author,
+            image="recipes/image.png",
+        )
+        IngredientAmountInRecipe.objects.create(
+            recipe=cls.recipe, ingredient=cls.ingredient, amount=1
+        )
+
+    def test_recipe_left_without_ingredients_stops_matching(self):
+        index = PantryIndex()
+        self.assertEqual(index.match([self.ingredient.id]),
+                         [(self.recipe.id, 1, 0)])
+        IngredientAmountInRecipe.objects.filter(recipe=self.recipe).delete()
+        Recipe.objects.filter(pk=self.recipe.pk).update(
+            modified=timezone.now()
+        )
+        index.mark_stale()
+        self.assertEqual(index.match([self.ingredient.id]), [])
+        self.assertEqual(len(index.snapshot.overlay), 1)
+
+    def test_rejects_zero_ids(self):
+        response = APIClient().get("/api/recipes/pantry/",
+                                   {"ingredients": "0"})
+        self.assertEqual(response.status_code, 400)
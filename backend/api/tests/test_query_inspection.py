@@ -0,0 +1,35 @@
+from django.http import HttpResponse
+from django.test import RequestFactory, TestCase, override_settings
+
+from api.debug import QueryInspectionMiddleware, RepeatedQueriesError
+from recipes.models import Tag
+
+
+@override_settings(QUERY_INSPECTION={
+    "ENABLED": True, "REPEAT_LIMIT": 1, "SLOW_QUERY_MS": 1000, "RAISE": True,
+})
+class QueryInspectionTests(TestCase):
+
+    def get_response(self, error=None, status=200):
+        def view(request):
+            for _ in range(2):
+                Tag.objects.filter(pk=1).exists()
+            if error is not None:
+                raise error
+            return HttpResponse(status=status)
+
+        middleware = QueryInspectionMiddleware(view)
+        return middleware(RequestFactory().get("/api/tags/"))
+
+    def test_raises_on_repeated_queries(self):
+        with self.assertRaises(RepeatedQueriesError):
+            self.get_response()
+
+    def test_keeps_the_error_of_the_view(self):
+        with self.assertLogs("api.queries", "WARNING"):
+            with self.assertRaises(ZeroDivisionError):
+                self.get_response(ZeroDivisionError())
+
+    def test_only_logs_for_server_errors(self):
+        with self.assertLogs("api.queries", "WARNING"):
+            self.assertEqual(self.get_response(status=500).status_code, 500)
@@ -0,0 +1,62 @@
+from unittest import skipUnless
+
+from django.db import connection
+from django.test import TestCase
+
+from recipes.models import (CartItem, FavoriteItem, Ingredient,
+                            IngredientAmountInRecipe, Recipe, RecipeTag,
+                            ShoppingListItem, SimilarRecipe, Tag)
+from users.models import CustomUser as User
+from users.models import Subscription
+
+from ..query_plans import LARGE_MODELS, find_sequential_scans, get_hot_queries
+
+
+@skipUnless(connection.vendor == "postgresql",
+            "query plans are only checked on PostgreSQL")
+class HotQueryPlansTests(TestCase):
+    """
+    EXPLAINs the hot queries with sequential scans disabled, which the
+    planner then only picks when no index can serve the query at all,
+    so that a handful of rows tells what a seeded database would.
+    """
+
+    @classmethod
+    def setUpTestData(cls):
+        user, author = (
+            User.objects.create(username=name, email=f"{name}@foodgram.io")
+            for name in ("user", "author")
+        )
+        tags = [
+            Tag.objects.create(name=f"tag {i}", slug=f"tag-{i}",
+                               color=f"#00000{i}")
+            for i in range(2)
+        ]
+        ingredient = Ingredient.objects.create(name="salt",
+                                               measurement_unit="g")
+        recipe, similar = (
+            Recipe.objects.create(name=name, text="text", cooking_time=1,
+                                  author=author, image="recipes/image.png")
+            for name in ("recipe", "similar")
+        )
+        RecipeTag.objects.bulk_create(
+            RecipeTag(recipe=recipe, tag=tag) for tag in tags
+        )
+        IngredientAmountInRecipe.objects.create(
+            recipe=recipe, ingredient=ingredient, amount=1
+        )
+        SimilarRecipe.objects.create(recipe=recipe, similar=similar,
+                                     score=1, rank=1)
+        FavoriteItem.objects.create(user=user, recipe=recipe)
+        CartItem.objects.create(user=user, recipe=recipe)
+        ShoppingListItem.objects.create(user=user, ingredient=ingredient,
+                                        amount=1)
+        Subscription.objects.create(follower=user, influencer=author)
+
+    def test_hot_queries_use_indexes(self):
+        with connection.cursor() as cursor:
+            cursor.execute("SET LOCAL enable_seqscan = off")
+        scans = find_sequential_scans(get_hot_queries(), {
+            model._meta.db_table for model in LARGE_MODELS
+        })
+        self.assertEqual(scans, {})
@@ -0,0 +1,62 @@
+from io import StringIO
+
+from django.core.management import call_command
+from django.test import TestCase
+
+from rest_framework.test import APIClient
+
+from api.constants import POPULAR_RECIPES_ORDERING, TRENDING_RECIPES_ORDERING
+from core.cache import tiered_cache
+from recipes.admin import times_favorited
+from recipes.models import FavoriteItem, Recipe, RecipeRanking
+from recipes.rankings import record_addition
+from users.models import CustomUser as User
+
+
+class RankingsTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.author = User.objects.create(username="author", email="a@a.a")
+        cls.ranked = Recipe.objects.create(
+            name="ranked", text="text", cooking_time=1, author=cls.author,
+            image="recipes/image.png",
+        )
+        favorite = FavoriteItem.objects.create(user=cls.author,
+                                               recipe=cls.ranked)
+        record_addition(FavoriteItem, cls.ranked.id, favorite.created)
+        # Bypasses the signal creating the ranking.
+        Recipe.objects.bulk_create([Recipe(
+            name="unranked", text="text", cooking_time=1, author=cls.author,
+            image="recipes/image.png",
+        )])
+        cls.unranked = Recipe.objects.get(name="unranked")
+
+    def setUp(self):
+        tiered_cache.local.clear()
+        tiered_cache.shared.clear()
+
+    def get_ids(self, ordering):
+        response = APIClient().get("/api/recipes/", {"ordering": ordering})
+        self.assertEqual(response.status_code, 200)
+        return [recipe["id"] for recipe in response.json()["results"]]
+
+    def test_unranked_recipes_rank_last(self):
+        for ordering in (POPULAR_RECIPES_ORDERING,
+                         TRENDING_RECIPES_ORDERING):
+            with self.subTest(ordering=ordering):
+                self.assertEqual(self.get_ids(ordering),
+                                 [self.ranked.id, self.unranked.id])
+
+    def test_rebuild_creates_the_missing_rankings(self):
+        call_command("rebuild-recipe-rankings", stdout=StringIO())
+        self.assertEqual(
+            dict(RecipeRanking.objects.values_list("recipe_id",
+                                                   "favorites_count")),
+            {self.ranked.id: 1, self.unranked.id: 0},
+        )
+
+    def test_admin_counts_no_favorites_of_unranked_recipes(self):
+        recipes = Recipe.objects.select_related("ranking").in_bulk()
+        self.assertEqual(times_favorited(recipes[self.unranked.id]), 0)
+        self.assertEqual(times_favorited(recipes[self.ranked.id]), 1)
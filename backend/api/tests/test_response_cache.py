@@ -0,0 +1,38 @@
+from django.test import TestCase
+
+from rest_framework.test import APIClient
+
+from core.cache import tiered_cache
+from recipes.models import Tag
+
+
+class ResponseCacheTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        Tag.objects.create(name="tag", slug="tag", color="#000000")
+
+    def setUp(self):
+        tiered_cache.local.clear()
+        tiered_cache.shared.clear()
+        self.client = APIClient()
+
+    def get_cache_status(self, accept):
+        response = self.client.get("/api/tags/", HTTP_ACCEPT=accept)
+        return response.status_code, response.get("X-Cache")
+
+    def test_keys_on_the_negotiated_media_type(self):
+        self.assertEqual(self.get_cache_status("application/json"),
+                         (200, "MISS"))
+        self.assertEqual(self.get_cache_status("*/*"), (200, "HIT"))
+        self.assertEqual(
+            self.get_cache_status("application/json, x/unknown;q=0.5"),
+            (200, "HIT"),
+        )
+
+    def test_bypasses_the_unavailable_media_types(self):
+        self.assertEqual(self.get_cache_status("x/unknown"), (406, None))
+
+    def test_bypasses_the_renderer_parameters(self):
+        self.assertEqual(self.get_cache_status("application/json; indent=2"),
+                         (200, None))
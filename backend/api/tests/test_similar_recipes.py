@@ -0,0 +1,42 @@
+from django.test import TestCase
+
+from rest_framework.test import APIClient
+
+from recipes.models import Recipe, SimilarRecipe
+from users.models import CustomUser as User
+
+
+class SimilarRecipesTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        author = User.objects.create(username="author", email="a@a.a")
+        cls.first, cls.second, cls.third, cls.fourth = (
+            Recipe.objects.create(name=name, text="text", cooking_time=1,
+                                  author=author, image="recipes/image.png")
+            for name in ("first", "second", "third", "fourth")
+        )
+        SimilarRecipe.objects.bulk_create(
+            SimilarRecipe(recipe=recipe, similar=similar, score=1, rank=rank)
+            for recipe, neighbours in (
+                (cls.first, (cls.second, cls.third, cls.fourth)),
+                (cls.second, (cls.third, cls.fourth)),
+                (cls.fourth, (cls.first, )),
+            )
+            for rank, similar in enumerate(neighbours)
+        )
+
+    def get_ranks(self, recipe):
+        return list(SimilarRecipe.objects.filter(recipe=recipe).values_list(
+            "similar_id", "rank"
+        ))
+
+    def test_deletion_keeps_the_ranks_contiguous(self):
+        self.third.delete()
+        self.assertEqual(self.get_ranks(self.first),
+                         [(self.second.id, 0), (self.fourth.id, 1)])
+        self.assertEqual(self.get_ranks(self.second), [(self.fourth.id, 0)])
+        self.assertEqual(self.get_ranks(self.fourth), [(self.first.id, 0)])
+        response = APIClient().get(f"/api/recipes/{self.first.id}/similar/")
+        self.assertEqual([recipe["id"] for recipe in response.json()],
+                         [self.second.id, self.fourth.id])
@@ -0,0 +1,71 @@
+from unittest import mock
+
+from django.test import TestCase
+
+from rest_framework.test import APIClient
+
+from core.cache import tiered_cache
+from recipes.models import Recipe, RecipeTag, Tag
+from recipes.tag_slugs import TagSlugMap, tag_slugs
+from users.models import CustomUser as User
+
+
+class TagsFilterTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        author = User.objects.create(username="author", email="a@a.a")
+        cls.tags = [
+            Tag.objects.create(name=f"tag {i}", slug=f"tag-{i}",
+                               color=f"#00000{i}")
+            for i in range(3)
+        ]
+        cls.both, cls.first, cls.third = (
+            Recipe.objects.create(name=name, text="text", cooking_time=1,
+                                  author=author, image="recipes/image.png")
+            for name in ("both", "first", "third")
+        )
+        RecipeTag.objects.bulk_create([
+            RecipeTag(recipe=cls.both, tag=cls.tags[0]),
+            RecipeTag(recipe=cls.both, tag=cls.tags[1]),
+            RecipeTag(recipe=cls.first, tag=cls.tags[0]),
+            RecipeTag(recipe=cls.third, tag=cls.tags[2]),
+        ])
+
+    def setUp(self):
+        tag_slugs.mark_stale()
+        tiered_cache.local.clear()
+        self.client = APIClient()
+
+    def get_ids(self, **params):
+        response = self.client.get("/api/recipes/", {"limit": 100, **params})
+        self.assertEqual(response.status_code, 200)
+        return [recipe["id"] for recipe in response.json()["results"]]
+
+    def test_any_mode_lists_each_recipe_once(self):
+        ids = self.get_ids(tags=["tag-0", "tag-1"])
+        self.assertCountEqual(ids, (self.both.id, self.first.id))
+
+    def test_all_mode_lists_each_recipe_once(self):
+        ids = self.get_ids(tags=["tag-0", "tag-1"], tags_mode="all")
+        self.assertEqual(ids, [self.both.id])
+
+    def test_all_mode_with_a_single_tag(self):
+        ids = self.get_ids(tags=["tag-0"], tags_mode="all")
+        self.assertCountEqual(ids, (self.both.id, self.first.id))
+
+    def test_unknown_slug_is_rejected(self):
+        response = self.client.get("/api/recipes/", {"tags": "missing"})
+        self.assertEqual(response.status_code, 400)
+        self.assertIn("tags", response.json())
+
+    def test_slug_gone_since_validation_is_rejected(self):
+        # Validated against the old map, looked up in the refreshed one.
+        stale = {"tag-0": self.tags[0].id, "gone": self.tags[2].id + 1}
+        with mock.patch.object(tag_slugs, "get_ids", return_value=stale):
+            with mock.patch("api.filters.tag_slugs", TagSlugMap()):
+                response = self.client.get(
+                    "/api/recipes/", {"tags": ["tag-0", "gone"]}
+                )
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(response.json(), {"tags": "unknown tags: gone"})
@@ -0,0 +1,106 @@
+from django.db import connection
+from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+
+from rest_framework.test import APIClient
+
+from recipes.models import (CartItem, FavoriteItem, Ingredient,
+                            IngredientAmountInRecipe, Recipe, ShoppingListItem)
+from users.models import CustomUser as User
+from users.models import Subscription
+
+TRANSACTION_CONTROL = ("BEGIN", "COMMIT", "ROLLBACK", "SAVEPOINT", "RELEASE")
+
+
+class UserListsRoundTripsTests(TestCase):
+    """
+    Pins the number of statements the subscriptions, favorites
+    and shopping cart writes take. Transaction control statements
+    are left out, as they depend on the backend and on the
+    transaction the test case itself runs in.
+    """
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user, cls.author = (
+            User.objects.create(username=name, email=f"{name}@foodgram.io")
+            for name in ("user", "author")
+        )
+        cls.recipe = Recipe.objects.create(
+            name="recipe", text="text", cooking_time=1, author=cls.author,
+            image="recipes/image.png",
+        )
+        cls.ingredient = Ingredient.objects.create(name="salt",
+                                                   measurement_unit="g")
+        IngredientAmountInRecipe.objects.create(
+            recipe=cls.recipe, ingredient=cls.ingredient, amount=2
+        )
+
+    def setUp(self):
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+        # Inserting with a single statement is PostgreSQL-only.
+        self.insert = 1 if connection.vendor == "postgresql" else 2
+
+    def request(self, method, path, status_code, statements):
+        with CaptureQueriesContext(connection) as context:
+            response = getattr(self.client, method)(path)
+        self.assertEqual(response.status_code, status_code)
+        executed = [
+            query["sql"] for query in context.captured_queries
+            if not query["sql"].startswith(TRANSACTION_CONTROL)
+        ]
+        self.assertEqual(len(executed), statements, "\n".join(executed))
+        return response
+
+    def test_subscribe(self):
+        path = f"/api/users/{self.author.id}/subscribe/"
+        # The inserted subscription, along with the author's recipes
+        # and their count, and whether the user follows the author.
+        self.request("post", path, 201, self.insert + 3)
+        self.request("post", path, 201, self.insert + 3)
+        self.assertEqual(Subscription.objects.count(), 1)
+        self.request("delete", path, 204, 1)
+        # Telling a repeated removal from a missing user.
+        self.request("delete", path, 204, 2)
+        self.assertFalse(Subscription.objects.exists())
+
+    def test_subscribe_to_missing_user(self):
+        path = "/api/users/999/subscribe/"
+        self.request("post", path, 404, self.insert)
+        self.request("delete", path, 404, 2)
+
+    def test_favorite(self):
+        path = f"/api/recipes/{self.recipe.id}/favorite/"
+        # The inserted item and the ranking update.
+        self.request("post", path, 201, self.insert + 1)
+        self.request("post", path, 201, self.insert)
+        self.assertEqual(FavoriteItem.objects.count(), 1)
+        # The trending score is recomputed from the remaining favorites.
+        self.request("delete", path, 204, 3)
+        self.request("delete", path, 204, 2)
+        self.assertFalse(FavoriteItem.objects.exists())
+
+    def test_shopping_cart(self):
+        path = f"/api/recipes/{self.recipe.id}/shopping_cart/"
+        # The inserted item, the ranking update, the recipe amounts
+        # and the shopping list upsert.
+        self.request("post", path, 201, self.insert + 3)
+        self.request("post", path, 201, self.insert)
+        self.assertEqual(CartItem.objects.count(), 1)
+        self.assertEqual(
+            list(ShoppingListItem.objects.values_list("amount", flat=True)),
+            [2],
+        )
+        # The deleted item, the ranking update, the recipe amounts,
+        # the shopping list update and the emptied items deletion.
+        self.request("delete", path, 204, 5)
+        self.request("delete", path, 204, 2)
+        self.assertFalse(CartItem.objects.exists())
+        self.assertFalse(ShoppingListItem.objects.exists())
+
+    def test_missing_recipe(self):
+        for action in ("favorite", "shopping_cart"):
+            path = f"/api/recipes/999/{action}/"
+            self.request("post", path, 404, self.insert)
+            self.request("delete", path, 404, 2)
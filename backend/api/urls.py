@@ -2,7 +2,8 @@ from django.urls import include, path
 
 from rest_framework.routers import DefaultRouter
 
-from .views import IngredientViewSet, RecipeViewSet, TagViewSet, UserViewSet
+from .views import (ExportJobViewSet, HealthViewSet, IngredientViewSet,
+                    MetricsViewSet, RecipeViewSet, TagViewSet, UserViewSet)
 
 app_name: str = "api"
 
@@ -30,6 +31,21 @@ router_v1.register(
     viewset=RecipeViewSet,
     basename="recipes",
 )
+router_v1.register(
+    prefix="exports",
+    viewset=ExportJobViewSet,
+    basename="exports",
+)
+router_v1.register(
+    prefix="metrics",
+    viewset=MetricsViewSet,
+    basename="metrics",
+)
+router_v1.register(
+    prefix="health",
+    viewset=HealthViewSet,
+    basename="health",
+)
 
 handler404 = "api.utils.custom_404_handler"
 
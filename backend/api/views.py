@@ -1,42 +1,65 @@
 from http import HTTPMethod
 
 from django.contrib.auth.hashers import make_password
+from django.db import transaction
+from django.db.models import Prefetch, Q
+from django.http import FileResponse, HttpResponse
 from django.shortcuts import get_object_or_404
 
 from rest_framework.decorators import action
-from rest_framework.permissions import SAFE_METHODS, IsAuthenticated
+from rest_framework.mixins import (CreateModelMixin, ListModelMixin,
+                                   RetrieveModelMixin)
+from rest_framework.permissions import SAFE_METHODS, AllowAny, IsAuthenticated
 from rest_framework.response import Response
-from rest_framework.status import HTTP_200_OK
-from rest_framework.viewsets import GenericViewSet, ModelViewSet
+from rest_framework.status import (HTTP_200_OK, HTTP_409_CONFLICT,
+                                   HTTP_503_SERVICE_UNAVAILABLE)
+from rest_framework.viewsets import GenericViewSet, ModelViewSet, ViewSet
 
-from recipes.models import CartItem, FavoriteItem, Ingredient, Recipe, Tag
+from core.routers import pin_to_primary
+from recipes.models import (CartItem, FavoriteItem, Ingredient,
+                            IngredientAmountInRecipe, Recipe, RecipeTag,
+                            ShoppingListItem, Tag)
+from recipes.pantry import pantry_index
+from users.constants import (CSV_EXPORT_FORMAT, DONE_EXPORT_STATUS,
+                             SHOPPING_LIST_EXPORT, TXT_EXPORT_FORMAT)
 from users.models import CustomUser as User
+from users.models import ExportJob, Subscription
 
+from .constants import SYNC_SHOPPING_LIST_MAX_ITEMS
+from .events import RECIPE_EVENT, recipe_event_hub
+from .exports import queue_export
 from .filters import (FilterIngredientsByName, FilterRecipesByTagsAndAuthor,
-                      filter_recipes_by_query_params)
+                      annotate_is_listed, annotate_is_subscribed,
+                      filter_recipes_by_query_params, order_recipes_by_ranking)
 from .helpers import (add_recipe_to_user_list, create_csv_response,
-                      create_txt_response, reduce_cart,
-                      remove_recipe_from_user_list, set_new_password,
-                      subscribe_to, unsubscribe_from)
-from .mixins import ListCreateRetrieveMixin, PartialUpdateOnlyMixin
+                      create_export_job_response, create_txt_response,
+                      get_shopping_list, remove_recipe_from_user_list,
+                      set_new_password, subscribe_to, unsubscribe_from)
+from .metrics import registry
+from .mixins import (ConditionalGetMixin, DeltaSyncMixin,
+                     ListCreateRetrieveMixin, MultiGetMixin,
+                     PartialUpdateOnlyMixin, ReplicaReadsMixin,
+                     SparseFieldsetsMixin)
 from .paginators import CustomPageSizePagination
-from .permissions import (IsAdminOrReadOnly, RecipeViewSetPermission,
+from .permissions import (IsAdmin, IsAdminOrReadOnly, RecipeViewSetPermission,
                           SetOnesPasswordActionPermission,
                           UserViewSetPermission)
-from .serializers import (DefaultRecipeSerializer, ExtendedUserShowSerializer,
-                          IngredientSerializer, QueryParamsSerializer,
-                          TagSerializer, UserCreateSerializer,
-                          UserShowSerializer)
+from .serializers import (DefaultRecipeSerializer, ExportJobSerializer,
+                          ExtendedUserShowSerializer, IngredientSerializer,
+                          MinifiedRecipeSerializer, PantryRecipeSerializer,
+                          QueryParamsSerializer, TagSerializer,
+                          UserCreateSerializer, UserShowSerializer)
+from .warmup import warm_up
 
 
-class TagViewSet(ModelViewSet):
+class TagViewSet(ReplicaReadsMixin, DeltaSyncMixin, ModelViewSet):
 
     queryset = Tag.objects.all()
     serializer_class = TagSerializer
     permission_classes = (IsAdminOrReadOnly, )
 
 
-class IngredientViewSet(ModelViewSet):
+class IngredientViewSet(ReplicaReadsMixin, DeltaSyncMixin, ModelViewSet):
 
     queryset = Ingredient.objects.all()
     serializer_class = IngredientSerializer
@@ -44,17 +67,31 @@ class IngredientViewSet(ModelViewSet):
     filterset_class = FilterIngredientsByName
 
 
-class UserViewSet(GenericViewSet, ListCreateRetrieveMixin):
+class UserViewSet(ReplicaReadsMixin, SparseFieldsetsMixin, MultiGetMixin,
+                  ConditionalGetMixin, GenericViewSet,
+                  ListCreateRetrieveMixin):
 
     queryset = User.objects.all()
     permission_classes = (UserViewSetPermission, )
     pagination_class = CustomPageSizePagination
+    count_cache_tags = ("users.CustomUser", "users.Subscription")
 
     def get_serializer_class(self):
         if self.request.method in SAFE_METHODS:
             return UserShowSerializer
         return UserCreateSerializer
 
+    def annotate_viewer_state(self, queryset):
+        return annotate_is_subscribed(queryset, self.request.user)
+
+    def get_validator_sources(self, rows):
+        sources = [User.objects.filter(pk__in=rows)]
+        if self.request.user.is_authenticated:
+            sources.append(Subscription.objects.filter(
+                follower=self.request.user, influencer__in=rows
+            ))
+        return sources
+
     def perform_create(self, serializer):
         serializer.save(
             password=make_password(serializer.validated_data["password"])
@@ -99,24 +136,36 @@ class UserViewSet(GenericViewSet, ListCreateRetrieveMixin):
             permission_classes=(IsAuthenticated, ))
     def subscriptions(self, request):
         queryset = self.get_queryset().filter(followers__follower=request.user)
+        fields = self.get_requested_fields(ExtendedUserShowSerializer)
         page = self.paginate_queryset(queryset)
         if page is not None:
             serializer = ExtendedUserShowSerializer(
-                instance=page, many=True, context={"request": request}
+                instance=page, many=True, context={"request": request},
+                fields=fields,
             )
             return self.get_paginated_response(serializer.data)
         serializer = ExtendedUserShowSerializer(
-            instance=queryset, many=True, context={"request": request}
+            instance=queryset, many=True, context={"request": request},
+            fields=fields,
         )
         return Response(data=serializer.data, status=HTTP_200_OK)
 
 
-class RecipeViewSet(ModelViewSet, PartialUpdateOnlyMixin):
+class RecipeViewSet(ReplicaReadsMixin, SparseFieldsetsMixin, DeltaSyncMixin,
+                    MultiGetMixin, ConditionalGetMixin, ModelViewSet,
+                    PartialUpdateOnlyMixin):
 
     serializer_class = DefaultRecipeSerializer
     permission_classes = (RecipeViewSetPermission, )
     pagination_class = CustomPageSizePagination
     filterset_class = FilterRecipesByTagsAndAuthor
+    count_cache_tags = (
+        "recipes.Recipe",
+        "recipes.RecipeTag",
+        "recipes.Tag",
+        "recipes.FavoriteItem",
+        "recipes.CartItem",
+    )
 
     def get_queryset(self):
         user = self.request.user
@@ -128,15 +177,109 @@ class RecipeViewSet(ModelViewSet, PartialUpdateOnlyMixin):
             data["is_favorited"] = params["is_favorited"]
         if params.get("is_in_shopping_cart", None):
             data["is_in_shopping_cart"] = params["is_in_shopping_cart"]
+        if params.get("ordering", None):
+            data["ordering"] = params["ordering"]
 
         serializer = QueryParamsSerializer(data=data)
         serializer.is_valid(raise_exception=True)
-        return filter_recipes_by_query_params(
+        queryset = filter_recipes_by_query_params(
             queryset, user, serializer.validated_data
         )
+        queryset = order_recipes_by_ranking(
+            queryset, serializer.validated_data.get("ordering", None)
+        )
+        if self.request.method not in SAFE_METHODS:
+            return queryset
+        return self.load_requested_fields(queryset)
+
+    def load_requested_fields(self, queryset):
+        """
+        Only loads the relations, and the lengthy text,
+        of the recipes when their fields are to be output.
+        """
+
+        fields = (self.get_requested_fields()
+                  or self.get_serializer_class().Meta.fields)
+        if "text" not in fields:
+            queryset = queryset.defer("text")
+        if "author" in fields:
+            queryset = queryset.select_related("author")
+        if "tags" in fields:
+            queryset = queryset.prefetch_related("tags")
+        if "ingredients" in fields:
+            return queryset.prefetch_related("ingredients__ingredient")
+        return queryset
+
+    def annotate_viewer_state(self, queryset):
+        user = self.request.user
+        queryset = annotate_is_listed(queryset, user)
+        fields = (self.get_requested_fields()
+                  or self.get_serializer_class().Meta.fields)
+        if not user.is_authenticated or "author" not in fields:
+            return queryset
+        return queryset.select_related(None).prefetch_related(Prefetch(
+            "author", queryset=annotate_is_subscribed(User.objects.all(), user)
+        ))
+
+    def get_validator_sources(self, rows):
+        user = self.request.user
+        sources = [
+            Recipe.objects.filter(pk__in=rows),
+            RecipeTag.objects.filter(recipe__in=rows),
+            Tag.objects.filter(recipes_on__recipe__in=rows),
+            IngredientAmountInRecipe.objects.filter(recipe__in=rows),
+            Ingredient.objects.filter(recipes_in__recipe__in=rows),
+            User.objects.filter(recipes__in=rows),
+        ]
+        if user.is_authenticated:
+            sources.extend((
+                FavoriteItem.objects.filter(user=user, recipe__in=rows),
+                CartItem.objects.filter(user=user, recipe__in=rows),
+                Subscription.objects.filter(follower=user,
+                                            influencer__recipes__in=rows),
+            ))
+        return sources
+
+    def filter_changed(self, queryset, modified_since):
+        """
+        Besides the recipes modified themselves, picks the ones whose
+        tags, ingredients or author changed, and the ones the user has
+        listed, or whose author they followed, since. Only the additions
+        are seen, as removing from the lists leaves no trace behind.
+        """
+
+        user = self.request.user
+        changed = (
+            Q(modified__gt=modified_since)
+            | Q(pk__in=RecipeTag.objects.filter(
+                tag__modified__gt=modified_since
+            ).values("recipe"))
+            | Q(pk__in=IngredientAmountInRecipe.objects.filter(
+                ingredient__modified__gt=modified_since
+            ).values("recipe"))
+            | Q(author__in=User.objects.filter(
+                modified__gt=modified_since
+            ).values("pk"))
+        )
+        if user.is_authenticated:
+            changed |= (
+                Q(pk__in=FavoriteItem.objects.filter(
+                    user=user, created__gt=modified_since
+                ).values("recipe"))
+                | Q(pk__in=CartItem.objects.filter(
+                    user=user, created__gt=modified_since
+                ).values("recipe"))
+                | Q(author__in=Subscription.objects.filter(
+                    follower=user, created__gt=modified_since
+                ).values("influencer"))
+            )
+        return queryset.filter(changed)
 
     def perform_create(self, serializer):
-        serializer.save(author=self.request.user)
+        recipe = serializer.save(author=self.request.user)
+        transaction.on_commit(lambda: recipe_event_hub.publish(
+            RECIPE_EVENT, recipe.author_id, recipe.id
+        ))
 
     @action(detail=True,
             permission_classes=(IsAuthenticated, ),
@@ -154,15 +297,128 @@ class RecipeViewSet(ModelViewSet, PartialUpdateOnlyMixin):
             return add_recipe_to_user_list(CartItem, request.user, pk)
         return remove_recipe_from_user_list(CartItem, request.user, pk)
 
+    @action(detail=True,
+            methods=(HTTPMethod.GET, ))
+    def similar(self, request, pk=None):
+        serializer = QueryParamsSerializer(data={"pk": pk})
+        serializer.is_valid(raise_exception=True)
+        recipe = get_object_or_404(
+            Recipe.objects.only("pk"), pk=serializer.validated_data["pk"]
+        )
+        queryset = Recipe.objects.filter(
+            similar_to__recipe=recipe
+        ).order_by("similar_to__rank")
+        output = MinifiedRecipeSerializer(instance=queryset, many=True)
+        return Response(data=output.data, status=HTTP_200_OK)
+
+    @action(detail=False,
+            methods=(HTTPMethod.GET, ))
+    def pantry(self, request):
+        params = request.query_params
+        data = {"ingredients": params.get("ingredients", "")}
+        if params.get("missing", None):
+            data["missing"] = params["missing"]
+        serializer = QueryParamsSerializer(data=data)
+        serializer.is_valid(raise_exception=True)
+        matches = pantry_index.match(
+            serializer.validated_data["ingredients"],
+            serializer.validated_data.get("missing", None),
+        )
+        page = self.paginate_queryset(matches)
+        if page is None:
+            page = matches
+        recipes = Recipe.objects.in_bulk([match[0] for match in page])
+        output = PantryRecipeSerializer(
+            # Recipes deleted since the index was refreshed drop out.
+            instance=[recipes[match[0]] for match in page
+                      if match[0] in recipes],
+            many=True,
+            context={"matches": {
+                recipe_id: (total, missing)
+                for recipe_id, total, missing in page
+            }},
+        )
+        if self.paginator is not None:
+            return self.get_paginated_response(output.data)
+        return Response(data=output.data, status=HTTP_200_OK)
+
     @action(detail=False,
             methods=(HTTPMethod.GET, ),
             permission_classes=(IsAuthenticated, ))
     def download_shopping_cart(self, request):
-        queryset = Recipe.objects.filter(
-            carts_in__user=request.user.id
-        ).prefetch_related("ingredients").all()
-        cart = reduce_cart(queryset)
         fileformat = request.query_params.get("fileformat", "txt")
+        if ShoppingListItem.objects.filter(
+            user=request.user
+        ).count() > SYNC_SHOPPING_LIST_MAX_ITEMS:
+            if fileformat != CSV_EXPORT_FORMAT:
+                fileformat = TXT_EXPORT_FORMAT
+            job = queue_export(request.user, SHOPPING_LIST_EXPORT, fileformat)
+            # A write, despite the method, which the polls have to see.
+            pin_to_primary(request.user)
+            return create_export_job_response(request, job)
+        cart = get_shopping_list(request.user)
         if fileformat == "csv":
             return create_csv_response(cart)
         return create_txt_response(cart)
+
+
+class ExportJobViewSet(ReplicaReadsMixin, GenericViewSet, ListModelMixin,
+                       CreateModelMixin, RetrieveModelMixin):
+    """
+    Queues the exports of the user's data, lets the user poll them
+    and download their files once they are done.
+    """
+
+    serializer_class = ExportJobSerializer
+    permission_classes = (IsAuthenticated, )
+    pagination_class = CustomPageSizePagination
+
+    def get_queryset(self):
+        return ExportJob.objects.filter(user=self.request.user)
+
+    def create(self, request, *args, **kwargs):
+        serializer = self.get_serializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        job = queue_export(request.user,
+                           serializer.validated_data["kind"],
+                           serializer.validated_data["fileformat"])
+        return create_export_job_response(request, job)
+
+    @action(detail=True,
+            methods=(HTTPMethod.GET, ))
+    def download(self, request, pk=None):
+        job = self.get_object()
+        if job.status != DONE_EXPORT_STATUS:
+            return Response(data={"detail": f"export is {job.status}"},
+                            status=HTTP_409_CONFLICT)
+        return FileResponse(
+            job.file.open("rb"),
+            as_attachment=True,
+            filename=f"{job.kind}.{job.fileformat}",
+        )
+
+
+class MetricsViewSet(ViewSet):
+
+    permission_classes = (IsAdmin, )
+
+    def list(self, request):
+        return HttpResponse(content=registry.expose(),
+                            content_type="text/plain; version=0.0.4")
+
+
+class HealthViewSet(ViewSet):
+    """
+    Readiness probe, passing once the serving process has warmed up.
+    Runs the warm-up itself if it has not completed yet, which covers
+    the servers other than gunicorn and retries the failed warm-ups.
+    """
+
+    authentication_classes = ()
+    permission_classes = (AllowAny, )
+
+    def list(self, request):
+        if not warm_up.run():
+            return Response(data={"status": "warming up"},
+                            status=HTTP_503_SERVICE_UNAVAILABLE)
+        return Response(data={"status": "ready"}, status=HTTP_200_OK)
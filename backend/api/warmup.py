@@ -0,0 +1,150 @@
+"""
+Warm-up of a freshly started process, so that the first requests
+it serves do not pay for the lazily built URL resolvers, serializer
+fields and model metadata, for opening the DB connections, or for
+filling the in-memory catalogs and the response cache.
+
+Gunicorn runs it in every worker before the worker starts accepting
+connections, and once more in the master before forking when the app
+is preloaded, so that the workers share the warmed state copy-on-write
+(see gunicorn.conf.py). The readiness endpoint only passes once it
+has completed in the process serving the probe.
+"""
+
+import inspect
+import io
+import logging
+import sys
+import threading
+from time import perf_counter
+
+from django.conf import settings
+from django.core.handlers.wsgi import WSGIHandler
+from django.db import connections
+from django.urls import reverse
+
+from rest_framework.serializers import BaseSerializer
+
+from recipes.pantry import pantry_index
+from recipes.tag_slugs import tag_slugs
+
+from . import serializers
+from .constants import WARM_UP_PATHS
+
+logger = logging.getLogger(__name__)
+
+
+def build_urls():
+    reverse("api:api-root")
+
+
+def build_serializers():
+    for serializer_class in vars(serializers).values():
+        if (inspect.isclass(serializer_class)
+                and issubclass(serializer_class, BaseSerializer)
+                and serializer_class.__module__ == serializers.__name__):
+            serializer_class().fields
+
+
+def open_connections():
+    for connection in connections.all():
+        connection.ensure_connection()
+
+
+def fill_catalogs():
+    tag_slugs.get_ids()
+    pantry_index.refresh()
+
+
+def get_host():
+    for host in settings.ALLOWED_HOSTS:
+        if host != "*":
+            return host.lstrip(".")
+    return "localhost"
+
+
+def build_environ(path, host):
+    return {
+        "REQUEST_METHOD": "GET",
+        "SCRIPT_NAME": "",
+        "PATH_INFO": path,
+        "QUERY_STRING": "",
+        "SERVER_NAME": host,
+        "SERVER_PORT": "80",
+        "SERVER_PROTOCOL": "HTTP/1.1",
+        "HTTP_HOST": host,
+        "wsgi.version": (1, 0),
+        "wsgi.url_scheme": "http",
+        "wsgi.input": io.BytesIO(),
+        "wsgi.errors": sys.stderr,
+        "wsgi.multithread": True,
+        "wsgi.multiprocess": True,
+        "wsgi.run_once": False,
+    }
+
+
+def fill_response_cache():
+    """
+    Requests the cached routes through the same WSGI handler,
+    middleware and host validation as the served requests.
+    """
+
+    handler = WSGIHandler()
+    host = get_host()
+    for path in WARM_UP_PATHS:
+        statuses = []
+        response = handler(
+            build_environ(path, host),
+            lambda status, headers, exc_info=None: statuses.append(status),
+        )
+        response.close()
+        status_code = int(statuses[0].split()[0])
+        if status_code >= 400:
+            raise RuntimeError(f"{path} responded with {status_code}")
+
+
+class WarmUp:
+
+    steps = (
+        ("urls", build_urls),
+        ("serializers", build_serializers),
+        ("databases", open_connections),
+        ("catalogs", fill_catalogs),
+        ("responses", fill_response_cache),
+    )
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.ready = False
+        self.durations = {}
+
+    def mark_cold(self):
+        self.ready = False
+
+    def run(self):
+        """
+        Runs all the steps, unless another thread already did.
+        Failures are logged rather than raised, leaving the process
+        serving but not ready, so that the next run retries.
+        """
+
+        with self.lock:
+            if self.ready:
+                return True
+            durations = {}
+            try:
+                for name, step in self.steps:
+                    started = perf_counter()
+                    step()
+                    durations[name] = perf_counter() - started
+            except Exception:
+                logger.exception("Warm-up failed")
+                return False
+            finally:
+                self.durations = durations
+            self.ready = True
+            logger.info("Warmed up in %.2fs", sum(durations.values()))
+            return True
+
+
+warm_up = WarmUp()
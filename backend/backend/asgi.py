@@ -2,6 +2,8 @@
 ASGI config for backend project.
 
 It exposes the ASGI callable as a module-level variable named ``application``.
+Besides Django, it serves the server-sent events of the new recipes
+(see `api.events`), which are streamed without going through Django.
 
 For more information on this file, see
 https://docs.djangoproject.com/en/3.2/howto/deployment/asgi/
@@ -13,4 +15,25 @@ from django.core.asgi import get_asgi_application
 
 os.environ.setdefault("DJANGO_SETTINGS_MODULE", "backend.settings")
 
-application = get_asgi_application()
+django_application = get_asgi_application()
+
+from api.constants import RECIPE_EVENTS_PATH  # noqa: E402
+from api.events import recipe_events  # noqa: E402
+
+
+async def handle_lifespan(receive, send):
+    while True:
+        message = await receive()
+        if message["type"] == "lifespan.startup":
+            await send({"type": "lifespan.startup.complete"})
+        elif message["type"] == "lifespan.shutdown":
+            await send({"type": "lifespan.shutdown.complete"})
+            return
+
+
+async def application(scope, receive, send):
+    if scope["type"] == "lifespan":
+        return await handle_lifespan(receive, send)
+    if scope["type"] == "http" and scope["path"] == RECIPE_EVENTS_PATH:
+        return await recipe_events(scope, receive, send)
+    return await django_application(scope, receive, send)
@@ -39,6 +39,9 @@ MIDDLEWARE = [
     "django.middleware.common.CommonMiddleware",
     "django.middleware.csrf.CsrfViewMiddleware",
     "django.middleware.security.SecurityMiddleware",
+    "api.metrics.ServerTimingMiddleware",
+    "api.middleware.AnonymousResponseCacheMiddleware",
+    "api.debug.QueryInspectionMiddleware",
     "django.contrib.sessions.middleware.SessionMiddleware",
     "django.contrib.messages.middleware.MessageMiddleware",
     "django.middleware.clickjacking.XFrameOptionsMiddleware",
@@ -80,10 +83,53 @@ DATABASES = {
         "USER": os.getenv("POSTGRES_USER", "django_user"),
         "PASSWORD": os.getenv("POSTGRES_PASSWORD", "django_password"),
         "HOST": os.getenv("DB_HOST", "127.0.0.1"),
-        "PORT": os.getenv("DB_PORT", 5432)
+        "PORT": os.getenv("DB_PORT", 5432),
+        "CONN_MAX_AGE": int(os.getenv("DB_CONN_MAX_AGE", 60)),
     }
 }
 
+# Comma-separated SQLite file names in DEBUG mode, hosts otherwise.
+REPLICA_DATABASES = []
+for number, replica in enumerate(
+    filter(None, os.getenv("DB_REPLICAS", "").split(",")), start=1
+):
+    REPLICA_DATABASES.append(f"replica_{number}")
+    DATABASES[f"replica_{number}"] = {
+        **DATABASES["default"],
+        **(
+            {"NAME": os.path.join(BASE_DIR, replica)} if DEBUG
+            else {"HOST": replica}
+        ),
+        "TEST": {"MIRROR": "default"},
+    }
+
+DATABASE_ROUTERS = ["core.routers.ReplicaRouter"]
+
+REPLICA_STICKINESS_SECONDS = int(os.getenv("REPLICA_STICKINESS_SECONDS", 5))
+
+
+# Caching
+
+REDIS_URL = os.getenv("REDIS_URL")
+
+CACHES = {
+    "default": {
+        "BACKEND": "django_redis.cache.RedisCache",
+        "LOCATION": REDIS_URL,
+    }
+} if REDIS_URL else {
+    "default": {
+        "BACKEND": "django.core.cache.backends.locmem.LocMemCache",
+    }
+}
+
+TIERED_CACHE = {
+    "SHARED_ALIAS": "default",
+    "VERSION": int(os.getenv("TIERED_CACHE_VERSION", 1)),
+    "LOCAL_MAX_ENTRIES": int(os.getenv("TIERED_CACHE_LOCAL_MAX_ENTRIES", 1000)),
+    "LOCAL_TIMEOUT": int(os.getenv("TIERED_CACHE_LOCAL_TIMEOUT", 5)),
+}
+
 
 # Password validation
 
@@ -102,6 +148,16 @@ AUTH_PASSWORD_VALIDATORS = [
     },
 ]
 
+# For test and benchmark fixtures only: hashes the new passwords with
+# a single round of salted MD5 instead of the deliberately slow PBKDF2.
+# Existing PBKDF2 hashes still verify, yet get downgraded upon login.
+FAST_PASSWORD_HASHING = os.getenv("FAST_PASSWORD_HASHING") == "True"
+if FAST_PASSWORD_HASHING:
+    PASSWORD_HASHERS = [
+        "django.contrib.auth.hashers.MD5PasswordHasher",
+        "django.contrib.auth.hashers.PBKDF2PasswordHasher",
+    ]
+
 
 # Internationalization
 
@@ -124,6 +180,11 @@ STATIC_ROOT = os.path.join(BASE_DIR, "collected_static")
 MEDIA_URL = "/media/"
 MEDIA_ROOT = os.path.join(BASE_DIR, "media")
 
+DEFAULT_FILE_STORAGE = "core.storage.ContentAddressedStorage"
+
+# Not served by the gateway: exports are only downloaded via the API.
+EXPORTS_ROOT = os.getenv("EXPORTS_ROOT", os.path.join(BASE_DIR, "exports"))
+
 
 # Default primary key field type
 
@@ -154,3 +215,31 @@ REST_FRAMEWORK = {
     ],
     "EXCEPTION_HANDLER": "api.utils.custom_exception_handler"
 }
+
+
+# Request instrumentation
+
+SERVER_TIMING_SAMPLE_RATE = float(os.getenv("SERVER_TIMING_SAMPLE_RATE", 1.0))
+
+QUERY_INSPECTION = {
+    "ENABLED": DEBUG,
+    "REPEAT_LIMIT": int(os.getenv("QUERY_INSPECTION_REPEAT_LIMIT", 5)),
+    "SLOW_QUERY_MS": int(os.getenv("QUERY_INSPECTION_SLOW_QUERY_MS", 100)),
+    "RAISE": os.getenv("QUERY_INSPECTION_RAISE") == "True",
+}
+
+LOGGING = {
+    "version": 1,
+    "disable_existing_loggers": False,
+    "handlers": {
+        "console": {
+            "class": "logging.StreamHandler",
+        },
+    },
+    "loggers": {
+        "api": {
+            "handlers": ["console"],
+            "level": "INFO",
+        },
+    },
+}
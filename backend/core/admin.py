@@ -0,0 +1,14 @@
+from django.contrib import admin
+
+from .paginators import EstimatedCountPaginator
+
+
+class LargeTableAdmin(admin.ModelAdmin):
+    """
+    Base admin for the tables expected to grow to millions of rows.
+    Estimates the changelist counts instead of running COUNT(*)
+    over the whole table on every page.
+    """
+
+    paginator = EstimatedCountPaginator
+    show_full_result_count = False
@@ -0,0 +1,198 @@
+"""
+Two-tier cache: a bounded in-process LRU on top of the shared Django
+cache (Redis in production, local memory when REDIS_URL is not set).
+
+Every shared entry is stored along with the versions of the tags
+it depends on, and is only served while these versions are current:
+invalidating a tag replaces its version, orphaning all the entries
+tagged with it at once. Keys are prefixed with TIERED_CACHE["VERSION"],
+so that a deploy changing the shape of the cached values starts afresh.
+
+Local entries live for at most TIERED_CACHE["LOCAL_TIMEOUT"] seconds,
+which bounds how long the invalidations done by the other processes
+take to show up. Invalidations done by the process itself drop
+the matching local entries immediately.
+"""
+
+import threading
+import time
+from collections import OrderedDict
+
+from django.conf import settings
+from django.core.cache import caches
+from django.utils.functional import cached_property
+
+MISSING = object()
+
+
+class LocalCache:
+    """
+    Thread-safe LRU mapping, bounded in size, with per-entry expiry.
+    """
+
+    def __init__(self, max_entries):
+        self.max_entries = max_entries
+        self.entries = OrderedDict()
+        self.lock = threading.Lock()
+
+    def get(self, key):
+        with self.lock:
+            entry = self.entries.get(key)
+            if entry is None:
+                return MISSING
+            expires, value, _ = entry
+            if expires < time.monotonic():
+                del self.entries[key]
+                return MISSING
+            self.entries.move_to_end(key)
+            return value
+
+    def set(self, key, value, timeout, tags):
+        with self.lock:
+            self.entries[key] = (time.monotonic() + timeout, value, tags)
+            self.entries.move_to_end(key)
+            while len(self.entries) > self.max_entries:
+                self.entries.popitem(last=False)
+
+    def delete(self, key):
+        with self.lock:
+            self.entries.pop(key, None)
+
+    def delete_tagged(self, tags):
+        with self.lock:
+            for key in [
+                key for key, (_, _, entry_tags) in self.entries.items()
+                if not entry_tags.isdisjoint(tags)
+            ]:
+                del self.entries[key]
+
+    def clear(self):
+        with self.lock:
+            self.entries.clear()
+
+
+class CacheStats:
+
+    counters = ("local_hits", "shared_hits", "misses", "sets",
+                "invalidations")
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.values = dict.fromkeys(self.counters, 0)
+
+    def increment(self, counter):
+        with self.lock:
+            self.values[counter] += 1
+
+    def as_dict(self):
+        with self.lock:
+            return dict(self.values)
+
+
+class TieredCache:
+    """
+    The single interface the API modules cache through. Typical usage:
+
+    value = tiered_cache.get_or_set(
+        "some-key", compute_value, timeout=60, tags=(Recipe._meta.label, )
+    )
+    tiered_cache.invalidate_tags(Recipe._meta.label)
+
+    Tags are model labels, such as "recipes.Recipe", which is what
+    the writes to the models invalidate (see `api.signals`).
+
+    """
+
+    def __init__(self):
+        self.stats = CacheStats()
+
+    @cached_property
+    def config(self):
+        return settings.TIERED_CACHE
+
+    @cached_property
+    def shared(self):
+        return caches[self.config["SHARED_ALIAS"]]
+
+    @cached_property
+    def local(self):
+        return LocalCache(self.config["LOCAL_MAX_ENTRIES"])
+
+    def make_key(self, key):
+        return f"tiered:{self.config['VERSION']}:{key}"
+
+    def make_tag_key(self, tag):
+        return f"tiered:tag:{tag}"
+
+    def get_tag_versions(self, tags):
+        """
+        Returns the current versions of the given tags,
+        assigning a version to the tags which have none yet.
+        """
+
+        keys = {self.make_tag_key(tag): tag for tag in tags}
+        found = self.shared.get_many(keys)
+        missing = {key: time.time_ns() for key in keys if key not in found}
+        if missing:
+            self.shared.set_many(missing, timeout=None)
+            found.update(missing)
+        return {tag: found[key] for key, tag in keys.items()}
+
+    def get(self, key, default=None):
+        key = self.make_key(key)
+        value = self.local.get(key)
+        if value is not MISSING:
+            self.stats.increment("local_hits")
+            return value
+        entry = self.shared.get(key)
+        if entry is not None:
+            value, tag_versions = entry
+            if self.get_tag_versions(tag_versions) == tag_versions:
+                self.local.set(key, value, self.config["LOCAL_TIMEOUT"],
+                               frozenset(tag_versions))
+                self.stats.increment("shared_hits")
+                return value
+        self.stats.increment("misses")
+        return default
+
+    def set(self, key, value, timeout, tags=(), tag_versions=None):
+        """
+        Stores the value in both tiers. `tag_versions` should be fetched
+        with `get_tag_versions` before computing the value, so that
+        an invalidation racing with the computation is not lost;
+        the current versions are used when they are not given.
+        """
+
+        key = self.make_key(key)
+        if tag_versions is None:
+            tag_versions = self.get_tag_versions(tags)
+        self.shared.set(key, (value, tag_versions), timeout)
+        self.local.set(key, value,
+                       min(timeout or self.config["LOCAL_TIMEOUT"],
+                           self.config["LOCAL_TIMEOUT"]),
+                       frozenset(tag_versions))
+        self.stats.increment("sets")
+
+    def get_or_set(self, key, compute, timeout, tags=()):
+        value = self.get(key, MISSING)
+        if value is MISSING:
+            tag_versions = self.get_tag_versions(tags)
+            value = compute()
+            self.set(key, value, timeout, tags, tag_versions)
+        return value
+
+    def delete(self, key):
+        key = self.make_key(key)
+        self.local.delete(key)
+        self.shared.delete(key)
+
+    def invalidate_tags(self, *tags):
+        version = time.time_ns()
+        self.shared.set_many(
+            {self.make_tag_key(tag): version for tag in tags}, timeout=None
+        )
+        self.local.delete_tagged(tags)
+        self.stats.increment("invalidations")
+
+
+tiered_cache = TieredCache()
@@ -0,0 +1,11 @@
+"""core app constants."""
+
+
+# Above this many rows, planner estimates replace exact counts.
+ESTIMATED_COUNT_THRESHOLD = 10000
+
+EXACT_COUNT_KIND = "exact"
+CACHED_COUNT_KIND = "cached"
+ESTIMATED_COUNT_KIND = "estimated"
+
+COUNT_CACHE_TIMEOUT = 60 * 60
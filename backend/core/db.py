@@ -0,0 +1,243 @@
+import json
+from contextlib import ExitStack
+
+from django.db import (DEFAULT_DB_ALIAS, IntegrityError, connections, router,
+                       transaction)
+from django.db.models import F
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime
+
+
+def explain(queryset):
+    """
+    Returns the JSON plan PostgreSQL would run the queryset with.
+    """
+
+    connection = connections[queryset.db]
+    sql, params = queryset.query.sql_with_params()
+    with connection.cursor() as cursor:
+        cursor.execute(f"EXPLAIN (FORMAT JSON) {sql}", params)
+        plan = cursor.fetchone()[0]
+    if isinstance(plan, str):
+        plan = json.loads(plan)
+    return plan[0]["Plan"]
+
+
+def iter_plan_nodes(plan):
+    yield plan
+    for child in plan.get("Plans", ()):
+        yield from iter_plan_nodes(child)
+
+
+def estimated_count(queryset):
+    """
+    Returns the number of rows the database planner expects
+    the queryset to yield, without running it. Only available
+    on PostgreSQL, returns None on the other backends.
+    """
+
+    if connections[queryset.db].vendor != "postgresql":
+        return None
+    return int(explain(queryset.order_by().values("pk"))["Plan Rows"])
+
+
+def lock_until_commit(key, using=DEFAULT_DB_ALIAS):
+    """
+    Takes a PostgreSQL advisory lock on the given string, held until
+    the enclosing transaction ends, so that the transactions locking
+    the same key run one after another. Does nothing on the other
+    backends, or outside of a transaction, where it would be released
+    right away.
+    """
+
+    connection = connections[using]
+    if connection.vendor != "postgresql" or not connection.in_atomic_block:
+        return
+    with connection.cursor() as cursor:
+        cursor.execute("SELECT pg_advisory_xact_lock(hashtextextended(%s, 0))",
+                       (key, ))
+
+
+def get_write_connection(model):
+    return connections[router.db_for_write(model)]
+
+
+def prepare(connection, model, values):
+    """
+    Returns the column names and the database values of the given
+    `field name -> value` mapping of the model.
+    """
+
+    fields = [model._meta.get_field(name) for name in values]
+    return (
+        [connection.ops.quote_name(field.column) for field in fields],
+        [
+            field.get_db_prep_save(value, connection)
+            for field, value in zip(fields, values.values())
+        ],
+    )
+
+
+def insert_unless_exists(model, values, parent_field, parent_id,
+                         parent_fields):
+    """
+    Inserts a row of the model, referencing the parent row `parent_id`
+    via `parent_field`, unless the row violates a unique constraint.
+    Returns the parent instance, with only `parent_fields` loaded,
+    along with whether the row was inserted, or None if there is no such
+    parent. Takes a single round trip on PostgreSQL, two elsewhere.
+    """
+
+    connection = get_write_connection(model)
+    quote = connection.ops.quote_name
+    parent = model._meta.get_field(parent_field)
+    parent_model = parent.related_model
+    parent_table = quote(parent_model._meta.db_table)
+    parent_pk = quote(parent_model._meta.pk.column)
+    columns, params = prepare(connection, model, values)
+    columns.append(quote(parent.column))
+    # `from_db` expects the values in the order of the model fields.
+    loaded = [
+        field for field in parent_model._meta.concrete_fields
+        if field.name in parent_fields
+    ]
+    selected = ", ".join(quote(field.column) for field in loaded)
+    insert = (
+        f"INSERT INTO {quote(model._meta.db_table)} ({', '.join(columns)}) "
+        f"SELECT {', '.join(['%s'] * len(params))}, {parent_pk} "
+        f"FROM {{source}} WHERE {parent_pk} = %s ON CONFLICT DO NOTHING"
+    )
+
+    try:
+        with ExitStack() as stack:
+            # A failed statement must not break the enclosing transaction.
+            if connection.in_atomic_block:
+                stack.enter_context(transaction.atomic(using=connection.alias))
+            with connection.cursor() as cursor:
+                if connection.vendor == "postgresql":
+                    cursor.execute(
+                        f"WITH parent AS (SELECT * FROM {parent_table} "
+                        f"WHERE {parent_pk} = %s), inserted AS ("
+                        + insert.format(source="parent")
+                        + f" RETURNING 1) SELECT {selected}, "
+                        f"EXISTS (SELECT 1 FROM inserted) FROM parent",
+                        [parent_id, *params, parent_id],
+                    )
+                    row = cursor.fetchone()
+                else:
+                    cursor.execute(insert.format(source=parent_table),
+                                   [*params, parent_id])
+                    created = cursor.rowcount > 0
+                    cursor.execute(
+                        f"SELECT {selected} FROM {parent_table} "
+                        f"WHERE {parent_pk} = %s",
+                        [parent_id],
+                    )
+                    row = cursor.fetchone()
+                    if row is not None:
+                        row = (*row, created)
+    except IntegrityError:
+        # The parent row got deleted concurrently.
+        if parent_model.objects.filter(pk=parent_id).exists():
+            raise
+        return None
+
+    if row is None:
+        return None
+    instance = parent_model.from_db(
+        connection.alias, [field.attname for field in loaded], row[:-1]
+    )
+    return instance, row[-1]
+
+
+def delete_matching(model, values):
+    """
+    Deletes the rows of the model matching the given `field name -> value`
+    mapping with a single statement, bypassing the deletion signals.
+    Returns the number of rows deleted. The callers take over whatever
+    the `post_delete` receivers of the model do, such as invalidating
+    its cache tag (see `api.signals`), so it is not to be used on the
+    models whose deletions are recorded as tombstones (SYNCED_MODELS).
+    """
+
+    connection = get_write_connection(model)
+    columns, params = prepare(connection, model, values)
+    conditions = " AND ".join(f"{column} = %s" for column in columns)
+    with connection.cursor() as cursor:
+        cursor.execute(
+            f"DELETE FROM {connection.ops.quote_name(model._meta.db_table)} "
+            f"WHERE {conditions}",
+            params,
+        )
+        return cursor.rowcount
+
+
+def insert_or_add(model, rows, unique_fields, field, batch_size):
+    """
+    Inserts the rows of the model, each a `field name -> value` mapping
+    with the same keys, adding the `field` value of the ones conflicting
+    with an existing row on `unique_fields` to the value of that row
+    instead. Takes a single statement per `batch_size` rows, so that
+    the concurrent inserts of the same new row never fail.
+    """
+
+    if not rows:
+        return
+    connection = get_write_connection(model)
+    quote = connection.ops.quote_name
+    table = quote(model._meta.db_table)
+    column = quote(model._meta.get_field(field).column)
+    conflict = ", ".join(
+        quote(model._meta.get_field(name).column) for name in unique_fields
+    )
+    columns, _ = prepare(connection, model, rows[0])
+    row_placeholders = f"({', '.join(['%s'] * len(columns))})"
+    with connection.cursor() as cursor:
+        for start in range(0, len(rows), batch_size):
+            batch = rows[start:start + batch_size]
+            params = []
+            for row in batch:
+                params.extend(prepare(connection, model, row)[1])
+            cursor.execute(
+                f"INSERT INTO {table} ({', '.join(columns)}) "
+                f"VALUES {', '.join([row_placeholders] * len(batch))} "
+                f"ON CONFLICT ({conflict}) DO UPDATE "
+                f"SET {column} = {table}.{column} + EXCLUDED.{column}",
+                params,
+            )
+
+
+def latest_changes(querysets, field="modified"):
+    """
+    Returns the (latest `field` value, number of rows) pair of each
+    of the querysets, all fetched in a single round trip,
+    from the database of the first one.
+    """
+
+    connection = connections[querysets[0].db]
+    selects, params = [], []
+    for index, queryset in enumerate(querysets):
+        sql, query_params = queryset.order_by().values(
+            changed=F(field)
+        ).query.sql_with_params()
+        selects.append(
+            f"(SELECT MAX(changed), COUNT(*) FROM ({sql}) AS rows_{index}) "
+            f"AS changes_{index}"
+        )
+        params.extend(query_params)
+    with connection.cursor() as cursor:
+        cursor.execute(f"SELECT * FROM {', '.join(selects)}", params)
+        row = cursor.fetchone()
+
+    def to_datetime(value):
+        # SQLite loses the column type of the aggregated values.
+        if isinstance(value, str):
+            value = parse_datetime(value)
+        if value is not None and timezone.is_naive(value):
+            return timezone.make_aware(value, timezone.utc)
+        return value
+
+    return [
+        (to_datetime(row[index]), row[index + 1])
+        for index in range(0, len(row), 2)
+    ]
@@ -0,0 +1,339 @@
+"""
+Helpers shared by the load-testing management commands.
+
+Load tests replay the requests of a Postman collection as scenarios:
+weighted sequences of collection requests, which a virtual user runs
+one after another, passing values extracted from the responses
+to the following requests via the collection variables.
+"""
+
+import http.client
+import json
+import os
+import random
+import re
+import threading
+import time
+from collections import defaultdict
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+from urllib.parse import urlsplit
+
+import numpy as np
+
+LATENCY_PERCENTILES = (50, 95, 99)
+VARIABLE = re.compile(r"{{(\w+)}}")
+REQUEST_TIMEOUT = 60
+
+
+def summarize_latencies(latencies):
+    """
+    Returns the given latencies percentiles, in milliseconds.
+    """
+
+    if not latencies:
+        return dict.fromkeys(LATENCY_PERCENTILES, 0.0)
+    values = np.percentile(np.asarray(latencies) * 1000, LATENCY_PERCENTILES)
+    return dict(zip(LATENCY_PERCENTILES, values.tolist()))
+
+
+def get_children(pid):
+    path = Path(f"/proc/{pid}/task/{pid}/children")
+    try:
+        return [int(child) for child in path.read_text().split()]
+    except OSError:
+        return []
+
+
+def get_memory_usage(pid):
+    """
+    Returns the (RSS, PSS) of the process and all its descendants
+    in bytes. Unlike RSS, PSS splits the pages shared copy-on-write
+    between the processes, so it does not count them once per process.
+    Linux only, returns zeros elsewhere.
+    """
+
+    rss = pss = 0
+    pending = [pid]
+    while pending:
+        pid = pending.pop()
+        pending.extend(get_children(pid))
+        try:
+            lines = Path(f"/proc/{pid}/smaps_rollup").read_text().splitlines()
+        except OSError:
+            continue
+        for line in lines:
+            name, _, value = line.partition(":")
+            if name == "Rss":
+                rss += int(value.split()[0]) * 1024
+            elif name == "Pss":
+                pss += int(value.split()[0]) * 1024
+    return rss, pss
+
+
+def get_cpu_count():
+    try:
+        return len(os.sched_getaffinity(0))
+    except AttributeError:
+        return os.cpu_count() or 1
+
+
+def render(template, variables):
+    return VARIABLE.sub(lambda match: str(variables[match.group(1)]),
+                        template)
+
+
+def extract(data, path):
+    """
+    Picks a value out of the decoded JSON response
+    by a dot-separated path of keys and indexes, e.g. `results.0.id`.
+    """
+
+    for key in path.split("."):
+        data = data[int(key) if isinstance(data, list) else key]
+    return data
+
+
+class CollectionRequest:
+
+    def __init__(self, method, url, headers, body):
+        self.method = method
+        self.url = url
+        self.headers = headers
+        self.body = body
+
+    @classmethod
+    def from_item(cls, request, auth):
+        headers = {
+            header["key"]: header["value"]
+            for header in request.get("header", ())
+            if not header.get("disabled")
+        }
+        if auth and auth["type"] == "apikey":
+            options = {option["key"]: option["value"]
+                       for option in auth["apikey"]}
+            headers[options["key"]] = options["value"]
+        elif auth and auth["type"] == "bearer":
+            options = {option["key"]: option["value"]
+                       for option in auth["bearer"]}
+            headers["Authorization"] = f"Bearer {options['token']}"
+        body = request.get("body", {})
+        if body.get("options", {}).get("raw", {}).get("language") == "json":
+            headers.setdefault("Content-Type", "application/json")
+        url = request["url"]
+        return cls(request["method"],
+                   url["raw"] if isinstance(url, dict) else url,
+                   headers,
+                   body.get("raw") if body.get("mode") == "raw" else None)
+
+    @property
+    def endpoint(self):
+        """
+        Names the endpoint after the method and the URL template,
+        so that the requests to different objects are reported together.
+        """
+
+        path = VARIABLE.sub(
+            lambda match: "" if match.group(1) == "baseUrl" else match[0],
+            self.url,
+        )
+        return f"{self.method} {path.partition('?')[0]}"
+
+    def render(self, variables):
+        variables = {**variables, "baseUrl": ""}
+        return (
+            self.method,
+            render(self.url, variables),
+            {name: render(value, variables)
+             for name, value in self.headers.items()},
+            None if self.body is None
+            else render(self.body, variables).encode(),
+        )
+
+
+class PostmanCollection:
+    """
+    Requests of a Postman collection by name, each along with the
+    authentication it inherits from its folders. Test scripts are not
+    interpreted, scenarios declare the variables to extract instead.
+    """
+
+    def __init__(self, path):
+        data = json.loads(Path(path).read_text())
+        self.variables = {variable["key"]: variable["value"]
+                          for variable in data.get("variable", ())}
+        self.requests = {}
+        self.load(data["item"], data.get("auth"))
+
+    def load(self, items, auth):
+        for item in items:
+            if "item" in item:
+                self.load(item["item"], item.get("auth") or auth)
+                continue
+            request = item["request"]
+            self.requests.setdefault(item["name"], CollectionRequest.from_item(
+                request, request.get("auth") or auth
+            ))
+
+
+class ScenarioFailed(Exception):
+    pass
+
+
+class Scenario:
+    """
+    Sequence of (request name, {variable: response path}) steps.
+    """
+
+    def __init__(self, name, weight, steps):
+        self.name = name
+        self.weight = weight
+        self.steps = steps
+
+
+class LoadTestStats:
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.latencies = defaultdict(list)
+        self.errors = defaultdict(int)
+        self.scenarios = defaultdict(lambda: [0, 0])
+        self.failures = defaultdict(int)
+        self.start_lags = []
+
+    def record_request(self, endpoint, latency, failed):
+        with self.lock:
+            self.latencies[endpoint].append(latency)
+            self.errors[endpoint] += failed
+
+    def record_scenario(self, name, start_lag, failure=None):
+        with self.lock:
+            self.scenarios[name][0] += 1
+            self.start_lags.append(start_lag)
+            if failure is not None:
+                self.scenarios[name][1] += 1
+                self.failures[f"{name}: {failure}"] += 1
+
+    def summarize(self, elapsed):
+        """
+        Returns the (endpoint, requests, requests per second,
+        latency percentiles, error rate) rows, busiest endpoint first.
+        """
+
+        with self.lock:
+            return sorted(
+                (
+                    (endpoint, len(latencies), len(latencies) / elapsed,
+                     summarize_latencies(latencies),
+                     self.errors[endpoint] / len(latencies))
+                    for endpoint, latencies in self.latencies.items()
+                ),
+                key=lambda row: (-row[1], row[0]),
+            )
+
+
+class VirtualUser:
+    """
+    Runs a scenario over a single keep-alive connection,
+    stopping at the first failed step, as the following ones
+    depend on the variables it should have set.
+    """
+
+    def __init__(self, base_url, collection, variables, stats, think_time):
+        url = urlsplit(base_url)
+        connection_class = (http.client.HTTPSConnection
+                            if url.scheme == "https"
+                            else http.client.HTTPConnection)
+        self.connection = connection_class(url.netloc,
+                                           timeout=REQUEST_TIMEOUT)
+        self.collection = collection
+        self.variables = variables
+        self.stats = stats
+        self.think_time = think_time
+
+    def send(self, name):
+        request = self.collection.requests[name]
+        try:
+            method, url, headers, body = request.render(self.variables)
+        except KeyError as error:
+            raise ScenarioFailed(f"{name}: variable {error} is not set")
+        started = time.monotonic()
+        try:
+            self.connection.request(method, url, body, headers)
+            response = self.connection.getresponse()
+            content = response.read()
+        except (OSError, http.client.HTTPException) as error:
+            self.connection.close()
+            self.stats.record_request(request.endpoint,
+                                      time.monotonic() - started, True)
+            raise ScenarioFailed(f"{name}: {error}")
+        failed = response.status >= 400
+        self.stats.record_request(request.endpoint,
+                                  time.monotonic() - started, failed)
+        if failed:
+            raise ScenarioFailed(f"{name}: {response.status}")
+        return content
+
+    def run(self, scenario):
+        try:
+            for number, (name, extractions) in enumerate(scenario.steps):
+                if number and self.think_time:
+                    time.sleep(random.expovariate(1 / self.think_time))
+                content = self.send(name)
+                if extractions:
+                    try:
+                        data = json.loads(content)
+                    except ValueError:
+                        raise ScenarioFailed(f"{name}: not a JSON response")
+                    for variable, path in extractions.items():
+                        try:
+                            self.variables[variable] = extract(data, path)
+                        except (KeyError, IndexError, TypeError):
+                            raise ScenarioFailed(
+                                f"{name}: {path} not found in the response"
+                            )
+        finally:
+            self.connection.close()
+
+
+def run_load_test(base_url, collection, scenarios, stages, max_users,
+                  think_time, get_variables):
+    """
+    Lets virtual users arrive as a Poisson process, at each of the
+    (users per second, seconds) stages rates in turn, each running
+    a scenario picked by weight, and waits for all of them to finish.
+    `get_variables` returns the variables of a new virtual user.
+    Returns the stats along with the time elapsed, in seconds.
+    """
+
+    stats = LoadTestStats()
+    weights = [scenario.weight for scenario in scenarios]
+
+    def run_virtual_user(scenario, arrived):
+        user = VirtualUser(base_url, collection, get_variables(), stats,
+                           think_time)
+        start_lag = time.monotonic() - arrived
+        try:
+            user.run(scenario)
+        except ScenarioFailed as error:
+            stats.record_scenario(scenario.name, start_lag, error)
+        else:
+            stats.record_scenario(scenario.name, start_lag)
+
+    started = time.monotonic()
+    with ThreadPoolExecutor(max_users) as executor:
+        arrival = started
+        for rate, duration in stages:
+            stage_end = arrival + duration
+            while True:
+                arrival += random.expovariate(rate)
+                if arrival >= stage_end:
+                    arrival = stage_end
+                    break
+                time.sleep(max(arrival - time.monotonic(), 0))
+                executor.submit(
+                    run_virtual_user,
+                    random.choices(scenarios, weights)[0],
+                    arrival,
+                )
+    return stats, time.monotonic() - started
@@ -0,0 +1,84 @@
+import hashlib
+
+from django.core.paginator import Paginator
+from django.utils.functional import cached_property
+
+from .cache import MISSING, tiered_cache
+from .constants import (CACHED_COUNT_KIND, COUNT_CACHE_TIMEOUT,
+                        ESTIMATED_COUNT_KIND, ESTIMATED_COUNT_THRESHOLD,
+                        EXACT_COUNT_KIND)
+from .db import estimated_count
+
+
+class EstimatedCountPaginator(Paginator):
+    """
+    Counts the rows exactly only while the planner estimates there are
+    fewer than ESTIMATED_COUNT_THRESHOLD of them, and settles for
+    the estimate otherwise, as an exact COUNT(*) over a large table
+    may take longer than fetching the page itself.
+    """
+
+    @cached_property
+    def estimate(self):
+        if not hasattr(self.object_list, "query"):
+            return None
+        estimate = estimated_count(self.object_list)
+        if estimate is None or estimate < ESTIMATED_COUNT_THRESHOLD:
+            return None
+        return estimate
+
+    @property
+    def is_estimated(self):
+        return self.estimate is not None
+
+    @cached_property
+    def count(self):
+        if self.is_estimated:
+            return self.estimate
+        return super().count
+
+
+class CachedCountPaginator(EstimatedCountPaginator):
+    """
+    Also caches the exact counts, per SQL of the count query, so that
+    every combination of filters, including the user-specific ones,
+    gets its own entry. The entries are tagged with the labels
+    of the models the filters depend on, and dropped upon their writes.
+    A paginator of the same rows, which has already counted them within
+    the request, may be set as `counted` to take its count over,
+    along with the kind of the count it reported.
+    """
+
+    counted = None
+
+    def __init__(self, object_list, per_page, tags=(), **kwargs):
+        super().__init__(object_list, per_page, **kwargs)
+        self.tags = tags
+        self.count_kind = EXACT_COUNT_KIND
+
+    def get_cache_key(self):
+        sql, params = self.object_list.order_by().query.sql_with_params()
+        digest = hashlib.md5(f"{sql}|{params}".encode()).hexdigest()
+        return f"count:{digest}"
+
+    @cached_property
+    def count(self):
+        if self.counted is not None:
+            # Already counted, so its kind is the final one.
+            self.count_kind = self.counted.count_kind
+            return self.counted.count
+        if not hasattr(self.object_list, "query"):
+            return super().count
+        key = self.get_cache_key()
+        count = tiered_cache.get(key, MISSING)
+        if count is not MISSING:
+            self.count_kind = CACHED_COUNT_KIND
+            return count
+        if self.is_estimated:
+            self.count_kind = ESTIMATED_COUNT_KIND
+            return self.estimate
+        tag_versions = tiered_cache.get_tag_versions(self.tags)
+        count = super().count
+        tiered_cache.set(key, count, COUNT_CACHE_TIMEOUT, self.tags,
+                         tag_versions)
+        return count
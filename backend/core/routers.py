@@ -0,0 +1,62 @@
+"""
+Primary/replica database routing.
+
+Writes always go to the primary. Reads go to the primary as well,
+unless the current request has opted into the replicas (see
+`use_replicas`), in which case a single replica, picked at random,
+serves all of its reads. Users who have just written are pinned
+to the primary for REPLICA_STICKINESS_SECONDS, so that replication
+lag never hides their own writes from them. The pins are kept
+in the default cache, which has to be shared across the processes.
+"""
+
+import random
+from contextvars import ContextVar
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import DEFAULT_DB_ALIAS, connections
+
+read_database = ContextVar("read_database", default=None)
+
+
+def get_pin_key(user_id):
+    return f"primary-pin:{user_id}"
+
+
+def pin_to_primary(user):
+    if user.is_authenticated and settings.REPLICA_DATABASES:
+        cache.set(get_pin_key(user.id), True,
+                  settings.REPLICA_STICKINESS_SECONDS)
+
+
+def is_pinned_to_primary(user):
+    return user.is_authenticated and cache.get(get_pin_key(user.id), False)
+
+
+def use_replicas(user):
+    """
+    Routes the reads of the current context to a replica,
+    unless the user is pinned to the primary. Returns the token
+    to reset the routing with.
+    """
+
+    alias = None
+    if settings.REPLICA_DATABASES and not is_pinned_to_primary(user):
+        alias = random.choice(settings.REPLICA_DATABASES)
+    return read_database.set(alias)
+
+
+class ReplicaRouter:
+
+    def db_for_read(self, model, **hints):
+        # Reads within a transaction must see its own writes.
+        if connections[DEFAULT_DB_ALIAS].in_atomic_block:
+            return DEFAULT_DB_ALIAS
+        return read_database.get() or DEFAULT_DB_ALIAS
+
+    def db_for_write(self, model, **hints):
+        return DEFAULT_DB_ALIAS
+
+    def allow_relation(self, obj1, obj2, **hints):
+        return True
@@ -0,0 +1,52 @@
+import hashlib
+import os
+
+from django.conf import settings
+from django.core.files import File
+from django.core.files.storage import FileSystemStorage
+
+from .db import lock_until_commit
+
+
+class ContentAddressedStorage(FileSystemStorage):
+    """
+    Names every file by the SHA-256 of its content (keeping the directory
+    and the extension), so that storing the same content twice writes
+    nothing, and a URL never changes its content, which makes it safe
+    to cache forever. Deleting the files nothing refers to anymore
+    is up to the models using them (see `recipes.signals`), which have
+    to save their instances in a transaction. Saving locks the name
+    until the transaction ends, so that a file found to exist is
+    not deleted before the row referring to it commits.
+    """
+
+    def save(self, name, content, max_length=None):
+        if not hasattr(content, "chunks"):
+            content = File(content, name)
+        digest = hashlib.sha256()
+        for chunk in content.chunks():
+            digest.update(chunk)
+        content.seek(0)
+        digest = digest.hexdigest()
+        directory, basename = os.path.split(name)
+        extension = os.path.splitext(basename)[1].lower()
+        name = os.path.join(directory, digest[:2], digest + extension)
+        return super().save(name, content, max_length)
+
+    def get_available_name(self, name, max_length=None):
+        # The same name means the same content, so it is never taken.
+        return name
+
+    def _save(self, name, content):
+        lock_until_commit(name)
+        if self.exists(name):
+            return name
+        return super()._save(name, content)
+
+
+def get_exports_storage():
+    """
+    Storage of the data exports, kept out of the publicly served media.
+    """
+
+    return FileSystemStorage(location=settings.EXPORTS_ROOT)
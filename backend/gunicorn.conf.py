@@ -0,0 +1,68 @@
+"""
+Gunicorn settings for serving the backend in production.
+Every setting can be overridden via its GUNICORN_* environment variable,
+see the `benchmark-serving` management command for comparing them.
+"""
+
+import os
+
+
+def get_cpu_count():
+    # Respects the CPU set the container is limited to.
+    try:
+        return len(os.sched_getaffinity(0))
+    except AttributeError:
+        return os.cpu_count() or 1
+
+
+bind = os.getenv("GUNICORN_BIND", "0.0.0.0:8000")
+
+# Threads keep a worker serving while some of its requests wait
+# for the database or for a slow client to send an image upload.
+worker_class = os.getenv("GUNICORN_WORKER_CLASS", "gthread")
+workers = int(os.getenv("GUNICORN_WORKERS", 2 * get_cpu_count() + 1))
+threads = int(os.getenv("GUNICORN_THREADS", 4))
+
+# Loads the app once in the master, so that the forked workers start
+# instantly and share its memory pages copy-on-write.
+preload_app = os.getenv("GUNICORN_PRELOAD", "True") == "True"
+
+# Recycles the workers to bound their memory growth. The jitter keeps
+# them from restarting all at once.
+max_requests = int(os.getenv("GUNICORN_MAX_REQUESTS", 1000))
+max_requests_jitter = int(os.getenv("GUNICORN_MAX_REQUESTS_JITTER", 100))
+
+timeout = int(os.getenv("GUNICORN_TIMEOUT", 30))
+graceful_timeout = int(os.getenv("GUNICORN_GRACEFUL_TIMEOUT", 30))
+keepalive = int(os.getenv("GUNICORN_KEEPALIVE", 5))
+
+# Heartbeat files on disk may stall the workers under Docker.
+if os.path.isdir("/dev/shm"):
+    worker_tmp_dir = "/dev/shm"
+
+accesslog = os.getenv("GUNICORN_ACCESS_LOG", "-") or None
+loglevel = os.getenv("GUNICORN_LOG_LEVEL", "info")
+
+
+def when_ready(server):
+    # Warms the preloaded app up once, before forking the workers.
+    if preload_app:
+        from django.db import connections
+
+        from api.warmup import warm_up
+        warm_up.run()
+        # The workers must not inherit the sockets of the master,
+        # they open their own connections when warming up.
+        connections.close_all()
+
+
+def post_fork(server, worker):
+    if preload_app:
+        from api.warmup import warm_up
+        warm_up.mark_cold()
+
+
+def post_worker_init(worker):
+    # Workers only start accepting connections once this returns.
+    from api.warmup import warm_up
+    warm_up.run()
@@ -1,8 +1,11 @@
 from django.contrib import admin
 from django.forms import BaseInlineFormSet, ValidationError
 
+from core.admin import LargeTableAdmin
+
 from .models import (CartItem, FavoriteItem, Ingredient,
                      IngredientAmountInRecipe, Recipe, RecipeTag, Tag)
+from .shopping_lists import get_amounts, record_ingredients_change
 
 admin.site.empty_value_display = "-empty-"
 
@@ -15,20 +18,25 @@ class TagAdmin(admin.ModelAdmin):
 
 
 @admin.register(Ingredient)
-class IngredientAdmin(admin.ModelAdmin):
+class IngredientAdmin(LargeTableAdmin):
     list_display = ("id", "name", "measurement_unit")
-    search_fields = ("name", )
-    list_filter = ("name", )
+    search_fields = ("^name", )
 
 
 @admin.register(FavoriteItem)
-class FavoriteItemAdmin(admin.ModelAdmin):
+class FavoriteItemAdmin(LargeTableAdmin):
     list_display = ("id", "user", "recipe")
+    list_select_related = ("user", "recipe")
+    autocomplete_fields = ("user", "recipe")
+    search_fields = ("=user__username", )
 
 
 @admin.register(CartItem)
-class CartItemAdmin(admin.ModelAdmin):
+class CartItemAdmin(LargeTableAdmin):
     list_display = ("id", "user", "recipe")
+    list_select_related = ("user", "recipe")
+    autocomplete_fields = ("user", "recipe")
+    search_fields = ("=user__username", )
 
 
 class RequiredInlineFormSet(BaseInlineFormSet):
@@ -54,28 +62,47 @@ class AmountInline(admin.TabularInline):
     model = IngredientAmountInRecipe
     formset = RequiredInlineFormSet
     min_num = 1
+    autocomplete_fields = ("ingredient", )
 
 
 @admin.display(description="tags")
 def tags(obj):
-    return ", ".join(
-        obj.tags.all().values_list("name", flat=True)
-    )
+    return ", ".join(tag.name for tag in obj.tags.all())
 
 
 @admin.display(description="ingredients")
 def ingredients(obj):
     return ", ".join(
-        obj.ingredients.all().values_list("ingredient__name", flat=True)
+        amount.ingredient.name for amount in obj.ingredients.all()
     )
 
 
+@admin.display(description="times favorited")
+def times_favorited(obj):
+    # Recipes created bypassing the signals have no ranking yet.
+    ranking = getattr(obj, "ranking", None)
+    return ranking.favorites_count if ranking is not None else 0
+
+
 @admin.register(Recipe)
-class RecipeAdmin(admin.ModelAdmin):
+class RecipeAdmin(LargeTableAdmin):
     list_display = (
         "id", "name", "cooking_time", "author", "image",
-        tags, ingredients, "times_favorited"
+        tags, ingredients, times_favorited
     )
-    list_filter = ("tags", "author", "name")
-    search_fields = ("name", )
+    list_filter = ("tags", )
+    search_fields = ("^name", "=author__username")
+    autocomplete_fields = ("author", )
     inlines = (RecipeTagInline, AmountInline)
+
+    def get_queryset(self, request):
+        return super().get_queryset(request).select_related(
+            "author", "ranking"
+        ).prefetch_related(
+            "tags", "ingredients__ingredient"
+        )
+
+    def save_related(self, request, form, formsets, change):
+        old_amounts = get_amounts(form.instance.id)
+        super().save_related(request, form, formsets, change)
+        record_ingredients_change(form.instance.id, old_amounts)
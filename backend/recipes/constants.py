@@ -1,4 +1,34 @@
 """recipes app constants."""
 
+from datetime import datetime, timezone
 
 MAX_FIELD_LENGTH = 200
+
+SIMILAR_RECIPES_COUNT = 10
+SIMILARITY_TAG_WEIGHT = 0.5
+SIMILARITY_MAX_DOCUMENT_FREQUENCY = 0.2
+SIMILARITY_MIN_PRUNED_FREQUENCY = 1000
+SIMILARITY_BATCH_SIZE = 64
+SIMILARITY_BULK_SIZE = 10000
+
+TRENDING_HALF_LIFE_HOURS = 48
+TRENDING_EPOCH = datetime(2024, 1, 1, tzinfo=timezone.utc)
+RANKINGS_BULK_SIZE = 10000
+
+PANTRY_INDEX_REFRESH_SECONDS = 5
+PANTRY_INDEX_MAX_OVERLAY = 1000
+PANTRY_INDEX_MAX_AGE_SECONDS = 60 * 60
+# Changes are read back this many seconds before the last refresh, so that
+# the transactions committing late with an earlier `modified` are not missed.
+PANTRY_INDEX_SAFETY_MARGIN_SECONDS = 5
+SHOPPING_LISTS_BULK_SIZE = 10000
+
+TAG_SLUGS_REFRESH_SECONDS = 60
+
+# Models, whose deletions are recorded for the delta sync.
+SYNCED_MODELS = (
+    "recipes.Tag",
+    "recipes.Ingredient",
+    "recipes.Recipe",
+)
+TOMBSTONE_TTL_DAYS = 30
@@ -3,13 +3,13 @@ import os
 from typing import Type
 
 from django.conf import settings
-from django.contrib.auth.hashers import make_password
 from django.core.management.base import BaseCommand
 from django.db import transaction
 from django.db.models import Model
 
 from users.models import CustomUser as User
 from users.models import Subscription
+from users.passwords import make_passwords
 
 from ...models import Ingredient, Recipe, Tag
 
@@ -31,6 +31,15 @@ class Command(BaseCommand):
         "test instances of recipes app models"
     )
 
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--workers",
+            type=int,
+            default=os.cpu_count(),
+            help=("number of worker processes hashing the passwords "
+                  "(defaults to the CPU count)"),
+        )
+
     def replace_field_name(self, fields, find, replace):
         fields[replace] = fields.pop(find)
 
@@ -40,12 +49,12 @@ class Command(BaseCommand):
             id=int(primary_key)
         )[0]
 
-    def hash_password(self, fields):
-        fields["password"] = make_password(fields.pop("password"))
+    def hash_passwords(self, rows, workers):
+        passwords = make_passwords([row["password"] for row in rows], workers)
+        for row, password in zip(rows, passwords):
+            row["password"] = password
 
     def handle_fields(self, fields, model: Type[Model]):
-        if model == User:
-            self.hash_password(fields)
         if model == Recipe:
             self.replace_field_name(fields, "title", "name")
             self.set_instance_from_id(fields, "author", User)
@@ -53,21 +62,32 @@ class Command(BaseCommand):
             self.set_instance_from_id(fields, "follower", User)
             self.set_instance_from_id(fields, "influencer", User)
 
-    def parse_table(self, table_path, model: Type[Model]):
+    def read_table(self, table_name):
+        table_path = os.path.join(
+            settings.BASE_DIR, DATA_DIRECTORY, table_name
+        )
         with open(file=table_path, mode="r", encoding="utf-8") as table:
-            data = []
-            reader = csv.DictReader(table)
-            for row in reader:
-                self.handle_fields(row, model)
-                data.append(model(**row))
-            model.objects.all().delete()
-            model.objects.bulk_create(data)
+            return list(csv.DictReader(table))
+
+    def parse_table(self, rows, model: Type[Model]):
+        data = []
+        for row in rows:
+            self.handle_fields(row, model)
+            data.append(model(**row))
+        model.objects.all().delete()
+        model.objects.bulk_create(data)
 
     @transaction.atomic
+    def import_tables(self, tables):
+        for model, rows in tables.items():
+            self.parse_table(rows, model)
+
     def handle(self, *args, **kwargs):
-        for table_name, model in MODEL_MAPPING.items():
-            table_path = os.path.join(
-                settings.BASE_DIR, DATA_DIRECTORY, table_name
-            )
-            self.parse_table(table_path, model)
+        tables = {
+            model: self.read_table(table_name)
+            for table_name, model in MODEL_MAPPING.items()
+        }
+        # Hashing forks worker processes, so it precedes the transaction.
+        self.hash_passwords(tables[User], kwargs["workers"])
+        self.import_tables(tables)
         self.stdout.write(self.style.SUCCESS("Data imported successfully"))
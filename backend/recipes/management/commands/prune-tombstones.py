@@ -0,0 +1,21 @@
+from datetime import timedelta
+
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+
+from ...constants import TOMBSTONE_TTL_DAYS
+from ...models import Tombstone
+
+
+class Command(BaseCommand):
+
+    help = (
+        "Delete the records of the deletions older than "
+        f"{TOMBSTONE_TTL_DAYS} days, which no delta sync may ask for"
+    )
+
+    def handle(self, *args, **kwargs):
+        deleted, _ = Tombstone.objects.filter(
+            deleted__lt=timezone.now() - timedelta(days=TOMBSTONE_TTL_DAYS)
+        ).delete()
+        self.stdout.write(self.style.SUCCESS(f"{deleted} tombstones pruned"))
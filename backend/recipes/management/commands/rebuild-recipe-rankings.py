@@ -0,0 +1,15 @@
+from django.core.management.base import BaseCommand
+
+from ...rankings import rebuild_rankings
+
+
+class Command(BaseCommand):
+
+    help = (
+        "Recompute the popularity & trending rankings of all the recipes "
+        "from their favorites and shopping cart entries"
+    )
+
+    def handle(self, *args, **kwargs):
+        rebuild_rankings()
+        self.stdout.write(self.style.SUCCESS("Recipe rankings rebuilt"))
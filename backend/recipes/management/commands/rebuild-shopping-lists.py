@@ -0,0 +1,15 @@
+from django.core.management.base import BaseCommand
+
+from ...shopping_lists import rebuild_shopping_lists
+
+
+class Command(BaseCommand):
+
+    help = (
+        "Recompute the aggregated shopping lists of all the users "
+        "from their shopping cart entries"
+    )
+
+    def handle(self, *args, **kwargs):
+        rebuild_shopping_lists()
+        self.stdout.write(self.style.SUCCESS("Shopping lists rebuilt"))
@@ -0,0 +1,34 @@
+import os
+
+from django.core.management.base import BaseCommand
+
+from ...similarity import refresh_similar_recipes
+
+
+class Command(BaseCommand):
+
+    help = (
+        "Refresh the precomputed similar recipes index, "
+        "either for the recipes changed since the last refresh, "
+        "or entirely when --full is given"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--full",
+            action="store_true",
+            help="rebuild the index for all the recipes",
+        )
+        parser.add_argument(
+            "--workers",
+            type=int,
+            default=os.cpu_count(),
+            help="number of worker processes (defaults to the CPU count)",
+        )
+
+    def handle(self, *args, **kwargs):
+        refreshed = refresh_similar_recipes(full=kwargs["full"],
+                                            workers=kwargs["workers"])
+        self.stdout.write(self.style.SUCCESS(
+            f"Similar recipes refreshed for {refreshed} recipes"
+        ))
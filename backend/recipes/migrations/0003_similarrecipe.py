@@ -0,0 +1,33 @@
+# Generated by Django 3.2 on 2026-10-19 17:47
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('recipes', '0002_initial'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='SimilarRecipe',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('created', models.DateTimeField(auto_now_add=True, db_index=True, verbose_name='date & time of instance creation')),
+                ('modified', models.DateTimeField(auto_now=True, verbose_name='date & time of last instance modification')),
+                ('score', models.FloatField(verbose_name='similarity score')),
+                ('rank', models.PositiveSmallIntegerField(verbose_name='rank among the neighbours')),
+                ('recipe', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='neighbours', to='recipes.recipe')),
+                ('similar', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='similar_to', to='recipes.recipe')),
+            ],
+            options={
+                'ordering': ('recipe', 'rank'),
+            },
+        ),
+        migrations.AddConstraint(
+            model_name='similarrecipe',
+            constraint=models.UniqueConstraint(fields=('recipe', 'rank'), name='recipe & rank must make a unique pair'),
+        ),
+    ]
@@ -0,0 +1,68 @@
+# Generated by Django 3.2 on 2026-10-19 17:50
+
+import math
+from datetime import datetime
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+TRENDING_HALF_LIFE_HOURS = 48
+TRENDING_EPOCH = '2024-01-01T00:00:00+00:00'
+
+
+def backfill_rankings(apps, schema_editor):
+    Recipe = apps.get_model('recipes', 'Recipe')
+    RecipeRanking = apps.get_model('recipes', 'RecipeRanking')
+    FavoriteItem = apps.get_model('recipes', 'FavoriteItem')
+    CartItem = apps.get_model('recipes', 'CartItem')
+
+    epoch = datetime.fromisoformat(TRENDING_EPOCH)
+    rate = math.log(2) / (TRENDING_HALF_LIFE_HOURS * 60 * 60)
+    rankings = {
+        recipe_id: RecipeRanking(recipe_id=recipe_id)
+        for recipe_id in Recipe.objects.values_list('id', flat=True)
+    }
+    for recipe_id, created in FavoriteItem.objects.values_list(
+        'recipe_id', 'created'
+    ):
+        ranking = rankings[recipe_id]
+        weight = rate * (created - epoch).total_seconds()
+        peak = max(ranking.trending, weight)
+        ranking.trending = peak + math.log(
+            math.exp(ranking.trending - peak) + math.exp(weight - peak)
+        )
+        ranking.favorites_count += 1
+        ranking.popularity += 1
+    for recipe_id in CartItem.objects.values_list('recipe_id', flat=True):
+        rankings[recipe_id].carts_count += 1
+        rankings[recipe_id].popularity += 1
+    RecipeRanking.objects.bulk_create(rankings.values(), batch_size=10000)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('recipes', '0003_similarrecipe'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='RecipeRanking',
+            fields=[
+                ('recipe', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='ranking', serialize=False, to='recipes.recipe')),
+                ('favorites_count', models.PositiveIntegerField(default=0, verbose_name='times added to favorites')),
+                ('carts_count', models.PositiveIntegerField(default=0, verbose_name='times added to shopping carts')),
+                ('popularity', models.PositiveIntegerField(default=0, verbose_name='popularity score')),
+                ('trending', models.FloatField(default=0, verbose_name='trending score')),
+            ],
+        ),
+        migrations.AddIndex(
+            model_name='reciperanking',
+            index=models.Index(fields=['-popularity', '-recipe'], name='ranking_popularity_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='reciperanking',
+            index=models.Index(fields=['-trending', '-recipe'], name='ranking_trending_idx'),
+        ),
+        migrations.RunPython(backfill_rankings, migrations.RunPython.noop),
+    ]
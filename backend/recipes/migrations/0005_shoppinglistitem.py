@@ -0,0 +1,50 @@
+# Generated by Django 3.2 on 2026-10-19 17:55
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+def backfill_shopping_lists(apps, schema_editor):
+    IngredientAmountInRecipe = apps.get_model(
+        'recipes', 'IngredientAmountInRecipe'
+    )
+    ShoppingListItem = apps.get_model('recipes', 'ShoppingListItem')
+
+    items = IngredientAmountInRecipe.objects.filter(
+        recipe__carts_in__isnull=False
+    ).values(
+        'ingredient_id', user_id=models.F('recipe__carts_in__user_id')
+    ).annotate(amount=models.Sum('amount')).order_by()
+    ShoppingListItem.objects.bulk_create(
+        (ShoppingListItem(**item) for item in items), batch_size=10000
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+        ('recipes', '0004_reciperanking'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ShoppingListItem',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('amount', models.PositiveIntegerField(verbose_name='total amount')),
+                ('ingredient', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='shopping_lists_in', to='recipes.ingredient')),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='shopping_list', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'ordering': ('user', 'ingredient__name'),
+            },
+        ),
+        migrations.AddConstraint(
+            model_name='shoppinglistitem',
+            constraint=models.UniqueConstraint(fields=('user', 'ingredient'), name='user & ingredient must make a unique pair'),
+        ),
+        migrations.RunPython(backfill_shopping_lists,
+                             migrations.RunPython.noop),
+    ]
@@ -0,0 +1,54 @@
+# Generated by Django 3.2 on 2026-10-19 17:59
+
+from django.db import migrations, models
+
+# `name__istartswith` compiles into UPPER(name) LIKE UPPER(%s) on
+# PostgreSQL, which only an expression index with pattern ops serves.
+INGREDIENT_NAME_PREFIX_INDEX = 'ingredient_name_prefix_idx'
+
+
+def create_name_prefix_index(apps, schema_editor):
+    if schema_editor.connection.vendor == 'postgresql':
+        schema_editor.execute(
+            f'CREATE INDEX {INGREDIENT_NAME_PREFIX_INDEX} '
+            'ON recipes_ingredient (UPPER(name::text) text_pattern_ops)'
+        )
+
+
+def drop_name_prefix_index(apps, schema_editor):
+    if schema_editor.connection.vendor == 'postgresql':
+        schema_editor.execute(
+            f'DROP INDEX IF EXISTS {INGREDIENT_NAME_PREFIX_INDEX}'
+        )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('recipes', '0005_shoppinglistitem'),
+    ]
+
+    operations = [
+        migrations.AlterModelOptions(
+            name='shoppinglistitem',
+            options={'ordering': ('ingredient__name',)},
+        ),
+        migrations.AddIndex(
+            model_name='favoriteitem',
+            index=models.Index(fields=['recipe', 'created'], name='favorite_recipe_created_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='ingredient',
+            index=models.Index(fields=['modified'], name='ingredient_modified_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='recipe',
+            index=models.Index(fields=['author', '-created'], name='recipe_author_created_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='recipe',
+            index=models.Index(fields=['modified'], name='recipe_modified_idx'),
+        ),
+        migrations.RunPython(create_name_prefix_index,
+                             drop_name_prefix_index),
+    ]
@@ -0,0 +1,33 @@
+# Generated by Django 3.2 on 2026-10-19 18:41
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('recipes', '0006_add_hot_query_indexes'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='Tombstone',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('model', models.CharField(max_length=200, verbose_name='label of the model of the deleted object')),
+                ('object_id', models.PositiveBigIntegerField(verbose_name='primary key of the deleted object')),
+                ('deleted', models.DateTimeField(auto_now_add=True, verbose_name='date & time of deletion')),
+            ],
+            options={
+                'ordering': ('deleted',),
+            },
+        ),
+        migrations.AddIndex(
+            model_name='tag',
+            index=models.Index(fields=['modified'], name='tag_modified_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='tombstone',
+            index=models.Index(fields=['model', 'deleted'], name='tombstone_model_deleted_idx'),
+        ),
+    ]
@@ -0,0 +1,17 @@
+# Generated by Django 3.2 on 2026-10-19 18:52
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('recipes', '0007_tombstone_and_sync_indexes'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='favoriteitem',
+            index=models.Index(fields=['user', 'created'], name='favorite_user_created_idx'),
+        ),
+    ]
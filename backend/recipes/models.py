@@ -1,6 +1,8 @@
 from django.core.validators import MinValueValidator
-from django.db.models import (CASCADE, CharField, ForeignKey, ImageField,
-                              IntegerField, ManyToManyField, Model,
+from django.db.models import (CASCADE, CharField, DateTimeField, FloatField,
+                              ForeignKey, ImageField, Index, IntegerField,
+                              ManyToManyField, Model, OneToOneField,
+                              PositiveBigIntegerField, PositiveIntegerField,
                               PositiveSmallIntegerField, SlugField, TextField,
                               UniqueConstraint)
 
@@ -58,6 +60,12 @@ class Tag(WithTimestamps, WithName):
                 name="tag name must be unique"
             ),
         )
+        indexes = (
+            Index(
+                fields=("modified", ),
+                name="tag_modified_idx",
+            ),
+        )
 
 
 class Ingredient(WithTimestamps, WithName):
@@ -79,6 +87,12 @@ class Ingredient(WithTimestamps, WithName):
                 name="name & measurement_unit must make a unique pair"
             ),
         )
+        indexes = (
+            Index(
+                fields=("modified", ),
+                name="ingredient_modified_idx",
+            ),
+        )
 
     def __str__(self):
         return f"{self.name}, {self.measurement_unit}"
@@ -118,6 +132,16 @@ class Recipe(WithTimestamps, WithName):
 
     class Meta:
         ordering = ("-created", )
+        indexes = (
+            Index(
+                fields=("author", "-created"),
+                name="recipe_author_created_idx",
+            ),
+            Index(
+                fields=("modified", ),
+                name="recipe_modified_idx",
+            ),
+        )
 
     @property
     def times_favorited(self):
@@ -211,6 +235,16 @@ class FavoriteItem(WithTimestamps):
                 name="already in favorites"
             ),
         )
+        indexes = (
+            Index(
+                fields=("recipe", "created"),
+                name="favorite_recipe_created_idx",
+            ),
+            Index(
+                fields=("user", "created"),
+                name="favorite_user_created_idx",
+            ),
+        )
 
     def __str__(self):
         return f"{self.user} has {self.recipe} in their favorites"
@@ -242,3 +276,158 @@ class CartItem(WithTimestamps):
 
     def __str__(self):
         return f"{self.user} has {self.recipe} in their shopping cart"
+
+
+class SimilarRecipe(WithTimestamps):
+    """
+    A precomputed neighbour of a recipe in the similarity index.
+    Maintained by the `refresh-similar-recipes` management command,
+    never computed at request time.
+    """
+
+    recipe = ForeignKey(
+        to=Recipe,
+        on_delete=CASCADE,
+        related_name="neighbours",
+    )
+    similar = ForeignKey(
+        to=Recipe,
+        on_delete=CASCADE,
+        related_name="similar_to",
+    )
+    score = FloatField(
+        verbose_name="similarity score",
+    )
+    rank = PositiveSmallIntegerField(
+        verbose_name="rank among the neighbours",
+    )
+
+    class Meta:
+        ordering = ("recipe", "rank")
+        constraints = (
+            UniqueConstraint(
+                fields=("recipe", "rank"),
+                name="recipe & rank must make a unique pair"
+            ),
+        )
+
+    def __str__(self):
+        return f"{self.similar} is similar to {self.recipe}"
+
+
+class RecipeRanking(Model):
+    """
+    Materialized popularity & trending scores of a recipe.
+    Maintained incrementally as the recipe gets added to (or removed from)
+    favorites and shopping carts, so that ranked lists never aggregate.
+    `trending` is the log of the time-decayed favorites count,
+    see `recipes.rankings` for details.
+    """
+
+    recipe = OneToOneField(
+        to=Recipe,
+        on_delete=CASCADE,
+        primary_key=True,
+        related_name="ranking",
+    )
+    favorites_count = PositiveIntegerField(
+        default=0,
+        verbose_name="times added to favorites",
+    )
+    carts_count = PositiveIntegerField(
+        default=0,
+        verbose_name="times added to shopping carts",
+    )
+    popularity = PositiveIntegerField(
+        default=0,
+        verbose_name="popularity score",
+    )
+    trending = FloatField(
+        default=0,
+        verbose_name="trending score",
+    )
+
+    class Meta:
+        indexes = (
+            Index(
+                fields=("-popularity", "-recipe"),
+                name="ranking_popularity_idx",
+            ),
+            Index(
+                fields=("-trending", "-recipe"),
+                name="ranking_trending_idx",
+            ),
+        )
+
+    def __str__(self):
+        return f"{self.recipe} ranking"
+
+
+class ShoppingListItem(Model):
+    """
+    Total amount of an ingredient over all the recipes
+    in a user's shopping cart. Maintained incrementally as the cart
+    (or the ingredients of a recipe in it) changes, so that exporting
+    the cart never aggregates, see `recipes.shopping_lists` for details.
+    """
+
+    user = ForeignKey(
+        to=User,
+        on_delete=CASCADE,
+        related_name="shopping_list",
+    )
+    ingredient = ForeignKey(
+        to=Ingredient,
+        on_delete=CASCADE,
+        related_name="shopping_lists_in",
+    )
+    amount = PositiveIntegerField(
+        verbose_name="total amount",
+    )
+
+    class Meta:
+        ordering = ("ingredient__name", )
+        constraints = (
+            UniqueConstraint(
+                fields=("user", "ingredient"),
+                name="user & ingredient must make a unique pair"
+            ),
+        )
+
+    def __str__(self):
+        return (f"{self.user} has to buy {self.amount} "
+                f"{self.ingredient.measurement_unit} of "
+                f"{self.ingredient.name}")
+
+
+class Tombstone(Model):
+    """
+    Records the deletion of a tag, an ingredient or a recipe, so that
+    the clients syncing by the `modified` timestamps learn about it.
+    Kept for TOMBSTONE_TTL_DAYS, pruned by the `prune-tombstones`
+    management command.
+    """
+
+    model = CharField(
+        max_length=MAX_FIELD_LENGTH,
+        verbose_name="label of the model of the deleted object",
+    )
+    object_id = PositiveBigIntegerField(
+        verbose_name="primary key of the deleted object",
+    )
+    deleted = DateTimeField(
+        auto_now_add=True,
+        verbose_name="date & time of deletion",
+    )
+
+    class Meta:
+        ordering = ("deleted", )
+        indexes = (
+            Index(
+                fields=("model", "deleted"),
+                name="tombstone_model_deleted_idx",
+            ),
+        )
+
+    def __str__(self):
+        return f"{self.model} #{self.object_id} deleted at {self.deleted}"
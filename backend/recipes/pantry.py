@@ -0,0 +1,186 @@
+"""
+In-memory inverted index from ingredients to the recipes including them,
+backing the "what can I cook" pantry matching.
+
+Every ingredient maps onto the sorted array of the index rows
+of the recipes it is used in, which is a compressed form of a recipe
+bitmap. Matching a pantry concatenates the postings of its ingredients
+and counts them per recipe with a single `bincount`, so that queries
+take milliseconds regardless of the number of recipes.
+
+Each process keeps its own copy. Writes done by the process itself
+mark it stale immediately, while the writes done by the other processes
+are picked up at most PANTRY_INDEX_REFRESH_SECONDS later, as long as
+they commit within PANTRY_INDEX_SAFETY_MARGIN_SECONDS of their `modified`
+timestamp. Changed recipes are patched in as an overlay, until there
+are enough of them (or the index is old enough) to justify a full rebuild.
+"""
+
+import threading
+from datetime import timedelta
+from time import monotonic
+
+import numpy as np
+
+from django.utils import timezone
+
+from .constants import (PANTRY_INDEX_MAX_AGE_SECONDS, PANTRY_INDEX_MAX_OVERLAY,
+                        PANTRY_INDEX_REFRESH_SECONDS,
+                        PANTRY_INDEX_SAFETY_MARGIN_SECONDS)
+from .models import IngredientAmountInRecipe, Recipe
+
+
+class PantrySnapshot:
+    """
+    Immutable state of the index, swapped as a whole on every refresh,
+    so that the concurrent queries never see it half-updated.
+    """
+
+    def __init__(self, recipe_ids, sizes, postings, overlay, superseded):
+        self.recipe_ids = recipe_ids
+        self.sizes = sizes
+        self.postings = postings
+        self.overlay = overlay
+        self.superseded = superseded
+
+    def with_overlay(self, changes):
+        overlay = {**self.overlay, **changes}
+        superseded = self.superseded.copy()
+        ids = np.fromiter(changes, dtype=np.int64, count=len(changes))
+        rows = np.minimum(np.searchsorted(self.recipe_ids, ids),
+                          max(len(self.recipe_ids) - 1, 0))
+        if len(self.recipe_ids):
+            superseded[rows[self.recipe_ids[rows] == ids]] = True
+        return PantrySnapshot(self.recipe_ids, self.sizes, self.postings,
+                              overlay, superseded)
+
+
+def load_snapshot():
+    pairs = np.fromiter(
+        (
+            value for pair in IngredientAmountInRecipe.objects.values_list(
+                "recipe_id", "ingredient_id"
+            ).iterator()
+            for value in pair
+        ),
+        dtype=np.int64,
+    ).reshape(-1, 2)
+    recipe_ids, rows = np.unique(pairs[:, 0], return_inverse=True)
+    order = np.argsort(pairs[:, 1], kind="stable")
+    ingredient_ids, starts = np.unique(pairs[order, 1], return_index=True)
+    postings = dict(zip(
+        ingredient_ids.tolist(),
+        np.split(rows[order].astype(np.int32), starts[1:]),
+    ))
+    return PantrySnapshot(
+        recipe_ids=recipe_ids,
+        sizes=np.bincount(rows, minlength=len(recipe_ids)),
+        postings=postings,
+        overlay={},
+        superseded=np.zeros(len(recipe_ids), dtype=bool),
+    )
+
+
+def load_changes(since):
+    # Recipes left without ingredients still supersede their index rows.
+    changes = {
+        recipe_id: set() for recipe_id in Recipe.objects.filter(
+            modified__gt=since
+        ).values_list("id", flat=True).iterator()
+    }
+    for recipe_id, ingredient_id in IngredientAmountInRecipe.objects.filter(
+        recipe__modified__gt=since
+    ).values_list("recipe_id", "ingredient_id").iterator():
+        changes.setdefault(recipe_id, set()).add(ingredient_id)
+    return {
+        recipe_id: frozenset(ingredients)
+        for recipe_id, ingredients in changes.items()
+    }
+
+
+class PantryIndex:
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.snapshot = None
+        self.built_at = None
+        self.synced_at = None
+        self.checked_at = None
+        self.stale = True
+
+    def mark_stale(self):
+        self.stale = True
+
+    def refresh(self):
+        if (not self.stale and self.checked_at is not None
+                and monotonic() - self.checked_at
+                < PANTRY_INDEX_REFRESH_SECONDS):
+            return
+        with self.lock:
+            self.stale = False
+            self.checked_at = monotonic()
+            started = timezone.now()
+            if (self.snapshot is None
+                    or len(self.snapshot.overlay) > PANTRY_INDEX_MAX_OVERLAY
+                    or (started - self.built_at).total_seconds()
+                    > PANTRY_INDEX_MAX_AGE_SECONDS):
+                self.snapshot = load_snapshot()
+                self.built_at = started
+            else:
+                changes = load_changes(self.synced_at)
+                if changes:
+                    self.snapshot = self.snapshot.with_overlay(changes)
+            # Overlaying a recipe again is harmless, missing it is not.
+            self.synced_at = started - timedelta(
+                seconds=PANTRY_INDEX_SAFETY_MARGIN_SECONDS
+            )
+
+    def match(self, pantry, max_missing=None):
+        """
+        Returns the (recipe id, ingredients total, ingredients missing)
+        tuples of the recipes including at least one of the pantry
+        ingredients, and missing at most `max_missing` of their own,
+        ordered by the covered share of the recipe, best first.
+        """
+
+        self.refresh()
+        snapshot = self.snapshot
+        pantry = frozenset(pantry)
+        postings = [
+            snapshot.postings[ingredient_id] for ingredient_id in pantry
+            if ingredient_id in snapshot.postings
+        ]
+        matched = np.bincount(
+            np.concatenate(postings) if postings else np.empty(0, np.int32),
+            minlength=len(snapshot.recipe_ids),
+        )
+        selected = (matched > 0) & ~snapshot.superseded
+        if max_missing is not None:
+            selected &= snapshot.sizes - matched <= max_missing
+        rows = np.flatnonzero(selected)
+        recipe_ids = snapshot.recipe_ids[rows]
+        totals = snapshot.sizes[rows]
+        missing = totals - matched[rows]
+
+        extra = [
+            (recipe_id, len(ingredients), len(ingredients - pantry))
+            for recipe_id, ingredients in snapshot.overlay.items()
+            if ingredients & pantry and (
+                max_missing is None
+                or len(ingredients - pantry) <= max_missing
+            )
+        ]
+        if extra:
+            extra = np.array(extra, dtype=np.int64)
+            recipe_ids = np.concatenate((recipe_ids, extra[:, 0]))
+            totals = np.concatenate((totals, extra[:, 1]))
+            missing = np.concatenate((missing, extra[:, 2]))
+
+        coverage = (totals - missing) / np.maximum(totals, 1)
+        order = np.lexsort((-recipe_ids, missing, -coverage))
+        return list(zip(recipe_ids[order].tolist(),
+                        totals[order].tolist(),
+                        missing[order].tolist()))
+
+
+pantry_index = PantryIndex()
@@ -0,0 +1,133 @@
+"""
+Incremental maintenance of the recipe rankings.
+
+`popularity` is the all-time number of favorites and cart additions.
+`trending` weighs every favorite by exp(-λ·age), halving its weight
+each TRENDING_HALF_LIFE_HOURS. As all recipes decay at the same rate,
+it is enough to store ln(1 + Σ exp(λ·(created - TRENDING_EPOCH)))
+for each recipe: the order of these never changes as time passes,
+so a new favorite only has to be log-added to a single row, and stored
+values stay within the float range without periodic rescaling.
+"""
+
+import math
+from itertools import groupby
+from operator import itemgetter
+
+from django.db import transaction
+from django.db.models import Count, F, FloatField, Value
+from django.db.models.functions import Abs, Exp, Greatest, Ln
+
+from .constants import (RANKINGS_BULK_SIZE, TRENDING_EPOCH,
+                        TRENDING_HALF_LIFE_HOURS)
+from .models import CartItem, FavoriteItem, Recipe, RecipeRanking
+
+DECAY_RATE = math.log(2) / (TRENDING_HALF_LIFE_HOURS * 60 * 60)
+
+
+def get_trending_weight(created):
+    """
+    Returns the log-weight of a favorite added at the given moment.
+    """
+
+    return DECAY_RATE * (created - TRENDING_EPOCH).total_seconds()
+
+
+def get_trending_score(favorites_created):
+    """
+    Computes the trending score of a recipe from scratch,
+    given the creation moments of all of its favorites.
+    """
+
+    weights = [get_trending_weight(created) for created in favorites_created]
+    peak = max((0.0, *weights))
+    return peak + math.log(
+        math.exp(-peak) + sum(math.exp(weight - peak) for weight in weights)
+    )
+
+
+def record_addition(list_model, recipe_id, created):
+    """
+    Accounts a recipe being added to a user's favorites or cart.
+    """
+
+    if list_model is FavoriteItem:
+        weight = Value(get_trending_weight(created), output_field=FloatField())
+        changes = {
+            "favorites_count": F("favorites_count") + 1,
+            # ln(e^trending + e^weight), computed without overflowing.
+            "trending": Greatest(F("trending"), weight) + Ln(
+                1 + Exp(-Abs(F("trending") - weight))
+            ),
+        }
+    else:
+        changes = {"carts_count": F("carts_count") + 1}
+    RecipeRanking.objects.filter(recipe_id=recipe_id).update(
+        popularity=F("popularity") + 1, **changes
+    )
+
+
+def record_removal(list_model, recipe_id):
+    """
+    Accounts a recipe being removed from a user's favorites or cart.
+    Log-subtracting the weight of the removed favorite would lose
+    precision, so its trending score is recomputed instead.
+    """
+
+    if list_model is FavoriteItem:
+        changes = {
+            "favorites_count": F("favorites_count") - 1,
+            "trending": get_trending_score(
+                FavoriteItem.objects.filter(
+                    recipe_id=recipe_id
+                ).values_list("created", flat=True).iterator()
+            ),
+        }
+    else:
+        changes = {"carts_count": F("carts_count") - 1}
+    RecipeRanking.objects.filter(recipe_id=recipe_id).update(
+        popularity=F("popularity") - 1, **changes
+    )
+
+
+@transaction.atomic
+def rebuild_rankings():
+    """
+    Recomputes the rankings of all the recipes from scratch,
+    creating the missing ones. Meant for reconciliation after bulk
+    imports and manual edits which bypass the incremental path.
+    """
+
+    carts = dict(
+        CartItem.objects.values("recipe_id").annotate(
+            count=Count("id")
+        ).values_list("recipe_id", "count")
+    )
+    favorites = {}
+    for recipe_id, items in groupby(
+        FavoriteItem.objects.order_by("recipe_id").values_list(
+            "recipe_id", "created"
+        ).iterator(),
+        key=itemgetter(0),
+    ):
+        created = [item[1] for item in items]
+        favorites[recipe_id] = (len(created), get_trending_score(created))
+
+    def build_ranking(recipe_id):
+        favorites_count, trending = favorites.get(recipe_id, (0, 0.0))
+        carts_count = carts.get(recipe_id, 0)
+        return RecipeRanking(recipe_id=recipe_id,
+                             favorites_count=favorites_count,
+                             carts_count=carts_count,
+                             popularity=favorites_count + carts_count,
+                             trending=trending)
+
+    RecipeRanking.objects.all().delete()
+    # The recipes committed since the delete come with their own,
+    # just created and thus accurate, rankings.
+    RecipeRanking.objects.bulk_create(
+        map(build_ranking,
+            Recipe.objects.values_list("id", flat=True).iterator()),
+        batch_size=RANKINGS_BULK_SIZE,
+        ignore_conflicts=True,
+    )
@@ -0,0 +1,150 @@
+"""
+Incremental maintenance of the aggregated shopping lists.
+
+The shopping list of a user holds the total amount of every ingredient
+over the recipes in their shopping cart. It is adjusted by the amounts
+of a recipe whenever the recipe enters or leaves the cart, or has its
+ingredients edited while being in some carts, so that exporting
+the cart is a single-table read.
+"""
+
+from django.db import transaction
+from django.db.models import Case, F, IntegerField, Sum, Value, When
+from django.db.models.functions import Greatest
+
+from core.db import insert_or_add
+
+from .constants import SHOPPING_LISTS_BULK_SIZE
+from .models import CartItem, IngredientAmountInRecipe, ShoppingListItem
+
+
+def get_amounts(recipe_id):
+    return dict(
+        IngredientAmountInRecipe.objects.filter(
+            recipe_id=recipe_id
+        ).values_list("ingredient_id", "amount")
+    )
+
+
+def negate(amounts):
+    return {
+        ingredient_id: -amount for ingredient_id, amount in amounts.items()
+    }
+
+
+@transaction.atomic
+def apply_changes(user_ids, changes):
+    """
+    Adds the per-ingredient amount changes to the shopping lists
+    of the given users, dropping the ingredients nothing is left of.
+    The additions are upserted, so that two carts gaining the same
+    new ingredient at once both get it, while the removals only
+    ever concern the existing items.
+    """
+
+    user_ids = set(user_ids)
+    if not user_ids:
+        return
+    insert_or_add(
+        ShoppingListItem,
+        [
+            {"user": user_id, "ingredient": ingredient_id, "amount": change}
+            for user_id in user_ids
+            for ingredient_id, change in changes.items()
+            if change > 0
+        ],
+        ("user", "ingredient"),
+        "amount",
+        SHOPPING_LISTS_BULK_SIZE,
+    )
+    removals = {
+        ingredient_id: change for ingredient_id, change in changes.items()
+        if change < 0
+    }
+    if not removals:
+        return
+    items = ShoppingListItem.objects.filter(user_id__in=user_ids,
+                                            ingredient_id__in=removals)
+    items.update(amount=Greatest(
+        F("amount") + Case(
+            *(
+                When(ingredient_id=ingredient_id, then=Value(change))
+                for ingredient_id, change in removals.items()
+            ),
+            output_field=IntegerField(),
+        ),
+        Value(0),
+    ))
+    items.filter(amount=0).delete()
+
+
+def record_addition(user_id, recipe_id):
+    """
+    Accounts a recipe being added to a user's shopping cart.
+    """
+
+    apply_changes([user_id], get_amounts(recipe_id))
+
+
+def record_removal(user_id, recipe_id):
+    """
+    Accounts a recipe being removed from a user's shopping cart.
+    """
+
+    apply_changes([user_id], negate(get_amounts(recipe_id)))
+
+
+def get_cart_users(recipe_id):
+    return list(
+        CartItem.objects.filter(
+            recipe_id=recipe_id
+        ).values_list("user_id", flat=True)
+    )
+
+
+def record_ingredients_change(recipe_id, old_amounts):
+    """
+    Accounts the ingredients of a recipe being edited, given
+    their amounts before the edit, in the carts the recipe is in.
+    """
+
+    new_amounts = get_amounts(recipe_id)
+    apply_changes(get_cart_users(recipe_id), {
+        ingredient_id: (new_amounts.get(ingredient_id, 0)
+                        - old_amounts.get(ingredient_id, 0))
+        for ingredient_id in new_amounts.keys() | old_amounts.keys()
+    })
+
+
+def record_recipe_deletion(recipe_id):
+    """
+    Accounts a recipe about to be deleted, along with all
+    the cart entries it has, from the carts the recipe is in.
+    """
+
+    apply_changes(get_cart_users(recipe_id),
+                  negate(get_amounts(recipe_id)))
+
+
+@transaction.atomic
+def rebuild_shopping_lists():
+    """
+    Recomputes the shopping lists of all the users from scratch.
+    Meant for reconciliation after bulk imports and manual edits
+    which bypass the incremental path.
+    """
+
+    ShoppingListItem.objects.all().delete()
+    ShoppingListItem.objects.bulk_create(
+        (
+            ShoppingListItem(**item)
+            for item in IngredientAmountInRecipe.objects.filter(
+                recipe__carts_in__isnull=False
+            ).values(
+                "ingredient_id", user_id=F("recipe__carts_in__user_id")
+            ).annotate(
+                amount=Sum("amount")
+            ).order_by().iterator()
+        ),
+        batch_size=SHOPPING_LISTS_BULK_SIZE,
+    )
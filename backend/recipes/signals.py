@@ -0,0 +1,117 @@
+from django.apps import apps
+from django.db import transaction
+from django.db.models.signals import (post_delete, post_init, post_save,
+                                      pre_delete)
+from django.utils import timezone
+
+from core.db import lock_until_commit
+
+from .constants import SYNCED_MODELS
+from .models import (Ingredient, IngredientAmountInRecipe, Recipe,
+                     RecipeRanking, Tag, Tombstone)
+from .pantry import pantry_index
+from .shopping_lists import record_recipe_deletion
+from .similarity import drop_from_neighbours
+from .tag_slugs import tag_slugs
+
+
+def create_recipe_ranking(sender, instance, created, **kwargs):
+    if created:
+        RecipeRanking.objects.create(recipe=instance)
+
+
+def update_shopping_lists(sender, instance, **kwargs):
+    record_recipe_deletion(instance.id)
+
+
+def update_similar_recipes(sender, instance, **kwargs):
+    drop_from_neighbours(instance.id)
+
+
+def mark_pantry_index_stale(sender, **kwargs):
+    pantry_index.mark_stale()
+
+
+def drop_tag_slugs(sender, **kwargs):
+    tag_slugs.mark_stale()
+
+
+def remember_image(sender, instance, **kwargs):
+    # Only when loaded, so that a deferred image is not fetched.
+    image = instance.__dict__.get("image")
+    instance._loaded_image = getattr(image, "name", image)
+
+
+def release_image(name):
+    """
+    Deletes the image file once no recipe refers to it anymore,
+    as content-addressed files are shared between the recipes.
+    """
+
+    @transaction.atomic
+    def delete_unreferenced():
+        # Waits for the uploads of the same content still running.
+        lock_until_commit(name)
+        if not Recipe.objects.filter(image=name).exists():
+            Recipe.image.field.storage.delete(name)
+
+    if name:
+        transaction.on_commit(delete_unreferenced)
+
+
+def release_replaced_image(sender, instance, created, **kwargs):
+    loaded = getattr(instance, "_loaded_image", None)
+    if not created and loaded != instance.image.name:
+        release_image(loaded)
+    instance._loaded_image = instance.image.name
+
+
+def release_deleted_image(sender, instance, **kwargs):
+    release_image(instance.image.name)
+
+
+def record_deletion(sender, instance, **kwargs):
+    Tombstone.objects.create(model=sender._meta.label, object_id=instance.pk)
+
+
+def touch_recipes_of_tag(sender, instance, **kwargs):
+    # Deleting the tag deletes its links, the recipes would not show up
+    # as changed otherwise.
+    Recipe.objects.filter(tags=instance).update(modified=timezone.now())
+
+
+def touch_recipes_of_ingredient(sender, instance, **kwargs):
+    Recipe.objects.filter(ingredients__ingredient=instance).update(
+        modified=timezone.now()
+    )
+
+
+def connect_signals():
+    post_save.connect(create_recipe_ranking, sender=Recipe,
+                      dispatch_uid="create-recipe-ranking")
+    pre_delete.connect(update_shopping_lists, sender=Recipe,
+                       dispatch_uid="update-shopping-lists")
+    pre_delete.connect(update_similar_recipes, sender=Recipe,
+                       dispatch_uid="update-similar-recipes")
+    post_init.connect(remember_image, sender=Recipe,
+                      dispatch_uid="remember-recipe-image")
+    post_save.connect(release_replaced_image, sender=Recipe,
+                      dispatch_uid="release-replaced-recipe-image")
+    post_delete.connect(release_deleted_image, sender=Recipe,
+                        dispatch_uid="release-deleted-recipe-image")
+    for model in (Recipe, IngredientAmountInRecipe):
+        post_save.connect(mark_pantry_index_stale, sender=model,
+                          dispatch_uid=f"pantry-index-save-{model}")
+        post_delete.connect(mark_pantry_index_stale, sender=model,
+                            dispatch_uid=f"pantry-index-delete-{model}")
+    post_save.connect(drop_tag_slugs, sender=Tag,
+                      dispatch_uid="tag-slugs-save")
+    post_delete.connect(drop_tag_slugs, sender=Tag,
+                        dispatch_uid="tag-slugs-delete")
+    pre_delete.connect(touch_recipes_of_tag, sender=Tag,
+                       dispatch_uid="touch-recipes-of-tag")
+    pre_delete.connect(touch_recipes_of_ingredient, sender=Ingredient,
+                       dispatch_uid="touch-recipes-of-ingredient")
+    for label in SYNCED_MODELS:
+        post_delete.connect(record_deletion, sender=apps.get_model(label),
+                            dispatch_uid=f"record-deletion-{label}")
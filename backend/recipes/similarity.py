@@ -0,0 +1,251 @@
+"""
+Recipe similarity index.
+
+Every recipe is a row of a sparse recipe x (ingredient + tag) matrix,
+weighted by inverse document frequency and L2-normalized, so that
+the cosine similarity of two recipes is the dot product of their rows.
+Top-k neighbours are computed for batches of rows as sparse matrix
+products, spread across a pool of forked worker processes which share
+the matrix copy-on-write. The results are stored in the SimilarRecipe
+table, so that the API reads them with a single lookup. Deleted recipes
+are dropped from the neighbours of the others right away, with the ranks
+after them moved up, so that the stored ranks stay contiguous.
+"""
+
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+from contextlib import ExitStack
+
+import numpy as np
+from scipy import sparse
+
+from django.db import connections, transaction
+from django.db.models import F, Max, OuterRef, Subquery
+from django.utils import timezone
+
+from .constants import (SIMILAR_RECIPES_COUNT, SIMILARITY_BATCH_SIZE,
+                        SIMILARITY_BULK_SIZE,
+                        SIMILARITY_MAX_DOCUMENT_FREQUENCY,
+                        SIMILARITY_MIN_PRUNED_FREQUENCY, SIMILARITY_TAG_WEIGHT)
+from .models import IngredientAmountInRecipe, Recipe, RecipeTag, SimilarRecipe
+
+# Set before forking the workers, so that they inherit it instead
+# of receiving a pickled copy along with every batch.
+_matrix = None
+_transposed = None
+
+
+def load_pairs(model, field):
+    values = model.objects.values_list("recipe_id", field)
+    pairs = np.fromiter(
+        (value for pair in values.iterator() for value in pair),
+        dtype=np.int64,
+    )
+    return pairs.reshape(-1, 2)
+
+
+def build_matrix():
+    """
+    Returns the sorted array of indexed recipe ids
+    along with the normalized recipe x feature matrix.
+    """
+
+    ingredients = load_pairs(IngredientAmountInRecipe, "ingredient_id")
+    tags = load_pairs(RecipeTag, "tag_id")
+    recipe_ids, rows = np.unique(
+        np.concatenate((ingredients[:, 0], tags[:, 0])), return_inverse=True
+    )
+    ingredient_ids, ingredient_columns = np.unique(
+        ingredients[:, 1], return_inverse=True
+    )
+    tag_ids, tag_columns = np.unique(tags[:, 1], return_inverse=True)
+    columns = np.concatenate(
+        (ingredient_columns, tag_columns + len(ingredient_ids))
+    )
+    weights = np.concatenate((
+        np.ones(len(ingredients)),
+        np.full(len(tags), SIMILARITY_TAG_WEIGHT),
+    ))
+    matrix = sparse.csr_matrix(
+        (weights, (rows, columns)),
+        shape=(len(recipe_ids), len(ingredient_ids) + len(tag_ids)),
+    )
+
+    # Features present in too many recipes (salt, water, ...) barely
+    # tell recipes apart, yet make the products nearly dense.
+    frequency = np.bincount(matrix.indices, minlength=matrix.shape[1])
+    idf = np.log((1 + len(recipe_ids)) / (1 + frequency)) + 1
+    limit = max(SIMILARITY_MAX_DOCUMENT_FREQUENCY * len(recipe_ids),
+                SIMILARITY_MIN_PRUNED_FREQUENCY)
+    idf[frequency > limit] = 0
+    matrix = (matrix @ sparse.diags(idf)).tocsr()
+    matrix.eliminate_zeros()
+
+    norms = np.sqrt(np.asarray(matrix.multiply(matrix).sum(axis=1)).ravel())
+    norms[norms == 0] = 1
+    return recipe_ids, (sparse.diags(1 / norms) @ matrix).tocsr()
+
+
+def top_neighbours(rows):
+    """
+    Returns the (source row, neighbour row, score, rank) arrays
+    of the top-k neighbours of each of the given sorted rows.
+    """
+
+    similarities = (_matrix[rows] @ _transposed).tocsr()
+    sources = np.repeat(rows, np.diff(similarities.indptr))
+    targets = similarities.indices
+    scores = similarities.data
+    keep = (targets != sources) & (scores > 0)
+    sources, targets, scores = sources[keep], targets[keep], scores[keep]
+
+    order = np.lexsort((targets, -scores, sources))
+    sources, targets, scores = sources[order], targets[order], scores[order]
+    ranks = np.arange(len(sources)) - np.searchsorted(sources, sources)
+    keep = ranks < SIMILAR_RECIPES_COUNT
+    return sources[keep], targets[keep], scores[keep], ranks[keep]
+
+
+def compute_neighbours(rows, pool=None):
+    batches = (
+        rows[start:start + SIMILARITY_BATCH_SIZE]
+        for start in range(0, len(rows), SIMILARITY_BATCH_SIZE)
+    )
+    if pool is None:
+        return map(top_neighbours, batches)
+    return pool.map(top_neighbours, batches)
+
+
+def to_rows(recipe_ids, ids):
+    """
+    Maps recipe ids onto the matrix rows. Returns the rows
+    along with the mask of the given ids present in the index.
+    """
+
+    ids = np.asarray(ids, dtype=np.int64)
+    if not len(recipe_ids):
+        return ids[:0], np.zeros(len(ids), dtype=bool)
+    positions = np.minimum(np.searchsorted(recipe_ids, ids),
+                           len(recipe_ids) - 1)
+    found = recipe_ids[positions] == ids
+    return positions[found], found
+
+
+def find_affected_rows(recipe_ids, since):
+    """
+    Returns the rows whose neighbours may have changed since the last
+    refresh: the changed recipes themselves, the recipes which list
+    a changed recipe as a neighbour, and the recipes to which a changed
+    recipe is now closer than their weakest stored neighbour.
+    """
+
+    changed, _ = to_rows(recipe_ids, list(Recipe.objects.filter(
+        modified__gt=since
+    ).values_list("id", flat=True)))
+    listing, _ = to_rows(recipe_ids, list(SimilarRecipe.objects.filter(
+        similar__modified__gt=since
+    ).values_list("recipe_id", flat=True)))
+
+    stored = np.array(list(SimilarRecipe.objects.filter(
+        rank=SIMILAR_RECIPES_COUNT - 1
+    ).values_list("recipe_id", "score")), dtype=np.float64).reshape(-1, 2)
+    weakest = np.zeros(len(recipe_ids))
+    positions, found = to_rows(recipe_ids, stored[:, 0])
+    weakest[positions] = stored[found, 1]
+
+    closest = np.zeros(len(recipe_ids))
+    for start in range(0, len(changed), SIMILARITY_BATCH_SIZE):
+        batch = changed[start:start + SIMILARITY_BATCH_SIZE]
+        similarities = _matrix[batch] @ _transposed
+        closest = np.maximum(
+            closest, similarities.max(axis=0).toarray().ravel()
+        )
+    overtaken = np.flatnonzero(closest > weakest)
+    return np.unique(np.concatenate((changed, listing, overtaken)))
+
+
+def store_neighbours(recipe_ids, results, full, affected_ids):
+    if full:
+        SimilarRecipe.objects.all().delete()
+    else:
+        for start in range(0, len(affected_ids), SIMILARITY_BULK_SIZE):
+            SimilarRecipe.objects.filter(
+                recipe_id__in=affected_ids[start:start + SIMILARITY_BULK_SIZE]
+            ).delete()
+    for sources, targets, scores, ranks in results:
+        SimilarRecipe.objects.bulk_create(
+            (
+                SimilarRecipe(recipe_id=recipe_id, similar_id=similar_id,
+                              score=score, rank=rank)
+                for recipe_id, similar_id, score, rank in zip(
+                    recipe_ids[sources].tolist(),
+                    recipe_ids[targets].tolist(),
+                    scores.tolist(),
+                    ranks.tolist(),
+                )
+            ),
+            batch_size=SIMILARITY_BULK_SIZE,
+        )
+
+
+def drop_from_neighbours(recipe_id):
+    """
+    Removes a recipe about to be deleted from the neighbours
+    of the others, moving the neighbours ranked after it a rank up.
+    """
+
+    listed = SimilarRecipe.objects.filter(similar_id=recipe_id)
+    # Moved out of the range of ranks first, as the unique constraint
+    # on (recipe, rank) is checked after every row updated.
+    SimilarRecipe.objects.filter(
+        recipe_id__in=listed.values("recipe_id"),
+        rank__gt=Subquery(
+            listed.filter(recipe_id=OuterRef("recipe_id")).values("rank")[:1]
+        ),
+    ).update(rank=F("rank") + SIMILAR_RECIPES_COUNT)
+    listed.delete()
+    SimilarRecipe.objects.filter(rank__gte=SIMILAR_RECIPES_COUNT).update(
+        rank=F("rank") - SIMILAR_RECIPES_COUNT - 1
+    )
+
+
+def refresh_similar_recipes(full=False, workers=1):
+    """
+    Refreshes the similarity index, either entirely or only
+    for the recipes affected by the changes since the last refresh.
+    Scores of the unaffected recipes stay as they were computed, while
+    feature frequencies keep drifting, so a periodic full rebuild
+    is still worth scheduling. Returns the number of recipes
+    whose neighbours were recomputed.
+    """
+
+    global _matrix, _transposed
+
+    started = timezone.now()
+    since = SimilarRecipe.objects.aggregate(since=Max("created"))["since"]
+    full = full or since is None
+
+    recipe_ids, _matrix = build_matrix()
+    _transposed = _matrix.T.tocsr()
+    if full:
+        rows = np.arange(len(recipe_ids))
+    else:
+        rows = find_affected_rows(recipe_ids, since)
+
+    with ExitStack() as stack:
+        pool = None
+        if workers > 1 and len(rows) > SIMILARITY_BATCH_SIZE:
+            # Forked children must not share the parent's DB sockets.
+            connections.close_all()
+            pool = stack.enter_context(ProcessPoolExecutor(
+                max_workers=workers,
+                mp_context=multiprocessing.get_context("fork"),
+            ))
+        with transaction.atomic():
+            store_neighbours(recipe_ids, compute_neighbours(rows, pool),
+                             full, recipe_ids[rows].tolist())
+            # The index is only as fresh as the data it was built from.
+            SimilarRecipe.objects.filter(
+                created__gte=started
+            ).update(created=started)
+    return len(rows)
@@ -0,0 +1,37 @@
+"""
+In-memory map of tag slugs onto tag ids, so that filtering recipes
+by tags never has to look the tags up. The tags table is tiny and
+rarely written to, so each process keeps a full copy: writes done
+by the process itself drop it immediately, while the writes done
+by the other processes are picked up at most TAG_SLUGS_REFRESH_SECONDS
+later.
+"""
+
+from time import monotonic
+
+from .constants import TAG_SLUGS_REFRESH_SECONDS
+from .models import Tag
+
+
+class TagSlugMap:
+
+    def __init__(self):
+        self.ids = None
+        self.loaded_at = None
+
+    def mark_stale(self):
+        self.ids = None
+
+    def get_ids(self):
+        ids = self.ids
+        if (ids is None
+                or monotonic() - self.loaded_at > TAG_SLUGS_REFRESH_SECONDS):
+            ids = dict(Tag.objects.values_list("slug", "id"))
+            self.ids, self.loaded_at = ids, monotonic()
+        return ids
+
+    def get_choices(self):
+        return [(slug, slug) for slug in self.get_ids()]
+
+
+tag_slugs = TagSlugMap()
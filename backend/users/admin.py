@@ -1,17 +1,31 @@
 from django.contrib import admin
 
-from .models import CustomUser, Subscription
+from core.admin import LargeTableAdmin
+
+from .models import CustomUser, ExportJob, Subscription
 
 admin.site.empty_value_display = "-empty-"
 
 
 @admin.register(CustomUser)
-class CustomUserAdmin(admin.ModelAdmin):
+class CustomUserAdmin(LargeTableAdmin):
     list_display = ("id", "username", "email", "first_name", "last_name")
-    list_filter = ("email", "username")
+    search_fields = ("^username", "^email")
 
 
 @admin.register(Subscription)
-class SubscriptionAdmin(admin.ModelAdmin):
+class SubscriptionAdmin(LargeTableAdmin):
     list_display = ("id", "follower", "influencer")
-    list_filter = ("follower", "influencer")
+    list_select_related = ("follower", "influencer")
+    autocomplete_fields = ("follower", "influencer")
+    search_fields = ("=follower__username", "=influencer__username")
+
+
+@admin.register(ExportJob)
+class ExportJobAdmin(LargeTableAdmin):
+    list_display = ("id", "user", "kind", "fileformat", "status", "created",
+                    "finished")
+    list_filter = ("status", "kind")
+    list_select_related = ("user", )
+    autocomplete_fields = ("user", )
+    search_fields = ("=user__username", )
@@ -0,0 +1,14 @@
+from django.conf import settings
+from django.core.checks import Tags, Warning, register
+
+
+@register(Tags.security)
+def check_fast_password_hashing(app_configs, **kwargs):
+    if settings.FAST_PASSWORD_HASHING and not settings.DEBUG:
+        return [Warning(
+            "FAST_PASSWORD_HASHING is enabled outside of DEBUG mode.",
+            hint=("Fast hashing is meant for test and benchmark fixtures, "
+                  "never for real accounts."),
+            id="users.W001",
+        )]
+    return []
@@ -17,3 +17,38 @@ USER_ROLE_CHOICES = (
     ("admin", "Admin"),
     ("user", "User"),
 )
+
+# Passwords hashed per batch of the worker pool, bounding the memory use.
+PASSWORD_HASHING_BATCH_SIZE = 1000
+
+SHOPPING_LIST_EXPORT = "shopping_list"
+ACCOUNT_EXPORT = "account"
+EXPORT_KIND_CHOICES = (
+    (SHOPPING_LIST_EXPORT, "Shopping list"),
+    (ACCOUNT_EXPORT, "Account data"),
+)
+
+TXT_EXPORT_FORMAT = "txt"
+CSV_EXPORT_FORMAT = "csv"
+JSON_EXPORT_FORMAT = "json"
+EXPORT_FORMAT_CHOICES = (
+    (TXT_EXPORT_FORMAT, "Plain text"),
+    (CSV_EXPORT_FORMAT, "CSV"),
+    (JSON_EXPORT_FORMAT, "JSON"),
+)
+# Export kind -> formats it can be rendered in, the default one first.
+EXPORT_FORMATS_BY_KIND = {
+    SHOPPING_LIST_EXPORT: (TXT_EXPORT_FORMAT, CSV_EXPORT_FORMAT),
+    ACCOUNT_EXPORT: (JSON_EXPORT_FORMAT, ),
+}
+
+QUEUED_EXPORT_STATUS = "queued"
+RUNNING_EXPORT_STATUS = "running"
+DONE_EXPORT_STATUS = "done"
+FAILED_EXPORT_STATUS = "failed"
+EXPORT_STATUS_CHOICES = (
+    (QUEUED_EXPORT_STATUS, "Queued"),
+    (RUNNING_EXPORT_STATUS, "Running"),
+    (DONE_EXPORT_STATUS, "Done"),
+    (FAILED_EXPORT_STATUS, "Failed"),
+)
@@ -0,0 +1,20 @@
+# Generated by Django 3.2 on 2026-10-19 18:40
+
+from django.db import migrations, models
+import django.utils.timezone
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('users', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='customuser',
+            name='modified',
+            field=models.DateTimeField(auto_now=True, default=django.utils.timezone.now, verbose_name='date & time of last instance modification'),
+            preserve_default=False,
+        ),
+    ]
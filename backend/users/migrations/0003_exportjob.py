@@ -0,0 +1,39 @@
+# Generated by Django 3.2 on 2026-10-19 18:31
+
+import core.storage
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('users', '0002_customuser_modified'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ExportJob',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('created', models.DateTimeField(auto_now_add=True, db_index=True, verbose_name='date & time of instance creation')),
+                ('modified', models.DateTimeField(auto_now=True, verbose_name='date & time of last instance modification')),
+                ('kind', models.CharField(choices=[('shopping_list', 'Shopping list'), ('account', 'Account data')], max_length=16)),
+                ('fileformat', models.CharField(choices=[('txt', 'Plain text'), ('csv', 'CSV'), ('json', 'JSON')], max_length=8)),
+                ('status', models.CharField(choices=[('queued', 'Queued'), ('running', 'Running'), ('done', 'Done'), ('failed', 'Failed')], default='queued', max_length=8)),
+                ('file', models.FileField(blank=True, storage=core.storage.get_exports_storage, upload_to='')),
+                ('error', models.TextField(blank=True)),
+                ('started', models.DateTimeField(blank=True, null=True, verbose_name='date & time the processing started')),
+                ('finished', models.DateTimeField(blank=True, null=True, verbose_name='date & time the processing finished')),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='export_jobs', to=settings.AUTH_USER_MODEL, verbose_name='user')),
+            ],
+            options={
+                'ordering': ('-created',),
+            },
+        ),
+        migrations.AddIndex(
+            model_name='exportjob',
+            index=models.Index(fields=['status', 'created'], name='export_job_status_idx'),
+        ),
+    ]
@@ -0,0 +1,17 @@
+# Generated by Django 3.2 on 2026-10-19 18:41
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('users', '0003_exportjob'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='customuser',
+            index=models.Index(fields=['modified'], name='user_modified_idx'),
+        ),
+    ]
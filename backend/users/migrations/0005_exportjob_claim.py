@@ -0,0 +1,23 @@
+# Generated by Django 3.2 on 2026-10-19 18:58
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('users', '0004_user_modified_idx'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='exportjob',
+            name='claim',
+            field=models.UUIDField(blank=True, editable=False, null=True, verbose_name='token of the worker processing the job'),
+        ),
+        migrations.AddField(
+            model_name='exportjob',
+            name='heartbeat',
+            field=models.DateTimeField(blank=True, editable=False, null=True, verbose_name='date & time the worker last reported in'),
+        ),
+    ]
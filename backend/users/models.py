@@ -1,12 +1,17 @@
 from django.contrib.auth.models import AbstractUser
 from django.contrib.auth.validators import UnicodeUsernameValidator
-from django.db.models import (CASCADE, CharField, CheckConstraint, EmailField,
-                              F, ForeignKey, Q, UniqueConstraint)
+from django.db.models import (CASCADE, CharField, CheckConstraint,
+                              DateTimeField, EmailField, F, FileField,
+                              ForeignKey, Index, Q, TextField,
+                              UniqueConstraint, UUIDField)
 
 from core.models import WithTimestamps
+from core.storage import get_exports_storage
 
-from .constants import (ADMIN_USER_ROLE, DEFAULT_USER_ROLE, MAX_FIELD_LENGTH,
-                        USER_ROLE_CHOICES)
+from .constants import (ADMIN_USER_ROLE, DEFAULT_USER_ROLE,
+                        EXPORT_FORMAT_CHOICES, EXPORT_KIND_CHOICES,
+                        EXPORT_STATUS_CHOICES, MAX_FIELD_LENGTH,
+                        QUEUED_EXPORT_STATUS, USER_ROLE_CHOICES)
 from .validators import reserved_username_validator
 
 
@@ -40,9 +45,19 @@ class CustomUser(AbstractUser):
         validators=(UnicodeUsernameValidator(), reserved_username_validator),
         error_messages={"unique": "user with this username already exists."},
     )
+    modified = DateTimeField(
+        auto_now=True,
+        verbose_name="date & time of last instance modification",
+    )
 
     class Meta(AbstractUser.Meta):
         ordering = ("username", )
+        indexes = (
+            Index(
+                fields=("modified", ),
+                name="user_modified_idx",
+            ),
+        )
 
     @property
     def recipes_count(self):
@@ -90,3 +105,72 @@ class Subscription(WithTimestamps):
 
     def __str__(self):
         return f"{self.follower} follows {self.influencer}"
+
+
+class ExportJob(WithTimestamps):
+    """
+    Export of a user's data into a file, rendered in the background
+    by the `process-export-jobs` workers and kept for a while
+    for the user to download.
+    """
+
+    user = ForeignKey(
+        verbose_name="user",
+        to=CustomUser,
+        on_delete=CASCADE,
+        related_name="export_jobs",
+    )
+    kind = CharField(
+        choices=EXPORT_KIND_CHOICES,
+        max_length=16,
+    )
+    fileformat = CharField(
+        choices=EXPORT_FORMAT_CHOICES,
+        max_length=8,
+    )
+    status = CharField(
+        choices=EXPORT_STATUS_CHOICES,
+        default=QUEUED_EXPORT_STATUS,
+        max_length=8,
+    )
+    file = FileField(
+        storage=get_exports_storage,
+        blank=True,
+    )
+    error = TextField(
+        blank=True,
+    )
+    started = DateTimeField(
+        null=True,
+        blank=True,
+        verbose_name="date & time the processing started",
+    )
+    finished = DateTimeField(
+        null=True,
+        blank=True,
+        verbose_name="date & time the processing finished",
+    )
+    claim = UUIDField(
+        null=True,
+        blank=True,
+        editable=False,
+        verbose_name="token of the worker processing the job",
+    )
+    heartbeat = DateTimeField(
+        null=True,
+        blank=True,
+        editable=False,
+        verbose_name="date & time the worker last reported in",
+    )
+
+    class Meta:
+        ordering = ("-created", )
+        indexes = (
+            Index(
+                fields=("status", "created"),
+                name="export_job_status_idx",
+            ),
+        )
+
+    def __str__(self):
+        return f"{self.kind} export of {self.user} ({self.status})"
@@ -0,0 +1,53 @@
+"""
+Password hashing for bulk user provisioning.
+
+Every hash is deliberately slow and single-threaded, so hashing
+thousands of them is spread across a pool of forked worker processes.
+Passwords are consumed in batches, at most two of them in flight,
+so that memory stays bounded whatever the number of users,
+and hashes come out in input order.
+"""
+
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+from itertools import islice
+
+from django.contrib.auth.hashers import make_password
+from django.db import connections
+from django.db.transaction import TransactionManagementError
+
+from .constants import PASSWORD_HASHING_BATCH_SIZE
+
+
+def make_passwords(passwords, workers=1):
+    """
+    Lazily hashes the given raw passwords, in order. Forking
+    closes the DB connections, so it is not available in transactions.
+    """
+
+    passwords = iter(passwords)
+    batch = list(islice(passwords, PASSWORD_HASHING_BATCH_SIZE))
+    if workers <= 1 or len(batch) < 2:
+        yield from map(make_password, batch)
+        yield from map(make_password, passwords)
+        return
+
+    if any(connection.in_atomic_block for connection in connections.all()):
+        raise TransactionManagementError(
+            "Passwords cannot be hashed in parallel within a transaction."
+        )
+    # Forked children must not share the parent's DB sockets.
+    connections.close_all()
+    with ProcessPoolExecutor(
+        max_workers=workers, mp_context=multiprocessing.get_context("fork")
+    ) as pool:
+        chunksize = max(PASSWORD_HASHING_BATCH_SIZE // workers // 4, 1)
+        hashed = pool.map(make_password, batch, chunksize=chunksize)
+        while hashed is not None:
+            # Keeps the workers busy with the next batch
+            # while the current one is being consumed.
+            batch = list(islice(passwords, PASSWORD_HASHING_BATCH_SIZE))
+            following = pool.map(make_password, batch,
+                                 chunksize=chunksize) if batch else None
+            yield from hashed
+            hashed = following
@@ -0,0 +1,15 @@
+from django.db import transaction
+from django.db.models.signals import post_delete
+
+from .models import ExportJob
+
+
+def delete_export_file(sender, instance, **kwargs):
+    if instance.file:
+        storage, name = instance.file.storage, instance.file.name
+        transaction.on_commit(lambda: storage.delete(name))
+
+
+def connect_signals():
+    post_delete.connect(delete_export_file, sender=ExportJob,
+                        dispatch_uid="delete-export-file")